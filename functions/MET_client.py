@@ -1,21 +1,127 @@
-import requests
 #from firebase_functions import https_fn
 import os
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
 
+from app.services.lazy_imports import lazy_module
+from app.services.memory_cache import TtlLruCache
+from app.services.request_timing import stage
+
+
+# requests (urllib3, charset-normalizer) lastes ved første kall mot MET, ikke ved import.
+requests = lazy_module("requests")
 
 headers = {
     "User-Agent": "FireGuard/1.0.0 (598118@stud.hvl.no)"
 }
 
+MET_FORECAST_URL = os.getenv("MET_FORECAST_URL", "https://api.met.no/weatherapi/locationforecast/2.0/compact")
+OPEN_METEO_URL = os.getenv("OPEN_METEO_URL", "https://api.open-meteo.com/v1/forecast")
+REQUEST_TIMEOUT_SECONDS = 15
+HTTP_POOL_SIZE = 16
+
+# MET ber om maks 4 desimaler i koordinatene; samme avrunding brukes som cache-nøkkel.
+COORDINATE_DECIMALS = 4
+# Hvor lenge en rå prognose beholdes for revalidering med If-Modified-Since etter at den har gått ut.
+FORECAST_RETENTION_SECONDS = 6 * 3600
+# Dager med historikk modellen spinnes opp over når det ikke finnes lagret modelltilstand.
+HISTORY_SPINUP_DAYS = 5
+
+
+@dataclass
+class _CachedForecast:
+    data: dict
+    expires: float
+    last_modified: str | None
+
+
+_session = None
+_session_lock = threading.Lock()
+_forecast_cache = TtlLruCache(max_entries=512)
+
+
+def get_session():
+    """Delt HTTP-sesjon (requests.Session) med connection pooling, opprettes ved første kall."""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                from requests.adapters import HTTPAdapter
+
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=4, pool_maxsize=HTTP_POOL_SIZE)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                session.headers.update(headers)
+                _session = session
+    return _session
+
+
+def _parse_expires(value: str | None, now: float) -> float:
+    if not value:
+        return now
+    try:
+        return parsedate_to_datetime(value).timestamp()
+    except (TypeError, ValueError):
+        return now
+
+
+def fetch_forecast(lat: float, lon: float) -> tuple[dict, float]:
+    """Rå MET-prognose og tidspunktet (epoch) den utløper etter MET sitt Expires-header."""
+    lat = round(lat, COORDINATE_DECIMALS)
+    lon = round(lon, COORDINATE_DECIMALS)
+    key = (lat, lon)
+    now = time.time()
+
+    cached = _forecast_cache.get(key)
+    if cached is not None and cached.expires > now:
+        return cached.data, cached.expires
+
+    request_headers = {}
+    if cached is not None and cached.last_modified:
+        request_headers["If-Modified-Since"] = cached.last_modified
+
+    with stage("met_fetch"):
+        try:
+            response = get_session().get(
+                MET_FORECAST_URL,
+                params={"lat": lat, "lon": lon},
+                headers=request_headers,
+                timeout=REQUEST_TIMEOUT_SECONDS,
+            )
+            response.raise_for_status()
+        except requests.RequestException as exc:
+            raise RuntimeError(f"Failed to fetch weather data from MET: {exc}") from exc
+
+        if response.status_code == 304 and cached is not None:
+            data = cached.data
+            last_modified = response.headers.get("Last-Modified") or cached.last_modified
+        else:
+            data = response.json()
+            last_modified = response.headers.get("Last-Modified")
+
+    expires = _parse_expires(response.headers.get("Expires"), now)
+    _forecast_cache.set(
+        key,
+        _CachedForecast(data=data, expires=expires, last_modified=last_modified),
+        expires_at=max(expires, now) + FORECAST_RETENTION_SECONDS,
+    )
+    return data, expires
+
 
 def fetch_weather(lat: float, lon: float) -> dict:
-    url = f"https://api.met.no/weatherapi/locationforecast/2.0/compact?lat={lat}&lon={lon}"
+    return fetch_forecast(lat, lon)[0]
+
+
+def forecast_issued_at(raw_json: dict) -> str | None:
+    """Når MET utstedte prognosen (properties.meta.updated_at), hvis oppgitt."""
     try:
-        response = requests.get(url, headers=headers, timeout=15)
-        response.raise_for_status()
-    except requests.RequestException as exc:
-        raise RuntimeError(f"Failed to fetch weather data from MET: {exc}") from exc
-    return response.json()
+        return raw_json["properties"]["meta"]["updated_at"]
+    except (KeyError, TypeError):
+        return None
 
 
 def extract_timeseries(raw_json: dict) -> list[dict]:
@@ -67,23 +173,130 @@ def extract_weather_records(raw_json: dict, max_points: int = 12) -> list[dict]:
 
 def fetch_weather_records_for_location(lat: float, lon: float, max_points: int = 12) -> list[dict]:
     raw_data = fetch_weather(lat=lat, lon=lon)
-    return extract_weather_records(raw_data, max_points=max_points)
+    with stage("parse"):
+        return extract_weather_records(raw_data, max_points=max_points)
 
 #### Brukler open-Meteo for å hente ut værdata fra tidligere dager også ####
 
+# Open-Meteo tar kommaseparerte koordinatlister; store lister deles opp så hver URL holder seg under vanlige grenser.
+OPEN_METEO_MAX_LOCATIONS = int(os.getenv("OPEN_METEO_MAX_LOCATIONS", "100"))
+OPEN_METEO_MAX_URL_LENGTH = 4000
+OPEN_METEO_HOURLY = "temperature_2m,relative_humidity_2m,wind_speed_10m"
+
+
+@dataclass
+class HourlyWeather:
+    """Open-Meteo hourly columns for one location, as returned by the API. `time` is epoch seconds (UTC)."""
+
+    lat: float
+    lon: float
+    time: list[int]
+    temperature: list[float | None]
+    relative_humidity: list[float | None]
+    wind_speed: list[float | None]
+
+    def to_series(self):
+        """The columns as a kernel WeatherSeries, without building per-hour records. Missing values become NaN."""
+        import numpy as np
+
+        from app.services.fire_risk_kernel import WeatherSeries
+
+        if not self.time:
+            raise ValueError("Weather data is empty")
+        seconds = np.asarray(self.time, dtype=float)
+        return WeatherSeries(
+            origin=datetime.fromtimestamp(self.time[0], tz=timezone.utc),
+            offsets=seconds - seconds[0],
+            temperature=np.asarray(self.temperature, dtype=float),
+            humidity=np.asarray(self.relative_humidity, dtype=float),
+            wind_speed=np.asarray(self.wind_speed, dtype=float),
+        )
+
+    def to_records(self) -> list[dict]:
+        return [
+            {
+                "timestamp": time.strftime("%Y-%m-%dT%H:%MZ", time.gmtime(epoch)),
+                "temperature": temperature,
+                "wind_speed": wind_speed,
+                "relative_humidity": humidity,
+            }
+            for epoch, temperature, wind_speed, humidity in zip(
+                self.time, self.temperature, self.wind_speed, self.relative_humidity
+            )
+        ]
+
+
+def _open_meteo_chunks(locations: list[tuple[float, float]]) -> list[list[tuple[float, float]]]:
+    chunks: list[list[tuple[float, float]]] = []
+    chunk: list[tuple[float, float]] = []
+    length = len(OPEN_METEO_URL) + 200  # faste parametere
+    for lat, lon in locations:
+        # "lat," og "lon," i hver sin liste; kommaene URL-kodes til %2C.
+        size = len(str(lat)) + len(str(lon)) + 6
+        if chunk and (len(chunk) == OPEN_METEO_MAX_LOCATIONS or length + size > OPEN_METEO_MAX_URL_LENGTH):
+            chunks.append(chunk)
+            chunk, length = [], len(OPEN_METEO_URL) + 200
+        chunk.append((lat, lon))
+        length += size
+    if chunk:
+        chunks.append(chunk)
+    return chunks
+
+
+def _fetch_open_meteo_chunk(chunk: list[tuple[float, float]], past_days: int) -> list[HourlyWeather]:
+    # UTC gir absolutte tidsstempler, slik at lagret modelltilstand kan gjenopptas på tvers av kall.
+    params = {
+        "latitude": ",".join(str(lat) for lat, _ in chunk),
+        "longitude": ",".join(str(lon) for _, lon in chunk),
+        "hourly": OPEN_METEO_HOURLY,
+        "timezone": "UTC",
+        "timeformat": "unixtime",
+        "past_days": past_days,
+        "forecast_days": 3,
+        "wind_speed_unit": "ms",
+    }
+    with stage("met_fetch"):
+        try:
+            r = get_session().get(OPEN_METEO_URL, params=params, timeout=REQUEST_TIMEOUT_SECONDS)
+            r.raise_for_status()
+        except requests.RequestException as exc:
+            raise RuntimeError(f"Failed to fetch weather data from Open-Meteo: {exc}") from exc
+        payload = r.json()
+
+    # Én lokasjon gir et objekt, flere gir en liste i samme rekkefølge som koordinatene.
+    items = payload if isinstance(payload, list) else [payload]
+    if len(items) != len(chunk):
+        raise RuntimeError(f"Open-Meteo returned {len(items)} locations for a request with {len(chunk)}")
+    weather = []
+    for (lat, lon), item in zip(chunk, items):
+        try:
+            hourly = item["hourly"]
+            weather.append(
+                HourlyWeather(
+                    lat=lat,
+                    lon=lon,
+                    time=hourly["time"],
+                    temperature=hourly["temperature_2m"],
+                    relative_humidity=hourly["relative_humidity_2m"],
+                    wind_speed=hourly["wind_speed_10m"],
+                )
+            )
+        except (KeyError, TypeError) as exc:
+            raise ValueError("Unexpected Open-Meteo response format") from exc
+    return weather
+
+
+def fetch_historical_weather_many(
+    locations: list[tuple[float, float]], past_days: int = HISTORY_SPINUP_DAYS
+) -> list[HourlyWeather]:
+    """Hourly history and forecast for many locations, one Open-Meteo request per chunk. Results are in input order."""
+    unique = list(dict.fromkeys((round(lat, COORDINATE_DECIMALS), round(lon, COORDINATE_DECIMALS)) for lat, lon in locations))
+    by_location: dict[tuple[float, float], HourlyWeather] = {}
+    for chunk in _open_meteo_chunks(unique):
+        for location, weather in zip(chunk, _fetch_open_meteo_chunk(chunk, past_days)):
+            by_location[location] = weather
+    return [by_location[(round(lat, COORDINATE_DECIMALS), round(lon, COORDINATE_DECIMALS))] for lat, lon in locations]
 
-def fetch_historical_weather(lat, lon):
-    url = f"https://api.open-meteo.com/v1/forecast?latitude={lat}&longitude={lon}&hourly=temperature_2m,relative_humidity_2m,wind_speed_10m&timezone=auto&past_days=5&forecast_days=3&wind_speed_unit=ms"
-    r = requests.get(url)
-    data = r.json()["hourly"]
-    
-    records = []
-    for i in range(len(data["time"])):
-        records.append({
-            "timestamp": data["time"][i],
-            "temperature": data["temperature_2m"][i],
-            "wind_speed": data["wind_speed_10m"][i],
-            "relative_humidity": data["relative_humidity_2m"][i]
-        })
-    return records
 
+def fetch_historical_weather(lat, lon, past_days=HISTORY_SPINUP_DAYS):
+    return fetch_historical_weather_many([(lat, lon)], past_days=past_days)[0].to_records()
@@ -1,13 +1,32 @@
 from __future__ import annotations
 
 import json
+import math
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from typing import Any
 
-from fastapi import APIRouter, Body, HTTPException, Query, Request
+from fastapi import APIRouter, Body, HTTPException, Query, Request, Response
+from pydantic import BaseModel, Field
 
-from MET_client import fetch_weather_records_for_location, fetch_historical_weather
-from app.services.fire_risk_service import compute_fire_risk_from_csv, compute_fire_risk_from_records
+from app.api.responses import (
+    MEDIA_TYPE_COLUMNAR_JSON,
+    MEDIA_TYPE_MSGPACK,
+    fire_risk_batch_response,
+    fire_risk_grid_response,
+    fire_risk_response,
+)
+from app.services.fire_risk_service import compute_fire_risk_from_records, compute_fire_risk_from_series
+from app.services.weather_ingest import detect_format, parse_weather_stream
 from app.services.fire_risk_cache_service import FireRiskCacheService
+from app.services.fire_risk_history_service import HISTORY_CACHE_POINTS, FireRiskHistoryService
+from app.services.fire_risk_batch_service import MAX_BATCH_SIZE, FireRiskBatchService
+from app.services.fire_risk_grid_service import MAX_GRID_CELLS, FireRiskGridService
+from app.services.executors import run_blocking, run_compute, submit_compute
+from app.services.request_timing import stage
+from app.services.single_flight import SingleFlight
+from app.services.weather_cache_service import WeatherCacheService
 
 router = APIRouter(prefix="/fire-risk", tags=["fire-risk"])
 
@@ -34,6 +53,10 @@ CSV_REQUEST_EXAMPLE = """timestamp,temperature,relative_humidity,wind_speed
 2026-04-13T13:00:00Z,17.1,49.0,7.5
 """
 
+NDJSON_REQUEST_EXAMPLE = """{"timestamp": "2026-04-13T12:00:00Z", "temperature": 16.4, "relative_humidity": 52.0, "wind_speed": 6.8}
+{"timestamp": "2026-04-13T13:00:00Z", "temperature": 17.1, "relative_humidity": 49.0, "wind_speed": 7.5}
+"""
+
 FIRE_RISK_RESPONSE_EXAMPLE = {
     "ttf": [37.2, 35.8],
     "result": {
@@ -48,6 +71,136 @@ FIRE_RISK_RESPONSE_EXAMPLE = {
     },
 }
 
+COLUMNAR_RESPONSE_EXAMPLE = {
+    "timestamps": ["2026-04-13 12:00:00+00:00", "2026-04-13 13:00:00+00:00"],
+    "ttf": [37.2, 35.8],
+}
+
+FIRE_RISK_RESPONSE_CONTENT = {
+    "application/json": {"example": FIRE_RISK_RESPONSE_EXAMPLE},
+    MEDIA_TYPE_COLUMNAR_JSON: {"example": COLUMNAR_RESPONSE_EXAMPLE},
+    MEDIA_TYPE_MSGPACK: {"schema": {"type": "string", "format": "binary"}},
+}
+
+BATCH_RESPONSE_EXAMPLE = {
+    "results": [
+        {
+            "lat": 60.3913,
+            "lon": 5.3221,
+            "points": 12,
+            "status": "ok",
+            "cached": True,
+            "ttf": [37.2, 35.8],
+            "result": {"firerisks": [{"timestamp": "2026-04-13 12:00:00+00:00", "ttf": 37.2}]},
+        },
+        {
+            "lat": 59.9123,
+            "lon": 10.7543,
+            "points": 12,
+            "status": "error",
+            "status_code": 502,
+            "error": "Failed to fetch weather data from MET: ...",
+        },
+    ]
+}
+
+
+GRID_RESPONSE_EXAMPLE = {
+    "bbox": {"min_lat": 60.38, "min_lon": 5.3, "max_lat": 60.4, "max_lon": 5.32},
+    "resolution": 0.02,
+    "points": 2,
+    "shape": [2, 2, 2],
+    "lats": [60.4, 60.38],
+    "lons": [5.3, 5.32],
+    "timestamps": ["2026-04-13 12:00:00+00:00", "2026-04-13 13:00:00+00:00"],
+    "ttf": [[37.2, 36.9, 37.4, None], [35.8, 35.5, 36.1, None]],
+    "cached": 1,
+    "computed": 2,
+    "errors": [{"lat": 60.38, "lon": 5.32, "status_code": 502, "error": "Failed to fetch weather data from MET: ..."}],
+}
+
+
+class BatchLocation(BaseModel):
+    lat: float = Field(..., description="Latitude", examples=[60.3913])
+    lon: float = Field(..., description="Longitude", examples=[5.3221])
+    points: int = Field(default=12, ge=1, le=72, description="Number of hourly points", examples=[12])
+
+
+class BatchRequest(BaseModel):
+    locations: list[BatchLocation] = Field(..., min_length=1, max_length=MAX_BATCH_SIZE)
+
+
+class HistoryLocation(BaseModel):
+    lat: float = Field(..., description="Latitude", examples=[60.3913])
+    lon: float = Field(..., description="Longitude", examples=[5.3221])
+
+
+class HistoryBatchRequest(BaseModel):
+    locations: list[HistoryLocation] = Field(..., min_length=1, max_length=MAX_BATCH_SIZE)
+
+# Hvor lenge en forespørsel venter på at en annen instans med lease fyller cachen.
+LEASE_WAIT_SECONDS = 10
+
+_location_flight = SingleFlight()
+
+# Bakgrunnsoppfriskning av grid-celler som ble servert stale. Én oppfriskning per celle om gangen.
+MAX_CONCURRENT_REFRESHES = 4
+_refresh_executor = ThreadPoolExecutor(max_workers=MAX_CONCURRENT_REFRESHES, thread_name_prefix="fire-risk-refresh")
+_refreshing: set[str] = set()
+_refreshing_lock = threading.Lock()
+
+
+def _compute_and_cache_location(cache: FireRiskCacheService, lat: float, lon: float, points: int) -> dict[str, Any]:
+    """Henter og beregner én grid-celle. Samtidige misser for samme celle deler ett kall."""
+    grid_id = cache.get_grid_id(lat, lon, points)
+
+    def fill() -> dict[str, Any]:
+        acquired = cache.try_acquire_lease(grid_id)
+        if not acquired:
+            result = cache.wait_for_cached_risk(grid_id, timeout=LEASE_WAIT_SECONDS)
+            if result is not None:
+                return result
+        try:
+            # Værserien deles av alle points-verdier i cellen; bare beregningen gjøres per points.
+            records = WeatherCacheService(cache).get_records(lat, lon, points)
+            # Fyllingen kjører på en I/O-tråd; selve modellkjøringen køes i den begrensede beregningspoolen.
+            result = submit_compute(compute_fire_risk_from_records, records).result()
+            cache.save_to_cache(lat, lon, points, result)
+            return result
+        finally:
+            if acquired:
+                cache.release_lease(grid_id)
+
+    return _location_flight.do(grid_id, fill)
+
+
+def _refresh_location(cache: FireRiskCacheService, grid_id: str, lat: float, lon: float, points: int) -> None:
+    try:
+        _compute_and_cache_location(cache, lat, lon, points)
+    except Exception as exc:
+        # Ingen venter på futuren, så alt som ikke logges her forsvinner stille.
+        print(f"Background refresh failed for {grid_id}: {exc}")
+    finally:
+        with _refreshing_lock:
+            _refreshing.discard(grid_id)
+
+
+def _schedule_refresh(cache: FireRiskCacheService, lat: float, lon: float, points: int) -> bool:
+    grid_id = cache.get_grid_id(lat, lon, points)
+    with _refreshing_lock:
+        if grid_id in _refreshing:
+            return False
+        _refreshing.add(grid_id)
+    _refresh_executor.submit(_refresh_location, cache, grid_id, lat, lon, points)
+    return True
+
+
+def _with_age(response: Response, cache_status: str, computed_at: float | None) -> Response:
+    age = 0 if computed_at is None else max(0, math.floor(time.time() - computed_at))
+    response.headers["Age"] = str(age)
+    response.headers["X-Cache-Status"] = cache_status
+    return response
+
 
 def _extract_records(payload: Any) -> list[dict[str, Any]]:
     if isinstance(payload, list):
@@ -64,13 +217,14 @@ def _extract_records(payload: Any) -> list[dict[str, Any]]:
     "/compute",
     summary="Compute fire risk from weather records",
     description=(
-        "Accepts either JSON records or CSV payload with fields "
-        "timestamp, temperature, relative_humidity, wind_speed."
+        "Accepts JSON records, CSV or newline-delimited JSON (application/x-ndjson) with fields "
+        "timestamp, temperature, relative_humidity, wind_speed. CSV and NDJSON bodies are parsed "
+        "as a stream; errors report the offending line number."
     ),
     responses={
         200: {
-            "description": "Computed fire risk",
-            "content": {"application/json": {"example": FIRE_RISK_RESPONSE_EXAMPLE}},
+            "description": "Computed fire risk. The Accept header selects nested JSON, columnar JSON or MessagePack.",
+            "content": FIRE_RISK_RESPONSE_CONTENT,
         },
         400: {"description": "Invalid input"},
     },
@@ -88,25 +242,36 @@ def _extract_records(payload: Any) -> list[dict[str, Any]]:
                 "text/csv": {
                     "example": CSV_REQUEST_EXAMPLE,
                 },
+                "application/x-ndjson": {
+                    "example": NDJSON_REQUEST_EXAMPLE,
+                },
             }
         }
     },
 )
-async def compute_fire_risk(request: Request) -> dict[str, Any]:
+async def compute_fire_risk(request: Request) -> Response:
     content_type = request.headers.get("content-type", "").lower()
+    accept = request.headers.get("accept")
+    accept_encoding = request.headers.get("accept-encoding")
 
     try:
-        if "text/csv" in content_type:
-            csv_body = (await request.body()).decode("utf-8")
-            return compute_fire_risk_from_csv(csv_body)
+        stream_format = detect_format(content_type)
+        if stream_format is not None:
+            # Strømmet parsing: tiden inkluderer opplastingen av bodyen.
+            with stage("parse"):
+                series = await parse_weather_stream(request.stream(), stream_format)
+            result = await run_compute(compute_fire_risk_from_series, series)
+            return fire_risk_response(result, accept, accept_encoding)
 
-        try:
-            payload = await request.json()
-        except json.JSONDecodeError as exc:
-            raise HTTPException(status_code=400, detail=f"Invalid JSON: {exc}") from exc
+        with stage("parse"):
+            try:
+                payload = await request.json()
+            except json.JSONDecodeError as exc:
+                raise HTTPException(status_code=400, detail=f"Invalid JSON: {exc}") from exc
 
-        records = _extract_records(payload)
-        return compute_fire_risk_from_records(records)
+            records = _extract_records(payload)
+        result = await run_compute(compute_fire_risk_from_records, records)
+        return fire_risk_response(result, accept, accept_encoding)
 
     except ValueError as exc:
         raise HTTPException(status_code=400, detail=str(exc)) from exc
@@ -117,53 +282,192 @@ async def compute_fire_risk(request: Request) -> dict[str, Any]:
     summary="Compute fire risk by geographic location",
     responses={
         200: {
-            "description": "Computed fire risk",
-            "content": {"application/json": {"example": FIRE_RISK_RESPONSE_EXAMPLE}},
+            "description": "Computed fire risk. The Accept header selects nested JSON, columnar JSON or MessagePack.",
+            "content": FIRE_RISK_RESPONSE_CONTENT,
         },
         400: {"description": "Invalid query parameters"},
         502: {"description": "Upstream weather service error"},
     },
+    description=(
+        "Cached results carry an Age header (seconds since the result was computed) and X-Cache-Status "
+        "(hit, stale or miss). After an hour boundary the last known result for the cell is served as "
+        "stale, up to FIRE_RISK_MAX_STALE_SECONDS old, while a fresh one is computed in the background."
+    ),
 )
 async def compute_fire_risk_by_location(
+    request: Request,
     lat: float = Query(..., description="Latitude", examples=[60.3913]),
     lon: float = Query(..., description="Longitude", examples=[5.3221]),
     points: int = Query(default=12, ge=1, le=72, description="Number of hourly points", examples=[12]),
-) -> dict[str, Any]:
+) -> Response:
     
     if points < 1 or points > 72:
         raise HTTPException(status_code=400, detail="points must be between 1 and 72")
 
     cache = FireRiskCacheService()
-    cached_result = cache.get_cached_risk(lat, lon, points)
-    if cached_result is not None:
-        return cached_result
+    accept = request.headers.get("accept")
+    accept_encoding = request.headers.get("accept-encoding")
+    # Firestore-oppslag og beregning kjører i trådpooler, så event-loopen kan betjene andre forespørsler imens.
+    cached = await run_blocking(cache.get_cached_entry, lat, lon, points)
+    if cached is not None:
+        return _with_age(fire_risk_response(cached[0], accept, accept_encoding), "hit", cached[1])
+
+    # Stale-while-revalidate: siste kjente resultat serveres mens cellen beregnes på nytt i bakgrunnen.
+    stale = await run_blocking(cache.get_stale_entry, lat, lon, points)
+    if stale is not None:
+        _schedule_refresh(cache, lat, lon, points)
+        return _with_age(fire_risk_response(stale[0], accept, accept_encoding), "stale", stale[1])
     
     try:
-        records = fetch_weather_records_for_location(lat=lat, lon=lon, max_points=points)
-        result =  compute_fire_risk_from_records(records)
-        cache.save_to_cache(lat, lon, points, result)
-        return result
+        result = await run_blocking(_compute_and_cache_location, cache, lat, lon, points)
+        return _with_age(fire_risk_response(result, accept, accept_encoding), "miss", None)
     except ValueError as exc:
         raise HTTPException(status_code=400, detail=str(exc)) from exc
     except RuntimeError as exc:
         raise HTTPException(status_code=502, detail=str(exc)) from exc
 
-@router.get("/compute-by-location")
-async def compute_fire_risk_by_location(lat:float, lon:float) -> dict[str, Any]:
+@router.post(
+    "/compute-batch",
+    summary="Compute fire risk for many locations",
+    description=(
+        "Resolves cache hits in one Firestore read, fetches the misses from MET concurrently "
+        "and returns one result or error per location, in request order."
+    ),
+    responses={
+        200: {
+            "description": "Per-location results. Columnar and MessagePack layouts apply to each successful item.",
+            "content": {
+                "application/json": {"example": BATCH_RESPONSE_EXAMPLE},
+                MEDIA_TYPE_COLUMNAR_JSON: {},
+                MEDIA_TYPE_MSGPACK: {"schema": {"type": "string", "format": "binary"}},
+            },
+        },
+        400: {"description": "Invalid request body"},
+    },
+)
+async def compute_fire_risk_batch(request: BatchRequest, raw_request: Request) -> Response:
+    service = FireRiskBatchService()
+    try:
+        results = await run_blocking(
+            service.compute_batch,
+            [(location.lat, location.lon, location.points) for location in request.locations],
+        )
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+    return fire_risk_batch_response(
+        results, raw_request.headers.get("accept"), raw_request.headers.get("accept-encoding")
+    )
+
+@router.get(
+    "/grid",
+    summary="Compute a fire-risk raster for a bounding box",
+    description=(
+        "Covers the bounding box with cache cells every `resolution` degrees (a multiple of 0.02). Cached cells "
+        "are read in one Firestore call; the rest are computed together in one batched model run and written "
+        f"to the cell cache. At most {MAX_GRID_CELLS} cells per request. `ttf` holds one row-major "
+        "rows x columns list per hour (rows north to south), with null for cells that failed; see `errors`."
+    ),
+    responses={
+        200: {
+            "description": "Raster tile of TTF per hour. Accept: application/msgpack returns it as MessagePack.",
+            "content": {
+                "application/json": {"example": GRID_RESPONSE_EXAMPLE},
+                MEDIA_TYPE_MSGPACK: {"schema": {"type": "string", "format": "binary"}},
+            },
+        },
+        400: {"description": "Invalid bounding box or resolution"},
+    },
+)
+async def compute_fire_risk_grid(
+    request: Request,
+    min_lat: float = Query(..., ge=-90, le=90, description="Southern edge", examples=[60.3]),
+    min_lon: float = Query(..., ge=-180, le=180, description="Western edge", examples=[5.2]),
+    max_lat: float = Query(..., ge=-90, le=90, description="Northern edge", examples=[60.46]),
+    max_lon: float = Query(..., ge=-180, le=180, description="Eastern edge", examples=[5.4]),
+    resolution: float = Query(default=0.02, gt=0, description="Cell spacing in degrees", examples=[0.02]),
+    points: int = Query(default=12, ge=1, le=72, description="Number of hourly points", examples=[12]),
+) -> Response:
+    service = FireRiskGridService()
+    try:
+        tile = await run_blocking(service.compute_grid, min_lat, min_lon, max_lat, max_lon, resolution, points)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+    return fire_risk_grid_response(tile, request.headers.get("accept"), request.headers.get("accept-encoding"))
+
+@router.get(
+    "/compute-history",
+    summary="Compute historical and forecast fire risk by geographic location",
+    description=(
+        "Runs the model over Open-Meteo history and forecast for the location and returns the hours from the "
+        "start of the current UTC day. The model state at the start of each day is saved per grid cell, so "
+        "later calls only fetch and simulate the days since instead of spinning up over the full history."
+    ),
+    responses={
+        200: {
+            "description": "Fire risk from the start of the current UTC day. The Accept header selects the layout.",
+            "content": FIRE_RISK_RESPONSE_CONTENT,
+        },
+        400: {"description": "Invalid query parameters"},
+        502: {"description": "Upstream weather service error"},
+        500: {"description": "Unexpected error while computing the history"},
+    },
+)
+async def compute_fire_risk_history(
+    request: Request,
+    lat: float = Query(..., description="Latitude", examples=[60.3913]),
+    lon: float = Query(..., description="Longitude", examples=[5.3221]),
+) -> Response:
     cache = FireRiskCacheService()
-    cached_result = cache.get_cached_risk(lat, lon, 800)
+    accept = request.headers.get("accept")
+    accept_encoding = request.headers.get("accept-encoding")
+    cached_result = await run_blocking(cache.get_cached_risk, lat, lon, HISTORY_CACHE_POINTS)
     if cached_result is not None:
-        return cached_result
+        return fire_risk_response(cached_result, accept, accept_encoding)
+    try:
+        # Gjenopptar fra lagret modelltilstand for grid-cellen i stedet for å spinne opp over 5 dager hver gang.
+        result = await run_blocking(FireRiskHistoryService(cache).compute_for_location, lat, lon)
+        await run_blocking(cache.save_to_cache, lat, lon, HISTORY_CACHE_POINTS, result)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+    except RuntimeError as exc:
+        raise HTTPException(status_code=502, detail=str(exc)) from exc
+    except Exception as exc:
+        raise HTTPException(status_code=500, detail=str(exc)) from exc
+    # Timene fra starten av dagens UTC-døgn (maks HISTORY_HOURS); oppspinningen før det returneres ikke.
+    return fire_risk_response(result, accept, accept_encoding)
+
+
+@router.post(
+    "/compute-history-batch",
+    summary="Compute historical and forecast fire risk for many locations",
+    description=(
+        "compute-history for many locations. Cache hits are read in one Firestore call; the misses share "
+        "Open-Meteo requests (many coordinates per request) instead of one request each. Returns one "
+        "result or error per location, in request order."
+    ),
+    responses={
+        200: {
+            "description": "Per-location results. Columnar and MessagePack layouts apply to each successful item.",
+            "content": {
+                "application/json": {},
+                MEDIA_TYPE_COLUMNAR_JSON: {},
+                MEDIA_TYPE_MSGPACK: {"schema": {"type": "string", "format": "binary"}},
+            },
+        },
+        400: {"description": "Invalid request body"},
+        500: {"description": "Unexpected error while computing the history"},
+    },
+)
+async def compute_fire_risk_history_batch(request: HistoryBatchRequest, raw_request: Request) -> Response:
+    service = FireRiskHistoryService()
     try:
-        records = fetch_historical_weather(lat,lon)
-        result = compute_fire_risk_from_records(records)
-        firerisks = result["result"]["firerisks"]
-        tff_liste = result["ttf"]
-        result["result"]["firerisks"] = firerisks[-72:]
-        result["ttf"] = tff_liste[-72:] #kan modifiseres for lenger tidsserier
-        cache.save_to_cache(lat, lon, 800, result)
-        return result # Returnerer siste 72 timer, som vil si alt som er focastet, og ikke initiell data som brukes for kalibrering
+        results = await run_blocking(
+            service.compute_batch, [(location.lat, location.lon) for location in request.locations]
+        )
     except ValueError as exc:
         raise HTTPException(status_code=400, detail=str(exc)) from exc
     except Exception as exc:
-        raise HTTPException(status_code=500, detail=str(exc)) from exc
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(exc)) from exc
+    return fire_risk_batch_response(
+        results, raw_request.headers.get("accept"), raw_request.headers.get("accept-encoding")
+    )
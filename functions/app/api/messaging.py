@@ -1,8 +1,11 @@
 from __future__ import annotations
 
 from fastapi import APIRouter, HTTPException, Query
+from pydantic import BaseModel, Field
 
-from app.services.fire_risk_messaging_service import FireRiskMessagingService
+from app.api.fire_risk import BatchLocation
+from app.services.executors import run_blocking
+from app.services.fire_risk_messaging_service import MAX_BULK_LOCATIONS, FireRiskMessagingService
 
 
 router = APIRouter(prefix="/messaging", tags=["messaging"])
@@ -17,6 +20,33 @@ PUBLISH_RESPONSE_EXAMPLE = {
     "points": 12,
 }
 
+BULK_PUBLISH_RESPONSE_EXAMPLE = {
+    "published": 1,
+    "failed": 1,
+    "results": [
+        {
+            "lat": 60.3913,
+            "lon": 5.3221,
+            "points": 12,
+            "status": "published",
+            "message_id": "1713026600123456",
+            "event_id": "9f0c1e52-4d7b-4a53-a3b4-2a2d5f0c6d1e",
+        },
+        {
+            "lat": 59.9123,
+            "lon": 10.7543,
+            "points": 12,
+            "status": "error",
+            "stage": "compute",
+            "error": "Failed to fetch weather data from MET: ...",
+        },
+    ],
+}
+
+
+class BulkPublishRequest(BaseModel):
+    locations: list[BatchLocation] = Field(..., min_length=1, max_length=MAX_BULK_LOCATIONS)
+
 @router.post(
     "/publish-fire-risk",
     summary="Publish fire risk message",
@@ -36,7 +66,8 @@ async def publish_fire_risk(
 ) -> dict:
     try:
         service = FireRiskMessagingService()
-        return service.publish_for_location(
+        return await run_blocking(
+            service.publish_for_location,
             lat=lat,
             lon=lon,
             points=points,
@@ -45,3 +76,31 @@ async def publish_fire_risk(
         raise HTTPException(status_code=400, detail=str(exc)) from exc
     except RuntimeError as exc:
         raise HTTPException(status_code=502, detail=str(exc)) from exc
+
+
+@router.post(
+    "/publish-fire-risk-batch",
+    summary="Publish fire risk messages for many locations",
+    description=(
+        "Fetches and computes all locations concurrently, publishes through the batching "
+        "Pub/Sub client and writes the event log with batched writes. Returns one outcome per location."
+    ),
+    responses={
+        200: {
+            "description": "Per-location publish outcomes",
+            "content": {"application/json": {"example": BULK_PUBLISH_RESPONSE_EXAMPLE}},
+        },
+        400: {"description": "Invalid request body"},
+    },
+)
+async def publish_fire_risk_batch(request: BulkPublishRequest) -> dict:
+    try:
+        service = FireRiskMessagingService()
+        results = await run_blocking(
+            service.publish_for_locations,
+            [(location.lat, location.lon, location.points) for location in request.locations],
+        )
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+    published = sum(1 for item in results if item["status"] == "published")
+    return {"published": published, "failed": len(results) - published, "results": results}
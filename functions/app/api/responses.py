@@ -0,0 +1,170 @@
+"""
+Pre-rendered responses for fire-risk results.
+
+Results are plain dicts of lists, floats and strings, so they are encoded
+straight to bytes with the C json encoder instead of going through FastAPI's
+jsonable_encoder. Bodies above MIN_COMPRESS_BYTES are compressed with brotli
+or gzip when the client's Accept-Encoding allows it.
+
+The Accept header selects the layout:
+- application/json: the nested {"ttf": [...], "result": {"firerisks": [...]}} layout
+- application/vnd.fireguard.columnar+json: {"timestamps": [...], "ttf": [...]}
+- application/msgpack: the columnar layout as MessagePack
+"""
+from __future__ import annotations
+
+import gzip
+import json
+from datetime import date, datetime
+from typing import Any
+
+from fastapi import Response
+
+from app.services.request_timing import timed
+
+try:
+    import brotli
+except ImportError:  # listed in requirements.txt; without it only gzip is offered
+    brotli = None
+
+try:
+    import msgpack
+except ImportError:  # without msgpack, clients asking for it get JSON
+    msgpack = None
+
+MEDIA_TYPE_JSON = "application/json"
+MEDIA_TYPE_COLUMNAR_JSON = "application/vnd.fireguard.columnar+json"
+MEDIA_TYPE_MSGPACK = "application/msgpack"
+_MSGPACK_ALIASES = ("application/msgpack", "application/x-msgpack", "application/vnd.msgpack")
+MIN_COMPRESS_BYTES = 1024
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+
+def _json_default(value: Any) -> Any:
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if hasattr(value, "tolist"):  # numpy arrays and scalars
+        return value.tolist()
+    return str(value)
+
+
+_encoder = json.JSONEncoder(ensure_ascii=False, allow_nan=False, separators=(",", ":"), default=_json_default)
+
+
+def render_json(value: Any) -> bytes:
+    return _encoder.encode(value).encode("utf-8")
+
+
+def _quality_values(header: str) -> dict[str, float]:
+    accepted: dict[str, float] = {}
+    for part in header.lower().split(","):
+        name, _, params = part.strip().partition(";")
+        if not name:
+            continue
+        quality = 1.0
+        for param in params.split(";"):
+            param = param.strip()
+            if param.startswith("q="):
+                try:
+                    quality = float(param[2:])
+                except ValueError:
+                    quality = 0.0
+        accepted[name.strip()] = quality
+    return accepted
+
+
+def choose_encoding(accept_encoding: str | None) -> str | None:
+    """Returns "br", "gzip" or None for identity."""
+    if not accept_encoding:
+        return None
+    accepted = _quality_values(accept_encoding)
+    wildcard = accepted.get("*", 0.0)
+    if brotli is not None and accepted.get("br", wildcard) > 0:
+        return "br"
+    if accepted.get("gzip", wildcard) > 0:
+        return "gzip"
+    return None
+
+
+def compress(body: bytes, encoding: str | None) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    if encoding == "gzip":
+        return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+    return body
+
+
+def encoded_response(
+    body: bytes,
+    accept_encoding: str | None,
+    media_type: str = MEDIA_TYPE_JSON,
+    status_code: int = 200,
+) -> Response:
+    headers = {"Vary": "Accept, Accept-Encoding"}
+    encoding = choose_encoding(accept_encoding) if len(body) >= MIN_COMPRESS_BYTES else None
+    if encoding is not None:
+        body = compress(body, encoding)
+        headers["Content-Encoding"] = encoding
+    return Response(content=body, status_code=status_code, media_type=media_type, headers=headers)
+
+
+def choose_media_type(accept: str | None) -> str:
+    """Picks the highest-quality supported layout from the Accept header, JSON by default."""
+    if not accept:
+        return MEDIA_TYPE_JSON
+    accepted = _quality_values(accept)
+    candidates = [(accepted.get(MEDIA_TYPE_JSON, 0.0), MEDIA_TYPE_JSON)]
+    candidates.append((accepted.get(MEDIA_TYPE_COLUMNAR_JSON, 0.0), MEDIA_TYPE_COLUMNAR_JSON))
+    if msgpack is not None:
+        candidates.append((max(accepted.get(alias, 0.0) for alias in _MSGPACK_ALIASES), MEDIA_TYPE_MSGPACK))
+    quality, media_type = max(candidates, key=lambda candidate: candidate[0])
+    return media_type if quality > 0 else MEDIA_TYPE_JSON
+
+
+def to_columnar(result: dict[str, Any]) -> dict[str, Any]:
+    """Turns the nested result layout into parallel timestamps[] and ttf[] arrays."""
+    firerisks = (result.get("result") or {}).get("firerisks") or []
+    return {
+        "timestamps": [item.get("timestamp") for item in firerisks if isinstance(item, dict)],
+        "ttf": result.get("ttf"),
+    }
+
+
+def _columnar_item(item: dict[str, Any]) -> dict[str, Any]:
+    if item.get("status") != "ok":
+        return item
+    columnar = {key: value for key, value in item.items() if key not in ("ttf", "result")}
+    columnar.update(to_columnar(item))
+    return columnar
+
+
+def _render(value: Any, media_type: str) -> bytes:
+    if media_type == MEDIA_TYPE_MSGPACK:
+        return msgpack.packb(value, use_bin_type=True, default=_json_default)
+    return render_json(value)
+
+
+@timed("serialize")
+def fire_risk_response(result: dict[str, Any], accept: str | None, accept_encoding: str | None) -> Response:
+    media_type = choose_media_type(accept)
+    if media_type != MEDIA_TYPE_JSON:
+        result = to_columnar(result)
+    return encoded_response(_render(result, media_type), accept_encoding, media_type=media_type)
+
+
+@timed("serialize")
+def fire_risk_batch_response(
+    results: list[dict[str, Any]], accept: str | None, accept_encoding: str | None
+) -> Response:
+    media_type = choose_media_type(accept)
+    if media_type != MEDIA_TYPE_JSON:
+        results = [_columnar_item(item) for item in results]
+    return encoded_response(_render({"results": results}, media_type), accept_encoding, media_type=media_type)
+
+
+@timed("serialize")
+def fire_risk_grid_response(tile: dict[str, Any], accept: str | None, accept_encoding: str | None) -> Response:
+    # Rasteret er allerede kolonnebasert; JSON-variantene er like og bare MessagePack gir en annen kropp.
+    media_type = choose_media_type(accept)
+    return encoded_response(_render(tile, media_type), accept_encoding, media_type=media_type)
@@ -7,6 +7,8 @@ How it works:
 - Server hashes raw_key with SHA-256
 - Looks up Firestore document with id == sha256(raw_key)
 - If exists and not revoked -> authorized
+- The outcome (valid, invalid or revoked) is cached per instance for
+  API_KEY_CACHE_TTL_SECONDS, so revocations take effect within that delay
 
 Why:
 - No UI needed
@@ -16,19 +18,60 @@ Why:
 from __future__ import annotations
 
 import hashlib
-from typing import Optional
+import os
+import time
+from typing import Any, Optional
 
 from fastapi import Header, HTTPException, status
-from firebase_admin import firestore
+
+from app.services.lazy_imports import lazy_module
+from app.services.memory_cache import TtlLruCache
+from app.services.request_timing import stage
+
+firestore = lazy_module("firebase_admin.firestore")
 
 API_KEY_HEADER = "X-API-Key"
 COLLECTION = "api_keys"
+API_KEY_CACHE_TTL_SECONDS = float(os.getenv("API_KEY_CACHE_TTL_SECONDS", "60"))
+
+KEY_VALID = "valid"
+KEY_INVALID = "invalid"
+KEY_REVOKED = "revoked"
+
+# Keyed by the SHA-256 hash, never by the raw key.
+_verification_cache = TtlLruCache(max_entries=int(os.getenv("API_KEY_CACHE_MAX_ENTRIES", "1024")))
 
 
 def _sha256_hex(value: str) -> str:
     return hashlib.sha256(value.encode("utf-8")).hexdigest()
 
 
+def _lookup_key_status(key_hash: str) -> str:
+    db = firestore.client()
+    doc_ref = db.collection(COLLECTION).document(key_hash)
+    snap = doc_ref.get()
+
+    if not snap.exists:
+        return KEY_INVALID
+
+    data = snap.to_dict() or {}
+    if bool(data.get("revoked", False)) is True:
+        return KEY_REVOKED
+    return KEY_VALID
+
+
+def _key_status(key_hash: str) -> str:
+    key_status = _verification_cache.get(key_hash)
+    if key_status is None:
+        key_status = _lookup_key_status(key_hash)
+        _verification_cache.set(key_hash, key_status, expires_at=time.time() + API_KEY_CACHE_TTL_SECONDS)
+    return key_status
+
+
+def cache_stats() -> dict[str, Any]:
+    return {**_verification_cache.stats(), "ttl_seconds": API_KEY_CACHE_TTL_SECONDS}
+
+
 def require_api_key(
     x_api_key: Optional[str] = Header(
         default=None,
@@ -43,19 +86,16 @@ def require_api_key(
             detail=f"Missing {API_KEY_HEADER}",
         )
 
-    key_hash = _sha256_hex(x_api_key.strip())
-    db = firestore.client()
-    doc_ref = db.collection(COLLECTION).document(key_hash)
-    snap = doc_ref.get()
+    with stage("api_key"):
+        key_status = _key_status(_sha256_hex(x_api_key.strip()))
 
-    if not snap.exists:
+    if key_status == KEY_INVALID:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Invalid API key",
         )
 
-    data = snap.to_dict() or {}
-    if bool(data.get("revoked", False)) is True:
+    if key_status == KEY_REVOKED:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="API key revoked",
@@ -0,0 +1,212 @@
+from __future__ import annotations
+
+import atexit
+import os
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any
+
+from app.services.lazy_imports import lazy_module
+
+firestore = lazy_module("firebase_admin.firestore")
+
+
+EVENT_LOG_COLLECTION = "fire_risk_event_log"
+# Firestore rejects batched writes with more than 500 operations.
+MAX_BATCH_WRITES = 500
+
+
+@dataclass(frozen=True)
+class EventLogSettings:
+    max_entries: int = 100
+    max_latency: float = 1.0
+    max_buffered: int = 10_000
+    flush_timeout: float = 0.5
+
+    @classmethod
+    def from_env(cls) -> EventLogSettings:
+        return cls(
+            max_entries=int(os.getenv("EVENT_LOG_MAX_ENTRIES", cls.max_entries)),
+            max_latency=float(os.getenv("EVENT_LOG_MAX_LATENCY", cls.max_latency)),
+            max_buffered=int(os.getenv("EVENT_LOG_MAX_BUFFERED", cls.max_buffered)),
+            flush_timeout=float(os.getenv("EVENT_LOG_FLUSH_TIMEOUT", cls.flush_timeout)),
+        )
+
+
+class EventLogWriter:
+    """
+    Buffered writer for the event log collection.
+
+    write() only queues the document. A background thread commits the queue
+    with batched writes once `max_entries` documents are waiting, when the
+    oldest has waited `max_latency` seconds, or on flush()/stop(). A failed
+    commit is printed and dropped, so it never reaches the publish caller.
+    flush(timeout=...) asks the thread to commit now and waits at most
+    `timeout` seconds for it.
+    """
+
+    def __init__(
+        self,
+        db: Any = None,
+        settings: EventLogSettings | None = None,
+        collection: str = EVENT_LOG_COLLECTION,
+    ) -> None:
+        self.settings = settings or EventLogSettings()
+        self.collection = collection
+        self._db = db
+        self._pending: list[tuple[str, dict[str, Any]]] = []
+        self._waiters: list[threading.Event] = []
+        self._oldest: float | None = None
+        self._condition = threading.Condition()
+        self._thread: threading.Thread | None = None
+        self._flush_lock = threading.Lock()
+        self.stopped = False
+        self.written = 0
+        self.dropped = 0
+
+    @property
+    def db(self) -> Any:
+        # Slås opp ved hver flush, slik at en utbyttet firestore.client() også gjelder skriveren.
+        return self._db if self._db is not None else firestore.client()
+
+    def write(self, document_id: str, data: dict[str, Any]) -> None:
+        self.write_many([(document_id, data)])
+
+    def write_many(self, entries: list[tuple[str, dict[str, Any]]]) -> None:
+        if not entries:
+            return
+        if self.stopped:
+            raise RuntimeError("Event log writer has been stopped.")
+
+        with self._condition:
+            self._pending.extend(entries)
+            overflow = len(self._pending) - self.settings.max_buffered
+            if overflow > 0:
+                # Firestore er nede eller treg; eldste oppføringer forkastes framfor at minnet vokser fritt.
+                del self._pending[:overflow]
+                self._record_dropped_locked(overflow, "Event log buffer full")
+            if self._oldest is None:
+                self._oldest = time.monotonic()
+            self._ensure_thread()
+            self._condition.notify()
+
+    def record_dropped(self, count: int, reason: str) -> None:
+        """Counts and prints entries that never reached the queue or Firestore."""
+        with self._condition:
+            self._record_dropped_locked(count, reason)
+
+    def _record_dropped_locked(self, count: int, reason: str) -> None:
+        self.dropped += count
+        print(f"{reason}, dropped {count} entries")
+
+    def _ensure_thread(self) -> None:
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="event-log-writer", daemon=True)
+            self._thread.start()
+
+    def _take_locked(self) -> tuple[list[tuple[str, dict[str, Any]]], list[threading.Event]]:
+        entries, self._pending = self._pending, []
+        waiters, self._waiters = self._waiters, []
+        self._oldest = None
+        return entries, waiters
+
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                while not self.stopped:
+                    if self._waiters or (self._pending and len(self._pending) >= self.settings.max_entries):
+                        break
+                    if self._oldest is not None:
+                        remaining = self._oldest + self.settings.max_latency - time.monotonic()
+                        if remaining <= 0:
+                            break
+                        self._condition.wait(remaining)
+                    else:
+                        self._condition.wait()
+                if self.stopped:
+                    return
+            self.flush()
+
+    def _commit(self, entries: list[tuple[str, dict[str, Any]]]) -> None:
+        for start in range(0, len(entries), MAX_BATCH_WRITES):
+            chunk = entries[start:start + MAX_BATCH_WRITES]
+            try:
+                db = self.db
+                collection = db.collection(self.collection)
+                batch = db.batch()
+                for document_id, data in chunk:
+                    batch.set(collection.document(document_id), data)
+                batch.commit()
+            except Exception as exc:
+                self.record_dropped(len(chunk), f"Event log write failed ({exc})")
+                continue
+            with self._condition:
+                self.written += len(chunk)
+
+    def flush(self, timeout: float | None = None) -> bool:
+        """
+        Commit everything queued so far, after any commit already in progress.
+
+        Without a timeout the commit runs on the calling thread. With one, the
+        writer thread commits and flush returns False if it has not finished
+        within `timeout` seconds; the entries are still written afterwards.
+        """
+        if timeout is not None:
+            done = threading.Event()
+            with self._condition:
+                if not self._pending or self.stopped:
+                    return not self._pending
+                self._waiters.append(done)
+                self._ensure_thread()
+                self._condition.notify()
+            return done.wait(timeout)
+
+        # Køen tas ut under _flush_lock, så en flush venter alltid på commits som er startet før den.
+        with self._flush_lock:
+            with self._condition:
+                entries, waiters = self._take_locked()
+            if entries:
+                self._commit(entries)
+        for waiter in waiters:
+            waiter.set()
+        return True
+
+    def stop(self) -> None:
+        with self._condition:
+            self.stopped = True
+            self._condition.notify()
+        self.flush()
+
+
+_event_log_writer: EventLogWriter | None = None
+_event_log_lock = threading.Lock()
+
+
+def get_event_log_writer(settings: EventLogSettings | None = None) -> EventLogWriter:
+    """Return the process-wide event log writer, creating it on first use."""
+    global _event_log_writer
+    if _event_log_writer is None:
+        with _event_log_lock:
+            if _event_log_writer is None:
+                _event_log_writer = EventLogWriter(settings=settings or EventLogSettings.from_env())
+    return _event_log_writer
+
+
+def set_event_log_writer(writer: EventLogWriter | None) -> None:
+    """Replace the process-wide event log writer, e.g. with one bound to a fake client."""
+    global _event_log_writer
+    with _event_log_lock:
+        _event_log_writer = writer
+
+
+def shutdown_event_log_writer() -> None:
+    """Flush queued entries and release the process-wide event log writer."""
+    global _event_log_writer
+    with _event_log_lock:
+        writer, _event_log_writer = _event_log_writer, None
+    if writer is not None:
+        writer.stop()
+
+
+atexit.register(shutdown_event_log_writer)
@@ -0,0 +1,59 @@
+"""
+Bounded thread pools for work that must not run on the event loop.
+
+Every HTTP request shares one event loop (see app/tools/asgi_adapter.py), so a
+synchronous Firestore read, MET fetch or model run inside an `async def`
+handler stalls every other request until it returns. Handlers hand that work
+off instead:
+
+  entry = await run_blocking(cache.get_cached_entry, lat, lon, points)
+  result = await run_compute(compute_fire_risk_from_records, records)
+
+Model runs go to a small compute pool (FIRE_RISK_COMPUTE_WORKERS, default up
+to 4, bounded by the CPU count). Blocking I/O goes to a larger I/O pool
+(FIRE_RISK_IO_WORKERS, default 32), because those threads mostly wait. The
+pools are separate, so a burst of long computes can queue up without taking
+the threads that serve cache hits. Code that already runs on an I/O thread
+and needs a model run in the middle, such as the fill of a cache miss, calls
+submit_compute(...).result().
+
+The request's context, including its stage timings, is carried into the
+worker thread.
+"""
+from __future__ import annotations
+
+import asyncio
+import functools
+import os
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable
+
+from app.services.request_timing import bind_context
+
+
+COMPUTE_WORKERS = max(1, int(os.getenv("FIRE_RISK_COMPUTE_WORKERS", str(min(4, os.cpu_count() or 1)))))
+IO_WORKERS = max(1, int(os.getenv("FIRE_RISK_IO_WORKERS", "32")))
+
+# Trådene startes først når det kommer arbeid, så modulen er billig å importere.
+_compute_executor = ThreadPoolExecutor(max_workers=COMPUTE_WORKERS, thread_name_prefix="fire-risk-compute")
+_io_executor = ThreadPoolExecutor(max_workers=IO_WORKERS, thread_name_prefix="fire-risk-io")
+
+
+def submit_compute(fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Future:
+    """Queues a model run on the compute pool. Never call .result() on it from a compute thread."""
+    return _compute_executor.submit(bind_context(fn), *args, **kwargs)
+
+
+async def _run(executor: ThreadPoolExecutor, fn: Callable[..., Any], args: tuple, kwargs: dict) -> Any:
+    call = bind_context(functools.partial(fn, *args, **kwargs))
+    return await asyncio.get_running_loop().run_in_executor(executor, call)
+
+
+async def run_compute(fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+    """Runs CPU-bound fn on the compute pool and awaits the result without blocking the loop."""
+    return await _run(_compute_executor, fn, args, kwargs)
+
+
+async def run_blocking(fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+    """Runs blocking I/O (Firestore, MET, Pub/Sub) on the I/O pool and awaits the result."""
+    return await _run(_io_executor, fn, args, kwargs)
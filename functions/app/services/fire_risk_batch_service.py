@@ -0,0 +1,80 @@
+from __future__ import annotations
+
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any
+
+from app.services.executors import submit_compute
+from app.services.fire_risk_cache_service import FireRiskCacheService
+from app.services.fire_risk_service import compute_fire_risk_from_records
+from app.services.request_timing import bind_context
+from app.services.weather_cache_service import WeatherCacheService
+
+
+MAX_BATCH_SIZE = 200
+MAX_CONCURRENT_FETCHES = 8
+
+
+class FireRiskBatchService:
+    def __init__(
+        self,
+        cache: FireRiskCacheService | None = None,
+        max_concurrent_fetches: int = MAX_CONCURRENT_FETCHES,
+        weather: WeatherCacheService | None = None,
+    ) -> None:
+        self.cache = cache or FireRiskCacheService()
+        self.weather = weather or WeatherCacheService(self.cache)
+        self.max_concurrent_fetches = max_concurrent_fetches
+
+    def _compute_location(self, lat: float, lon: float, points: int) -> dict[str, Any]:
+        records = self.weather.get_records(lat, lon, points)
+        return submit_compute(compute_fire_risk_from_records, records).result()
+
+    def _compute_misses(self, misses: dict[str, tuple[float, float, int]]) -> dict[str, Any]:
+        """Fetch and compute every missed grid cell with bounded concurrency. Values are results or exceptions."""
+        if not misses:
+            return {}
+
+        outcomes: dict[str, Any] = {}
+        workers = min(self.max_concurrent_fetches, len(misses))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {
+                grid_id: executor.submit(bind_context(self._compute_location), lat, lon, points)
+                for grid_id, (lat, lon, points) in misses.items()
+            }
+            for grid_id, future in futures.items():
+                try:
+                    outcomes[grid_id] = future.result()
+                except (ValueError, RuntimeError) as exc:
+                    outcomes[grid_id] = exc
+        return outcomes
+
+    def compute_batch(self, locations: list[tuple[float, float, int]]) -> list[dict[str, Any]]:
+        if len(locations) > MAX_BATCH_SIZE:
+            raise ValueError(f"Batch can contain at most {MAX_BATCH_SIZE} locations")
+
+        grid_ids = [self.cache.get_grid_id(lat, lon, points) for lat, lon, points in locations]
+        cached = self.cache.get_cached_risks(locations)
+
+        # Locations in the same grid cell share one fetch and compute.
+        misses: dict[str, tuple[float, float, int]] = {}
+        for grid_id, location, hit in zip(grid_ids, locations, cached):
+            if hit is None and grid_id not in misses:
+                misses[grid_id] = location
+
+        outcomes = self._compute_misses(misses)
+        self.cache.save_many_to_cache(
+            [(*misses[grid_id], result) for grid_id, result in outcomes.items() if not isinstance(result, Exception)]
+        )
+
+        items: list[dict[str, Any]] = []
+        for grid_id, (lat, lon, points), hit in zip(grid_ids, locations, cached):
+            item: dict[str, Any] = {"lat": lat, "lon": lon, "points": points}
+            outcome = hit if hit is not None else outcomes[grid_id]
+            if isinstance(outcome, ValueError):
+                item.update(status="error", status_code=400, error=str(outcome))
+            elif isinstance(outcome, RuntimeError):
+                item.update(status="error", status_code=502, error=str(outcome))
+            else:
+                item.update(status="ok", cached=hit is not None, **outcome)
+            items.append(item)
+        return items
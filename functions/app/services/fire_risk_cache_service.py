@@ -1,41 +1,297 @@
-from firebase_admin import firestore
+from datetime import datetime, timezone
+import os
 import time
+from uuid import uuid4
+
+from app.services.lazy_imports import lazy_module
+from app.services.memory_cache import TtlLruCache
+from app.services.request_timing import timed
+
+# Firestore-klienten og google.api_core (grpc) lastes først når cachen brukes, ikke ved kaldstart.
+firestore = lazy_module("firebase_admin.firestore")
+api_exceptions = lazy_module("google.api_core.exceptions")
+
+# Firestore rejects batched writes with more than 500 operations.
+MAX_BATCH_WRITES = 500
+TIMESLOT_SECONDS = 3600
+
+# Lease: hindrer at flere instanser henter og beregner samme grid-celle samtidig.
+LEASE_COLLECTION = "fire_risk_cache_leases"
+LEASE_SECONDS = 30
+LEASE_POLL_SECONDS = 0.25
+LEASE_OWNER = f"{os.getenv('K_REVISION', 'local')}-{uuid4().hex[:12]}"
+
+# Modelltilstand per grid-celle (uavhengig av points og timeslot), brukt til å gjenoppta simuleringen.
+MODEL_STATE_COLLECTION = "fire_risk_model_state"
+
+# L1: prosess-lokal cache foran Firestore (L2). Lever så lenge instansen er varm.
+# Verdiene er (result, computed_at).
+L1_CACHE = TtlLruCache(max_entries=int(os.getenv("FIRE_RISK_L1_MAX_ENTRIES", "1024")))
+
+# Stale-while-revalidate: hvor gammelt et resultat fra en tidligere timeslot kan være og fortsatt serveres. 0 slår det av.
+MAX_STALE_SECONDS = int(os.getenv("FIRE_RISK_MAX_STALE_SECONDS", "3600"))
+# Siste kjente resultat per grid-celle og points, på tvers av timesloter. Verdiene er (result, computed_at).
+LAST_KNOWN_CACHE = TtlLruCache(max_entries=int(os.getenv("FIRE_RISK_LAST_KNOWN_MAX_ENTRIES", "1024")))
 
 class FireRiskCacheService:
-    def __init__(self):
+    def __init__(self, memory_cache=None, last_known_cache=None):
         self.db = firestore.client()
-        self.grid_res = 0.02 
+        self.grid_res = 0.02
         self.collection_name = "fire_risk_cache"
+        self.memory_cache = memory_cache if memory_cache is not None else L1_CACHE
+        self.last_known_cache = last_known_cache if last_known_cache is not None else LAST_KNOWN_CACHE
+
+    def current_timeslot(self):
+        return int(time.time() // TIMESLOT_SECONDS) * TIMESLOT_SECONDS
+
+    def _snap(self, lat, lon):
+        return round(lat / self.grid_res) * self.grid_res, round(lon / self.grid_res) * self.grid_res
+
+    def get_cell_id(self, lat, lon):
+        slat, slon = self._snap(lat, lon)
+        return f"cell_{slat:.3f}_{slon:.3f}"
+
+    def get_grid_id(self, lat, lon, points, timeslot=None):
+
+        slat, slon = self._snap(lat, lon)
+
+        if timeslot is None:
+            timeslot = self.current_timeslot()
 
-    def get_grid_id(self, lat, lon, points):
-    
-        slat = round(lat / self.grid_res) * self.grid_res
-        slon = round(lon / self.grid_res) * self.grid_res
-        
-        timeslot = int(time.time() // 3600) * 3600
-        
         return f"grid_{slat:.3f}_{slon:.3f}_p{points}_t{timeslot}"
 
-    def get_cached_risk(self, lat, lon, points):
+    def _last_known_key(self, lat, lon, points):
+        return f"{self.get_cell_id(lat, lon)}_p{points}"
+
+    def _remember(self, grid_id, result, timeslot=None, computed_at=None, location=None):
+        # L1-oppføringen utløper sammen med timesloten den tilhører.
+        if timeslot is None:
+            timeslot = self.current_timeslot()
+        if computed_at is None:
+            computed_at = time.time()
+        self.memory_cache.set(grid_id, (result, computed_at), expires_at=timeslot + TIMESLOT_SECONDS)
+        if location is not None and MAX_STALE_SECONDS > 0:
+            previous = self.last_known_cache.get(self._last_known_key(*location))
+            if previous is None or previous[1] <= computed_at:
+                self.last_known_cache.set(
+                    self._last_known_key(*location), (result, computed_at), expires_at=computed_at + MAX_STALE_SECONDS
+                )
+
+    @timed("cache_read")
+    def get_cached_entry(self, lat, lon, points):
+        """Returnerer (result, computed_at) for gjeldende timeslot, eller None."""
         grid_id = self.get_grid_id(lat, lon, points)
+        entry = self.memory_cache.get(grid_id)
+        if entry is not None:
+            return entry
+
         doc_ref = self.db.collection(self.collection_name).document(grid_id)
         doc = doc_ref.get()
 
         if doc.exists:
-            print(f"cache-treff for slot: {grid_id}")
-            return doc.to_dict().get('result')
-        
+            data = doc.to_dict() or {}
+            result = data.get('result')
+            if result is not None:
+                computed_at = data.get('timestamp', time.time())
+                self._remember(grid_id, result, computed_at=computed_at, location=(lat, lon, points))
+                return result, computed_at
+
         return None
 
-    def save_to_cache(self, lat, lon, points, result):
-        grid_id = self.get_grid_id(lat, lon, points)
-        doc_ref = self.db.collection(self.collection_name).document(grid_id)
-        
-        
-        doc_ref.set({
+    def get_cached_risk(self, lat, lon, points):
+        entry = self.get_cached_entry(lat, lon, points)
+        return entry[0] if entry is not None else None
+
+    @timed("cache_read")
+    def get_stale_entry(self, lat, lon, points, max_stale_seconds=None):
+        """
+        Siste kjente (result, computed_at) fra en tidligere timeslot, hvis det ikke er eldre enn max_stale_seconds.
+        Ser først i instansens minne og deretter på de forrige timeslotene i Firestore.
+        """
+        if max_stale_seconds is None:
+            max_stale_seconds = MAX_STALE_SECONDS
+        if max_stale_seconds <= 0:
+            return None
+        oldest = time.time() - max_stale_seconds
+
+        entry = self.last_known_cache.get(self._last_known_key(lat, lon, points))
+        if entry is not None and entry[1] >= oldest:
+            return entry
+
+        current = self.current_timeslot()
+        slots = range(1, int(-(-max_stale_seconds // TIMESLOT_SECONDS)) + 1)
+        collection = self.db.collection(self.collection_name)
+        refs = [collection.document(self.get_grid_id(lat, lon, points, current - slot * TIMESLOT_SECONDS)) for slot in slots]
+        newest = None
+        for doc in self.db.get_all(refs):
+            if not doc.exists:
+                continue
+            data = doc.to_dict() or {}
+            result, computed_at = data.get('result'), data.get('timestamp')
+            if result is None or computed_at is None or computed_at < oldest:
+                continue
+            if newest is None or computed_at > newest[1]:
+                newest = (result, computed_at)
+        return newest
+
+    def _read_cached_document(self, grid_id):
+        doc = self.db.collection(self.collection_name).document(grid_id).get()
+        if doc.exists:
+            return doc.to_dict() or {}
+        return None
+
+    @staticmethod
+    def _document_location(document):
+        location = document.get('location')
+        if not location or 'points' not in document:
+            return None
+        return location['lat'], location['lon'], document['points']
+
+    @timed("lease")
+    def try_acquire_lease(self, grid_id):
+        """Prøver å ta lease for grid-cellen. Et utløpt lease fra en annen instans overtas."""
+        doc_ref = self.db.collection(LEASE_COLLECTION).document(grid_id)
+        expires_at = time.time() + LEASE_SECONDS
+        # expire_at er TTL-feltet; leaser etter krasjede instanser slettes av compaction-jobben eller en TTL-policy.
+        lease = {
+            'owner': LEASE_OWNER,
+            'expires_at': expires_at,
+            'expire_at': datetime.fromtimestamp(expires_at, tz=timezone.utc),
+        }
+        try:
+            doc_ref.create(lease)
+            return True
+        except api_exceptions.AlreadyExists:
+            pass
+
+        snap = doc_ref.get()
+        if snap.exists:
+            if (snap.to_dict() or {}).get('expires_at', 0) > time.time():
+                return False
+            # Sletter bare hvis ingen andre har overtatt leaset siden vi leste det.
+            try:
+                doc_ref.delete(option=self.db.write_option(last_update_time=snap.update_time))
+            except api_exceptions.FailedPrecondition:
+                return False
+
+        try:
+            doc_ref.create(lease)
+            return True
+        except api_exceptions.AlreadyExists:
+            return False
+
+    @timed("lease")
+    def release_lease(self, grid_id):
+        doc_ref = self.db.collection(LEASE_COLLECTION).document(grid_id)
+        snap = doc_ref.get()
+        if snap.exists and (snap.to_dict() or {}).get('owner') == LEASE_OWNER:
+            doc_ref.delete()
+
+    @timed("lease_wait")
+    def wait_for_cached_risk(self, grid_id, timeout):
+        """Venter på at lease-eieren skriver resultatet til Firestore. Returnerer None ved timeout."""
+        deadline = time.monotonic() + timeout
+        while True:
+            document = self._read_cached_document(grid_id)
+            result = document.get('result') if document is not None else None
+            if result is not None:
+                self._remember(
+                    grid_id,
+                    result,
+                    computed_at=document.get('timestamp'),
+                    location=self._document_location(document),
+                )
+                return result
+            if time.monotonic() >= deadline:
+                return None
+            time.sleep(LEASE_POLL_SECONDS)
+
+    @timed("cache_read")
+    def get_cached_risks(self, locations, timeslot=None):
+        """Slår opp alle (lat, lon, points) i L1 og deretter i ett get_all-kall. Returnerer resultater i samme rekkefølge, None ved miss."""
+        grid_ids = [self.get_grid_id(lat, lon, points, timeslot) for lat, lon, points in locations]
+
+        hits = {}
+        for grid_id in dict.fromkeys(grid_ids):
+            entry = self.memory_cache.get(grid_id)
+            if entry is not None:
+                hits[grid_id] = entry[0]
+
+        collection = self.db.collection(self.collection_name)
+        refs = [collection.document(grid_id) for grid_id in dict.fromkeys(grid_ids) if grid_id not in hits]
+        if refs:
+            for doc in self.db.get_all(refs):
+                if doc.exists:
+                    data = doc.to_dict() or {}
+                    result = data.get('result')
+                    if result is not None:
+                        hits[doc.id] = result
+                        self._remember(doc.id, result, timeslot, computed_at=data.get('timestamp'))
+
+        return [hits.get(grid_id) for grid_id in grid_ids]
+
+    def expires_at(self, timeslot=None):
+        """Når et cache-dokument for timesloten ikke lenger trengs, heller ikke som stale-svar."""
+        if timeslot is None:
+            timeslot = self.current_timeslot()
+        return datetime.fromtimestamp(timeslot + TIMESLOT_SECONDS + max(MAX_STALE_SECONDS, 0), tz=timezone.utc)
+
+    def _cache_document(self, grid_id, lat, lon, points, result, timeslot=None):
+        return {
             'grid_id': grid_id,
             'points': points,
             'timestamp': time.time(),
-            'result': result, # Dette lagrer "ttf" og "result" 
+            'expire_at': self.expires_at(timeslot), # TTL-felt; slettes av compaction-jobben eller en Firestore TTL-policy
+            'result': result, # Dette lagrer "ttf" og "result"
             'location': {'lat': lat, 'lon': lon}
-        })
\ No newline at end of file
+        }
+
+    @timed("cache_write")
+    def save_to_cache(self, lat, lon, points, result):
+        grid_id = self.get_grid_id(lat, lon, points)
+        doc_ref = self.db.collection(self.collection_name).document(grid_id)
+
+
+        document = self._cache_document(grid_id, lat, lon, points, result)
+        doc_ref.set(document)
+        self._remember(grid_id, result, computed_at=document['timestamp'], location=(lat, lon, points))
+
+    @timed("cache_write")
+    def save_many_to_cache(self, entries, timeslot=None):
+        """Lagrer (lat, lon, points, result) med batched writes, maks MAX_BATCH_WRITES per commit."""
+        collection = self.db.collection(self.collection_name)
+        batch = self.db.batch()
+        pending = 0
+        for lat, lon, points, result in entries:
+            grid_id = self.get_grid_id(lat, lon, points, timeslot)
+            document = self._cache_document(grid_id, lat, lon, points, result, timeslot)
+            batch.set(collection.document(grid_id), document)
+            self._remember(grid_id, result, timeslot, computed_at=document['timestamp'], location=(lat, lon, points))
+            pending += 1
+            if pending == MAX_BATCH_WRITES:
+                batch.commit()
+                batch = self.db.batch()
+                pending = 0
+
+        if pending:
+            batch.commit()
+
+    @timed("cache_read")
+    def get_model_state(self, lat, lon):
+        doc = self.db.collection(MODEL_STATE_COLLECTION).document(self.get_cell_id(lat, lon)).get()
+        if doc.exists:
+            return (doc.to_dict() or {}).get('state')
+        return None
+
+    @timed("cache_write")
+    def save_model_state(self, lat, lon, state):
+        cell_id = self.get_cell_id(lat, lon)
+        self.db.collection(MODEL_STATE_COLLECTION).document(cell_id).set({
+            'cell_id': cell_id,
+            'state': state,
+            'updated_at': time.time(),
+            'location': {'lat': lat, 'lon': lon}
+        })
+
+    def l1_stats(self):
+        return self.memory_cache.stats()
@@ -0,0 +1,121 @@
+from __future__ import annotations
+
+import time
+from datetime import datetime, timezone
+from typing import Any
+
+from app.services.fire_risk_cache_service import LEASE_COLLECTION, MAX_BATCH_WRITES, MAX_STALE_SECONDS, TIMESLOT_SECONDS
+from app.services.lazy_imports import lazy_module
+
+firestore = lazy_module("firebase_admin.firestore")
+
+
+CACHE_COLLECTION = "fire_risk_cache"
+# Øvre grense per kjøring, slik at jobben holder seg innenfor timeouten. Resten tas neste time.
+MAX_DELETES_PER_RUN = 20_000
+# Dokumenter skrevet før expire_at ble innført ryddes ut fra 'timestamp' når de er så gamle.
+LEGACY_MAX_AGE_SECONDS = 2 * TIMESLOT_SECONDS + max(MAX_STALE_SECONDS, 0)
+SIZE_SAMPLE_DOCUMENTS = 50
+
+# Firestore: https://firebase.google.com/docs/firestore/storage-size
+DOCUMENT_OVERHEAD_BYTES = 32
+DOCUMENT_NAME_OVERHEAD_BYTES = 16
+
+
+def _value_size(value: Any) -> int:
+    if value is None or isinstance(value, bool):
+        return 1
+    if isinstance(value, (int, float, datetime)):
+        return 8
+    if isinstance(value, str):
+        return len(value.encode("utf-8")) + 1
+    if isinstance(value, bytes):
+        return len(value)
+    if isinstance(value, dict):
+        return sum(len(str(key).encode("utf-8")) + 1 + _value_size(item) for key, item in value.items())
+    if isinstance(value, (list, tuple)):
+        return sum(_value_size(item) for item in value)
+    return len(str(value).encode("utf-8")) + 1
+
+
+def estimate_document_size(collection: str, document_id: str, data: dict[str, Any]) -> int:
+    """Storage size of one document per Firestore's documented size rules."""
+    name_size = len(collection.encode("utf-8")) + 1 + len(document_id.encode("utf-8")) + 1 + DOCUMENT_NAME_OVERHEAD_BYTES
+    return name_size + _value_size(data) + DOCUMENT_OVERHEAD_BYTES
+
+
+class FireRiskCacheCompactionService:
+    """
+    Deletes expired fire_risk_cache slots and leftover leases in batches and
+    reports the cache collection's size.
+    """
+
+    def __init__(self, max_deletes: int = MAX_DELETES_PER_RUN) -> None:
+        self.db = firestore.client()
+        self.collection = self.db.collection(CACHE_COLLECTION)
+        self.leases = self.db.collection(LEASE_COLLECTION)
+        self.max_deletes = max_deletes
+
+    def _delete_matching(self, collection: Any, field: str, cutoff: Any, budget: int) -> int:
+        deleted = 0
+        while deleted < budget:
+            limit = min(MAX_BATCH_WRITES, budget - deleted)
+            docs = list(collection.where(field, "<", cutoff).limit(limit).stream())
+            if not docs:
+                break
+            batch = self.db.batch()
+            for doc in docs:
+                batch.delete(doc.reference)
+            batch.commit()
+            deleted += len(docs)
+            if len(docs) < limit:
+                break
+        return deleted
+
+    def delete_expired(self, now: float | None = None) -> int:
+        if now is None:
+            now = time.time()
+        deleted = self._delete_matching(
+            self.collection, "expire_at", datetime.fromtimestamp(now, tz=timezone.utc), self.max_deletes
+        )
+        deleted += self._delete_matching(
+            self.collection, "timestamp", now - LEGACY_MAX_AGE_SECONDS, self.max_deletes - deleted
+        )
+        return deleted
+
+    def delete_expired_leases(self, now: float | None = None, budget: int | None = None) -> int:
+        """
+        Deletes leases left behind by instances that died before release_lease.
+        Matches on 'expires_at', which every lease has, also those written before 'expire_at'.
+        """
+        if now is None:
+            now = time.time()
+        if budget is None:
+            budget = self.max_deletes
+        return self._delete_matching(self.leases, "expires_at", now, budget)
+
+    def report(self) -> dict[str, Any]:
+        aggregate = self.collection.count().get()
+        documents = int(aggregate[0][0].value)
+        sample = [
+            estimate_document_size(CACHE_COLLECTION, doc.id, doc.to_dict() or {})
+            for doc in self.collection.limit(SIZE_SAMPLE_DOCUMENTS).stream()
+        ]
+        average = sum(sample) / len(sample) if sample else 0
+        return {
+            "documents": documents,
+            "average_document_bytes": round(average),
+            "estimated_bytes": round(average * documents),
+        }
+
+    def compact(self, now: float | None = None) -> dict[str, Any]:
+        started = time.monotonic()
+        deleted = self.delete_expired(now)
+        leases_deleted = self.delete_expired_leases(now, self.max_deletes - deleted)
+        return {
+            "deleted": deleted,
+            "leases_deleted": leases_deleted,
+            "limit_reached": deleted + leases_deleted >= self.max_deletes,
+            **self.report(),
+            "duration_seconds": round(time.monotonic() - started, 3),
+        }
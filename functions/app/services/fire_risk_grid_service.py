@@ -0,0 +1,158 @@
+from __future__ import annotations
+
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Any
+
+from app.services.executors import submit_compute
+from app.services.fire_risk_batch_service import MAX_CONCURRENT_FETCHES
+from app.services.fire_risk_cache_service import TIMESLOT_SECONDS, FireRiskCacheService
+from app.services.fire_risk_service import compute_fire_risk_from_record_sets
+from app.services.request_timing import bind_context
+from app.services.weather_cache_service import WeatherCacheService
+from app.services.weather_ingest import parse_timestamp
+
+
+MAX_GRID_CELLS = 256
+
+
+class FireRiskGridService:
+    """
+    Fire risk for every cache cell in a bounding box, as one raster tile.
+
+    Cells already in the cache for the current timeslot are read in one
+    get_all. The remaining cells get their weather concurrently. They are then
+    run through the model together in one batched pass and written back with
+    batched writes, so a following compute-by-location in any of them is a hit.
+    """
+
+    def __init__(
+        self,
+        cache: FireRiskCacheService | None = None,
+        max_concurrent_fetches: int = MAX_CONCURRENT_FETCHES,
+        weather: WeatherCacheService | None = None,
+    ) -> None:
+        self.cache = cache or FireRiskCacheService()
+        self.weather = weather or WeatherCacheService(self.cache)
+        self.max_concurrent_fetches = max_concurrent_fetches
+
+    def _axis(self, low: float, high: float, resolution: float) -> list[float]:
+        # Regner i hele cellenummer for å unngå flyttallsdrift langs aksen.
+        step = round(resolution / self.cache.grid_res)
+        if step < 1 or abs(step * self.cache.grid_res - resolution) > 1e-9:
+            raise ValueError(f"resolution must be a positive multiple of {self.cache.grid_res}")
+        first, last = round(low / self.cache.grid_res), round(high / self.cache.grid_res)
+        return [round(index * self.cache.grid_res, 6) for index in range(first, last + 1, step)]
+
+    def cells(
+        self, min_lat: float, min_lon: float, max_lat: float, max_lon: float, resolution: float
+    ) -> tuple[list[float], list[float]]:
+        """Cell centres on the cache grid, rows north to south and columns west to east."""
+        if min_lat > max_lat or min_lon > max_lon:
+            raise ValueError("Bounding box must have min_lat <= max_lat and min_lon <= max_lon")
+        lats = self._axis(min_lat, max_lat, resolution)[::-1]
+        lons = self._axis(min_lon, max_lon, resolution)
+        if len(lats) * len(lons) > MAX_GRID_CELLS:
+            raise ValueError(
+                f"Grid has {len(lats) * len(lons)} cells; at most {MAX_GRID_CELLS} are allowed per request"
+            )
+        return lats, lons
+
+    def _fetch_records(self, locations: list[tuple[float, float]], points: int, timeslot: int) -> list[Any]:
+        """Records per location, or the ValueError/RuntimeError raised while getting them."""
+        outcomes: list[Any] = []
+        with ThreadPoolExecutor(max_workers=min(self.max_concurrent_fetches, len(locations))) as executor:
+            futures = [
+                executor.submit(bind_context(self.weather.get_records), lat, lon, points, timeslot)
+                for lat, lon in locations
+            ]
+            for future in futures:
+                try:
+                    outcomes.append(future.result())
+                except (ValueError, RuntimeError) as exc:
+                    outcomes.append(exc)
+        return outcomes
+
+    def compute_grid(
+        self,
+        min_lat: float,
+        min_lon: float,
+        max_lat: float,
+        max_lon: float,
+        resolution: float,
+        points: int,
+    ) -> dict[str, Any]:
+        lats, lons = self.cells(min_lat, min_lon, max_lat, max_lon, resolution)
+        locations = [(lat, lon) for lat in lats for lon in lons]
+        timeslot = self.cache.current_timeslot()
+
+        results: list[Any] = self.cache.get_cached_risks(
+            [(lat, lon, points) for lat, lon in locations], timeslot=timeslot
+        )
+        cached = sum(1 for result in results if result is not None)
+
+        misses = [index for index, result in enumerate(results) if result is None]
+        computed = 0
+        if misses:
+            fetched = self._fetch_records([locations[index] for index in misses], points, timeslot)
+            ready = [(index, records) for index, records in zip(misses, fetched) if not isinstance(records, Exception)]
+            for index, records in zip(misses, fetched):
+                if isinstance(records, Exception):
+                    results[index] = records
+
+            if ready:
+                outcomes = submit_compute(compute_fire_risk_from_record_sets, [records for _, records in ready]).result()
+                for (index, _), result in zip(ready, outcomes):
+                    results[index] = result
+                self.cache.save_many_to_cache(
+                    [(*locations[index], points, results[index]) for index, _ in ready], timeslot
+                )
+                computed = len(ready)
+
+        return self._tile(lats, lons, resolution, points, timeslot, results, cached, computed)
+
+    def _tile(
+        self,
+        lats: list[float],
+        lons: list[float],
+        resolution: float,
+        points: int,
+        timeslot: int,
+        results: list[Any],
+        cached: int,
+        computed: int,
+    ) -> dict[str, Any]:
+        # Modellen gir sammenhengende timeverdier fra første tidssteg, så bare starttimen må plasseres på aksen.
+        placed: list[tuple[int, list[float]]] = []
+        errors: list[dict[str, Any]] = []
+        for (lat, lon), result in zip(((lat, lon) for lat in lats for lon in lons), results):
+            if isinstance(result, Exception):
+                status_code = 400 if isinstance(result, ValueError) else 502
+                errors.append({"lat": lat, "lon": lon, "status_code": status_code, "error": str(result)})
+                placed.append((0, []))
+                continue
+            firerisks = result["result"]["firerisks"]
+            start = parse_timestamp(firerisks[0]["timestamp"]).timestamp() if firerisks else timeslot
+            placed.append((max(0, round((start - timeslot) / TIMESLOT_SECONDS)), result["ttf"]))
+
+        hours = max((offset + len(ttf) for offset, ttf in placed), default=0)
+        ttf: list[list[float | None]] = [[None] * len(placed) for _ in range(hours)]
+        for cell, (offset, values) in enumerate(placed):
+            for hour, value in enumerate(values):
+                ttf[offset + hour][cell] = value
+
+        return {
+            "bbox": {"min_lat": min(lats), "min_lon": min(lons), "max_lat": max(lats), "max_lon": max(lons)},
+            "resolution": resolution,
+            "points": points,
+            "shape": [hours, len(lats), len(lons)],
+            "lats": lats,
+            "lons": lons,
+            "timestamps": [
+                str(datetime.fromtimestamp(timeslot + hour * TIMESLOT_SECONDS, tz=timezone.utc)) for hour in range(hours)
+            ],
+            "ttf": ttf,
+            "cached": cached,
+            "computed": computed,
+            "errors": errors,
+        }
@@ -0,0 +1,156 @@
+from __future__ import annotations
+
+import math
+import time
+from datetime import datetime, timedelta, timezone
+from typing import TYPE_CHECKING, Any, Callable
+
+from MET_client import HISTORY_SPINUP_DAYS, HourlyWeather, fetch_historical_weather, fetch_historical_weather_many
+from app.services.fire_risk_cache_service import FireRiskCacheService
+from app.services.fire_risk_service import compute_fire_risk_series_with_state, compute_fire_risk_with_state
+
+if TYPE_CHECKING:
+    from app.services.fire_risk_kernel import ModelState
+
+
+# Timer som returneres: alt som er forecastet fra starten av dagens UTC-døgn.
+HISTORY_HOURS = 72
+# Historikken caches under en egen points-verdi, utenfor 1–72 som prognoseendepunktene bruker.
+HISTORY_CACHE_POINTS = 800
+
+
+class FireRiskHistoryService:
+    """
+    Computes the historical-plus-forecast fire risk for a location.
+
+    The model state at the start of each UTC day is saved per grid cell. Later
+    calls resume from it and only fetch and simulate the days since, instead of
+    spinning up over HISTORY_SPINUP_DAYS of history every time. States older
+    than the spin-up window are ignored.
+    """
+
+    def __init__(self, cache: FireRiskCacheService | None = None, clock: Callable[[], float] | None = None) -> None:
+        self.cache = cache or FireRiskCacheService()
+        self.clock = clock or time.time
+
+    def _load_state(self, lat: float, lon: float, day_start: datetime) -> ModelState | None:
+        data = self.cache.get_model_state(lat, lon)
+        if data is None:
+            return None
+        from app.services.fire_risk_kernel import ModelState
+
+        try:
+            state = ModelState.from_dict(data)
+        except (KeyError, TypeError, ValueError) as exc:
+            print(f"Ignoring invalid model state for ({lat}, {lon}): {exc}")
+            return None
+        if state.timestamp.tzinfo is None or not timedelta(0) <= day_start - state.timestamp <= timedelta(days=HISTORY_SPINUP_DAYS):
+            return None
+        return state
+
+    def _day_start(self) -> datetime:
+        now = datetime.fromtimestamp(self.clock(), tz=timezone.utc)
+        return now.replace(hour=0, minute=0, second=0, microsecond=0)
+
+    @staticmethod
+    def _past_days(state: ModelState | None, day_start: datetime) -> int:
+        if state is None:
+            return HISTORY_SPINUP_DAYS
+        return math.ceil((day_start - state.timestamp) / timedelta(days=1))
+
+    def _run(
+        self, lat: float, lon: float, state: ModelState | None, day_start: datetime, weather: HourlyWeather | None = None
+    ):
+        if weather is not None:
+            return compute_fire_risk_series_with_state(weather.to_series(), state, snapshot_at=day_start)
+        records = fetch_historical_weather(lat, lon, past_days=self._past_days(state, day_start))
+        return compute_fire_risk_with_state(records, state, snapshot_at=day_start)
+
+    def _compute(
+        self, lat: float, lon: float, state: ModelState | None, day_start: datetime, weather: HourlyWeather | None = None
+    ) -> dict[str, Any]:
+        try:
+            result, new_state = self._run(lat, lon, state, day_start, weather)
+        except ValueError:
+            if state is None:
+                raise
+            # Værdataene dekket ikke tidspunktet for lagret tilstand; spinn opp på nytt.
+            state = None
+            result, new_state = self._run(lat, lon, None, day_start)
+
+        if new_state is not None and (state is None or new_state.timestamp > state.timestamp):
+            self.cache.save_model_state(lat, lon, new_state.to_dict())
+
+        result["result"]["firerisks"] = result["result"]["firerisks"][-HISTORY_HOURS:]
+        result["ttf"] = result["ttf"][-HISTORY_HOURS:]
+        return result
+
+    def compute_for_location(self, lat: float, lon: float) -> dict[str, Any]:
+        day_start = self._day_start()
+        return self._compute(lat, lon, self._load_state(lat, lon, day_start), day_start)
+
+    def compute_for_locations(self, locations: list[tuple[float, float]]) -> list[dict[str, Any] | Exception]:
+        """
+        compute_for_location for many locations. Locations that need the same number of past days share
+        Open-Meteo requests (one per chunk of coordinates) instead of one request each. Failed locations
+        get their ValueError or RuntimeError in place of a result.
+        """
+        day_start = self._day_start()
+        states = [self._load_state(lat, lon, day_start) for lat, lon in locations]
+        groups: dict[int, list[int]] = {}
+        for index, state in enumerate(states):
+            groups.setdefault(self._past_days(state, day_start), []).append(index)
+
+        outcomes: list[Any] = [None] * len(locations)
+        for past_days, indices in groups.items():
+            try:
+                weather = fetch_historical_weather_many([locations[index] for index in indices], past_days=past_days)
+            except (ValueError, RuntimeError) as exc:
+                for index in indices:
+                    outcomes[index] = exc
+                continue
+            for index, hourly in zip(indices, weather):
+                try:
+                    outcomes[index] = self._compute(*locations[index], states[index], day_start, hourly)
+                except (ValueError, RuntimeError) as exc:
+                    outcomes[index] = exc
+        return outcomes
+
+    def compute_batch(self, locations: list[tuple[float, float]]) -> list[dict[str, Any]]:
+        """
+        History for many locations, one item per location in request order. Cache hits are read in one
+        get_all; the misses (one per grid cell) go through compute_for_locations and are written back
+        with batched writes.
+        """
+        keys = [(lat, lon, HISTORY_CACHE_POINTS) for lat, lon in locations]
+        grid_ids = [self.cache.get_grid_id(*key) for key in keys]
+        cached = self.cache.get_cached_risks(keys)
+
+        misses: dict[str, tuple[float, float]] = {}
+        for grid_id, location, hit in zip(grid_ids, locations, cached):
+            if hit is None and grid_id not in misses:
+                misses[grid_id] = location
+
+        outcomes: dict[str, Any] = {}
+        if misses:
+            outcomes = dict(zip(misses, self.compute_for_locations(list(misses.values()))))
+            self.cache.save_many_to_cache(
+                [
+                    (*misses[grid_id], HISTORY_CACHE_POINTS, result)
+                    for grid_id, result in outcomes.items()
+                    if not isinstance(result, Exception)
+                ]
+            )
+
+        items: list[dict[str, Any]] = []
+        for grid_id, (lat, lon), hit in zip(grid_ids, locations, cached):
+            item: dict[str, Any] = {"lat": lat, "lon": lon}
+            outcome = hit if hit is not None else outcomes[grid_id]
+            if isinstance(outcome, ValueError):
+                item.update(status="error", status_code=400, error=str(outcome))
+            elif isinstance(outcome, RuntimeError):
+                item.update(status="error", status_code=502, error=str(outcome))
+            else:
+                item.update(status="ok", cached=hit is not None, **outcome)
+            items.append(item)
+        return items
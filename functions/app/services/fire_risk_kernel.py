@@ -0,0 +1,338 @@
+"""
+Vectorized implementation of the frcm fire-risk model.
+
+Mirrors frcm.fireriskmodel.compute step for step, but works on columnar numpy
+arrays instead of pydantic objects:
+- saturation and ventilation terms are computed as whole-array expressions
+- the wall diffusion step is a single matrix product per time step
+- several series on the same time grid can be integrated in one pass
+- a run can resume from a saved ModelState instead of the default initial state
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+
+import numpy as np
+
+# Model parameters, identical to frcm.fireriskmodel.parameters
+PANEL_THICKNESS = 0.012
+SUB_LAYERS = 10
+DELTA_X = PANEL_THICKNESS / SUB_LAYERS
+D_W_S = 3.0 * 10 ** (-10)
+D_W_A = 2.5 * 10 ** (-5)
+DELTA_T = 720
+BOUNDARY_LAYER = 0.01
+GAS_CONSTANT = 8.314
+MOL_WEIGHT = 0.018015
+FOURIER = 0.15
+
+T_C_IN = 22
+RH_IN = 0.35
+A_EX = 60
+VOL = 120
+SUPPLY_24H = 1
+RHO_WOOD = 500
+GAMMA = 380
+
+STEPS_PER_HOUR = int(3600 / DELTA_T)
+
+
+@dataclass
+class WeatherSeries:
+    """Columnar weather input. Timestamps are stored as seconds relative to `origin`."""
+
+    origin: datetime
+    offsets: np.ndarray
+    temperature: np.ndarray
+    humidity: np.ndarray
+    wind_speed: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.offsets)
+
+    @classmethod
+    def from_timestamps(cls, timestamps: list[datetime], temperature, humidity, wind_speed) -> WeatherSeries:
+        if not timestamps:
+            raise ValueError("Weather data is empty")
+        origin = timestamps[0]
+        return cls(
+            origin=origin,
+            offsets=np.array([(timestamp - origin).total_seconds() for timestamp in timestamps], dtype=float),
+            temperature=np.asarray(temperature, dtype=float),
+            humidity=np.asarray(humidity, dtype=float),
+            wind_speed=np.asarray(wind_speed, dtype=float),
+        )
+
+
+@dataclass
+class ModelState:
+    """Model state at one grid time step; enough to continue the simulation from there."""
+
+    timestamp: datetime
+    wall: np.ndarray
+    rh_in: float
+    cw_in: float
+    c_wall: float
+
+    def to_dict(self) -> dict:
+        return {
+            "timestamp": self.timestamp.isoformat(),
+            "wall": [float(value) for value in self.wall],
+            "rh_in": float(self.rh_in),
+            "cw_in": float(self.cw_in),
+            "c_wall": float(self.c_wall),
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> ModelState:
+        wall = np.asarray(data["wall"], dtype=float)
+        if wall.shape != (SUB_LAYERS,):
+            raise ValueError(f"Model state must have {SUB_LAYERS} wall layers")
+        return cls(
+            timestamp=datetime.fromisoformat(data["timestamp"]),
+            wall=wall,
+            rh_in=float(data["rh_in"]),
+            cw_in=float(data["cw_in"]),
+            c_wall=float(data["c_wall"]),
+        )
+
+
+@dataclass
+class FireRiskSeries:
+    timestamps: list[datetime]
+    ttf: np.ndarray
+    state: ModelState | None = None
+
+    def __len__(self) -> int:
+        return len(self.timestamps)
+
+
+def _calc_pwsat(temp_c):
+    return 610.78 * np.exp((17.2694 * temp_c) / (temp_c + 238.3))
+
+
+def _calc_cwsat(pwsat, temp_c):
+    return (pwsat * MOL_WEIGHT) / (GAS_CONSTANT * (temp_c + 273.15))
+
+
+def _calc_fmc(rh: float) -> float:
+    return 0.0017 + 0.2524 * rh - 0.1986 * rh**2 + 0.0279 * rh**3 + 0.167 * rh**4
+
+
+def _calc_rhwall(cfmc):
+    x = cfmc / RHO_WOOD
+    return 0.0698 - 1.258 * x + 125.35 * x**2 - 809.43 * x**3 + 1583.8 * x**4
+
+
+def _calc_cwall(deltac):
+    return (A_EX * D_W_A * deltac * DELTA_T / BOUNDARY_LAYER) / VOL
+
+
+def _wall_transition() -> np.ndarray:
+    """Transposed linear map taking the wall layers from step t to t+1 (excluding air exchange)."""
+    k = (DELTA_T / DELTA_X) * (D_W_S / DELTA_X)
+    m = np.zeros((SUB_LAYERS, SUB_LAYERS))
+    m[0, 0] = 1 - k
+    m[0, 1] = k
+    for n in range(1, SUB_LAYERS - 1):
+        m[n, n - 1] = FOURIER
+        m[n, n] = 1 - 2 * FOURIER
+        m[n, n + 1] = FOURIER
+    m[-1, -2] = FOURIER
+    m[-1, -1] = 1 - FOURIER
+    return m.T
+
+
+_WALL_TRANSITION_T = _wall_transition()
+
+
+_CW_SAT_IN = float(_calc_cwsat(_calc_pwsat(T_C_IN), T_C_IN))
+
+
+def _initial_state(batch: int) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """Default (wall, rh_in, cw_in, c_wall) used when no saved state is available."""
+    wall = np.full((batch, SUB_LAYERS), _calc_fmc(RH_IN) * RHO_WOOD)
+    surface = wall[:, 0] - 0.5 * (wall[:, 1] - wall[:, 0])
+    rh_in = np.full(batch, RH_IN)
+    cw_in = np.full(batch, RH_IN * _CW_SAT_IN)
+    c_wall = _calc_cwall((_calc_rhwall(surface) - rh_in) * _CW_SAT_IN)
+    return wall, rh_in, cw_in, c_wall
+
+
+def compute_fr(temp_c_out, rh_out) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Compute indoor RH and TTF for interpolated outdoor series.
+
+    Accepts arrays of shape (steps,) or (series, steps); all series in a batch
+    share the same time grid. Returns (rh_in, ttf) with the input shape.
+    """
+    temp_c_out = np.asarray(temp_c_out, dtype=float)
+    squeeze = temp_c_out.ndim == 1
+    rh_in_hist, ttf, _ = simulate(np.atleast_2d(temp_c_out), np.atleast_2d(np.asarray(rh_out, dtype=float)))
+    if squeeze:
+        return rh_in_hist[0], ttf[0]
+    return rh_in_hist, ttf
+
+
+def simulate(temp_c_out: np.ndarray, rh_out: np.ndarray, initial=None, snapshot_step: int | None = None):
+    """
+    Integrate the model over (series, steps) outdoor arrays.
+
+    `initial` is an optional (wall, rh_in, cw_in, c_wall) tuple of per-series
+    arrays to resume from. Returns (rh_in, ttf, snapshot), where snapshot is
+    the state tuple at `snapshot_step`, or None.
+    """
+    batch, steps = temp_c_out.shape
+
+    # Saturation and ventilation terms do not depend on model state.
+    cw_out = rh_out / 100 * _calc_cwsat(_calc_pwsat(temp_c_out), temp_c_out)
+    cw_sat_in = _CW_SAT_IN
+    t_k_out = temp_c_out + 273.15
+    t_k_in = T_C_IN + 273.15
+    ach = GAMMA * np.sqrt(np.abs(1 / t_k_out - 1 / t_k_in) / t_k_out)
+    beta = 1 - np.exp((-ach * DELTA_T) / 3600)
+    keep = 1 - beta
+    c_ac = beta * cw_out * (t_k_out / t_k_in)
+    c_supply = ((SUPPLY_24H / (24 * 3600)) * DELTA_T) / VOL
+    air_forcing = (DELTA_T / DELTA_X) * (D_W_A / BOUNDARY_LAYER) * cw_sat_in
+
+    surface = np.empty((batch, steps))
+    rh_in_hist = np.empty((batch, steps))
+
+    wall, rh_in, cw_in, c_wall = initial if initial is not None else _initial_state(batch)
+    surface[:, 0] = wall[:, 0] - 0.5 * (wall[:, 1] - wall[:, 0])
+    rh_wall = _calc_rhwall(surface[:, 0])
+    rh_in_hist[:, 0] = rh_in
+
+    snapshot = (wall.copy(), rh_in, cw_in, c_wall) if snapshot_step == 0 else None
+    for i in range(steps - 1):
+        gap = rh_in - rh_wall
+        wall = wall @ _WALL_TRANSITION_T
+        wall[:, 0] += air_forcing * gap
+        surface[:, i + 1] = wall[:, 0] - 0.5 * (wall[:, 1] - wall[:, 0])
+        rh_wall = _calc_rhwall(surface[:, i + 1])
+        cw_in = keep[:, i] * cw_in + c_ac[:, i] + c_wall + c_supply
+        rh_in = cw_in / cw_sat_in
+        rh_in_hist[:, i + 1] = rh_in
+        c_wall = _calc_cwall(-gap * cw_sat_in)
+        if snapshot_step == i + 1:
+            snapshot = (wall.copy(), rh_in, cw_in, c_wall)
+
+    ttf = 2 * np.exp(0.16 * (surface * (100 / RHO_WOOD)))
+    return rh_in_hist, ttf, snapshot
+
+
+def _interpolate(time_sec: np.ndarray, values: np.ndarray, grid: np.ndarray, name: str) -> np.ndarray:
+    valid = ~np.isnan(values)
+    if not valid.any():
+        raise ValueError(f"No valid {name} values in weather data")
+    return np.interp(grid, time_sec[valid], values[valid])
+
+
+def preprocess(
+    series: WeatherSeries, start: datetime | None = None
+) -> tuple[datetime, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Sort, drop NaNs and interpolate the series onto the model time step grid.
+
+    The grid starts at the first timestamp, or at `start` when resuming from a
+    saved state; `start` must lie within the series.
+    """
+    if len(series) == 0:
+        raise ValueError("Weather data is empty")
+
+    offsets = np.asarray(series.offsets, dtype=float)
+    order = np.argsort(offsets, kind="stable")
+    if start is None:
+        start_offset = float(offsets[order[0]])
+    else:
+        try:
+            start_offset = (start - series.origin).total_seconds()
+        except TypeError as exc:
+            raise ValueError("Model state and weather timestamps must either both have a timezone or both lack one") from exc
+        if not offsets[order[0]] <= start_offset <= offsets[order[-1]]:
+            raise ValueError(f"Weather data does not cover model state time {start.isoformat()}")
+    start_time = series.origin + timedelta(seconds=start_offset)
+    time_sec = np.round(offsets[order] - start_offset)
+    grid = np.arange(0, int(time_sec[-1]) + 1, DELTA_T, dtype=float)
+
+    temperature = _interpolate(time_sec, np.asarray(series.temperature, dtype=float)[order], grid, "temperature")
+    humidity = _interpolate(time_sec, np.asarray(series.humidity, dtype=float)[order], grid, "humidity")
+    return start_time, grid, temperature, humidity
+
+
+def _snapshot_step(start_time: datetime, snapshot_at: datetime | None, steps: int) -> int | None:
+    if snapshot_at is None:
+        return None
+    seconds = (snapshot_at - start_time).total_seconds()
+    if seconds < 0 or seconds % DELTA_T:
+        return None
+    step = int(seconds // DELTA_T)
+    return step if step < steps else None
+
+
+def compute(
+    series: WeatherSeries, state: ModelState | None = None, snapshot_at: datetime | None = None
+) -> FireRiskSeries:
+    """
+    Run the model over `series`.
+
+    With `state`, the simulation resumes at state.timestamp instead of spinning
+    up from the default initial state. With `snapshot_at`, the returned series
+    carries the model state at that grid time so a later call can resume there.
+    """
+    start_time, grid, temperature, humidity = preprocess(series, state.timestamp if state is not None else None)
+    initial = None
+    if state is not None:
+        initial = (
+            state.wall.reshape(1, SUB_LAYERS).copy(),
+            np.array([state.rh_in]),
+            np.array([state.cw_in]),
+            np.array([state.c_wall]),
+        )
+    snapshot_step = _snapshot_step(start_time, snapshot_at, len(grid))
+    _, ttf, snapshot = simulate(temperature[np.newaxis, :], humidity[np.newaxis, :], initial, snapshot_step)
+
+    hours = grid[::STEPS_PER_HOUR]
+    new_state = None
+    if snapshot is not None:
+        wall, rh_in, cw_in, c_wall = snapshot
+        new_state = ModelState(
+            timestamp=start_time + timedelta(seconds=float(grid[snapshot_step])),
+            wall=wall[0],
+            rh_in=float(rh_in[0]),
+            cw_in=float(cw_in[0]),
+            c_wall=float(c_wall[0]),
+        )
+    return FireRiskSeries(
+        timestamps=[start_time + timedelta(seconds=float(sec)) for sec in hours],
+        ttf=ttf[0, ::STEPS_PER_HOUR],
+        state=new_state,
+    )
+
+
+def compute_many(series_list: list[WeatherSeries]) -> list[FireRiskSeries]:
+    """
+    Run the model over several series, one simulate() pass per shared time grid.
+
+    Series whose grids start at the same time and have the same length (such as
+    forecasts for neighbouring cells from the same MET issue) are stacked into
+    one (series, steps) batch. Results are returned in input order.
+    """
+    prepared = [preprocess(series) for series in series_list]
+    groups: dict[tuple[datetime, int], list[int]] = {}
+    for index, (start_time, grid, _, _) in enumerate(prepared):
+        groups.setdefault((start_time, len(grid)), []).append(index)
+
+    results: list[FireRiskSeries | None] = [None] * len(prepared)
+    for (start_time, _), indices in groups.items():
+        grid = prepared[indices[0]][1]
+        temperature = np.stack([prepared[index][2] for index in indices])
+        humidity = np.stack([prepared[index][3] for index in indices])
+        _, ttf, _ = simulate(temperature, humidity)
+
+        timestamps = [start_time + timedelta(seconds=float(sec)) for sec in grid[::STEPS_PER_HOUR]]
+        for row, index in enumerate(indices):
+            results[index] = FireRiskSeries(timestamps=list(timestamps), ttf=ttf[row, ::STEPS_PER_HOUR])
+    return results
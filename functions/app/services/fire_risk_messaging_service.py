@@ -1,23 +1,40 @@
 from __future__ import annotations
 
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone
 from typing import Any
 from uuid import uuid4
 
-from firebase_admin import firestore
-
 from MET_client import fetch_weather_records_for_location
+from app.services.event_log_writer import EventLogWriter, get_event_log_writer
+from app.services.executors import submit_compute
 from app.services.fire_risk_service import compute_fire_risk_from_records
-from app.services.pubsub_publisher_service import PubSubPublisherService
+from app.services.pubsub_publisher_service import PUBLISH_TIMEOUT_SECONDS, PubSubPublisherService
 
 
-EVENT_LOG_COLLECTION = "fire_risk_event_log"
+MAX_BULK_LOCATIONS = 2000
+MAX_CONCURRENT_FETCHES = 16
+# Event-loggen er et revisjonsspor, ikke en kopi av meldingen: `result` gjentar ttf per time.
+EVENT_LOG_FIELDS = (
+    "event_id",
+    "event_type",
+    "published_at",
+    "location",
+    "points",
+    "forecast_start",
+    "forecast_end",
+    "ttf",
+)
 
 
 class FireRiskMessagingService:
-    def __init__(self, publisher: PubSubPublisherService | None = None) -> None:
+    def __init__(
+        self,
+        publisher: PubSubPublisherService | None = None,
+        event_log: EventLogWriter | None = None,
+    ) -> None:
         self.publisher = publisher or PubSubPublisherService()
-        self.db = firestore.client()
+        self.event_log = event_log or get_event_log_writer()
 
     def build_event_payload(
         self,
@@ -39,28 +56,90 @@ class FireRiskMessagingService:
             "result": result,
         }
 
+    def _event_log_document(self, payload: dict[str, Any], message_id: str) -> dict[str, Any]:
+        return {
+            "message_id": message_id,
+            "payload": {field: payload[field] for field in EVENT_LOG_FIELDS if field in payload},
+        }
+
     def log_event(self, payload: dict[str, Any], message_id: str) -> None:
-        self.db.collection(EVENT_LOG_COLLECTION).document(payload["event_id"]).set(
-            {
-                "message_id": message_id,
-                "payload": payload,
-            }
-        )
+        self.log_events([(payload, message_id)])
 
-    def publish_for_location(self, lat: float, lon: float, points: int = 12) -> dict[str, Any]:
+    def log_events(self, entries: list[tuple[dict[str, Any], str]]) -> None:
+        """Queue event log documents; the writer commits them in batches off the request path."""
+        documents = [(payload["event_id"], self._event_log_document(payload, message_id)) for payload, message_id in entries]
+        try:
+            self.event_log.write_many(documents)
+        except RuntimeError as exc:
+            # Meldingen er allerede publisert; en stoppet skriver skal ikke gjøre svaret til en feil.
+            self.event_log.record_dropped(len(documents), f"Event log write failed ({exc})")
+
+    def _build_for_location(self, lat: float, lon: float, points: int) -> dict[str, Any]:
         records = fetch_weather_records_for_location(lat=lat, lon=lon, max_points=points)
-        result = compute_fire_risk_from_records(records)
-        payload = self.build_event_payload(
+        # Modellkjøringen deler compute-poolen med resten av API-et, så bulk-publisering kan ikke overbooke CPU-en.
+        result = submit_compute(compute_fire_risk_from_records, records).result()
+        return self.build_event_payload(
             lat=lat,
             lon=lon,
             points=points,
             records=records,
             result=result,
         )
+
+    def publish_for_location(self, lat: float, lon: float, points: int = 12) -> dict[str, Any]:
+        payload = self._build_for_location(lat, lon, points)
         message_id = self.publisher.publish_json(payload)
+        # Bare køet: skrivertråden committer etter max_latency. Mens Cloud Functions struper CPU-en mellom
+        # kall kan det bli liggende til neste forespørsel eller nedstengning; det aksepteres for enkeltkall.
         self.log_event(payload, message_id)
 
         return {
             "message_id": message_id,
             "event": payload,
         }
+
+    def publish_for_locations(self, locations: list[tuple[float, float, int]]) -> list[dict[str, Any]]:
+        """Fetch, compute and publish many locations. Returns one outcome per location, in input order."""
+        if len(locations) > MAX_BULK_LOCATIONS:
+            raise ValueError(f"Bulk publish can contain at most {MAX_BULK_LOCATIONS} locations")
+        if not locations:
+            return []
+
+        outcomes: list[dict[str, Any]] = [
+            {"lat": lat, "lon": lon, "points": points} for lat, lon, points in locations
+        ]
+        payloads: list[dict[str, Any] | None] = [None] * len(locations)
+
+        with ThreadPoolExecutor(max_workers=min(MAX_CONCURRENT_FETCHES, len(locations))) as executor:
+            futures = [executor.submit(self._build_for_location, *location) for location in locations]
+            for index, future in enumerate(futures):
+                try:
+                    payloads[index] = future.result()
+                except (ValueError, RuntimeError) as exc:
+                    outcomes[index].update(status="error", stage="compute", error=str(exc))
+
+        # Alle meldinger sendes før vi venter, slik at klienten kan batche dem.
+        publish_futures = {}
+        for index, payload in enumerate(payloads):
+            if payload is None:
+                continue
+            try:
+                publish_futures[index] = self.publisher.publish_json_async(payload)
+            except RuntimeError as exc:
+                outcomes[index].update(status="error", stage="publish", error=str(exc))
+
+        logged: list[tuple[dict[str, Any], str]] = []
+        for index, future in publish_futures.items():
+            try:
+                message_id = future.result(timeout=PUBLISH_TIMEOUT_SECONDS)
+            except Exception as exc:
+                outcomes[index].update(status="error", stage="publish", error=str(exc))
+                continue
+            payload = payloads[index]
+            logged.append((payload, message_id))
+            outcomes[index].update(status="published", message_id=message_id, event_id=payload["event_id"])
+
+        self.log_events(logged)
+        # Instansen strupes når svaret er sendt, så bulk-kallet ber skrivertråden committe nå og venter kort på den.
+        self.event_log.flush(timeout=self.event_log.settings.flush_timeout)
+        return outcomes
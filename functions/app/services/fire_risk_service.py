@@ -1,88 +1,93 @@
 from __future__ import annotations
 
-import csv
-import io
 from datetime import datetime
-from dataclasses import asdict, is_dataclass
-from typing import Any
+from typing import TYPE_CHECKING, Any
 
-from frcm.datamodel.model import WeatherData, WeatherDataPoint
-from frcm.fireriskmodel.compute import compute
+from app.services.request_timing import stage, timed
+from app.services.weather_ingest import (
+    FORMAT_CSV,
+    REQUIRED_FIELDS,
+    WeatherColumns,
+    parse_timestamp as _parse_timestamp,
+    parse_weather_text,
+)
 
+if TYPE_CHECKING:
+    from app.services.fire_risk_kernel import FireRiskSeries, ModelState, WeatherSeries
 
-REQUIRED_FIELDS = ("timestamp", "temperature", "relative_humidity", "wind_speed")
 
+def compute(
+    series: WeatherSeries, state: ModelState | None = None, snapshot_at: datetime | None = None
+) -> FireRiskSeries:
+    # Kjernen (og numpy) importeres først når noe faktisk skal beregnes; cache-treff slipper kostnaden.
+    from app.services.fire_risk_kernel import compute as kernel_compute
 
-def _parse_timestamp(value: Any) -> datetime:
-    if isinstance(value, datetime):
-        return value
-    if not isinstance(value, str):
-        raise ValueError("timestamp must be an ISO-8601 string")
-    normalized = value.replace("Z", "+00:00")
-    try:
-        return datetime.fromisoformat(normalized)
-    except ValueError as exc:
-        raise ValueError(f"Invalid timestamp: {value}") from exc
+    return kernel_compute(series, state=state, snapshot_at=snapshot_at)
 
 
-def _to_weather_data(records: list[dict[str, Any]]) -> WeatherData:
-    points: list[WeatherDataPoint] = []
+@timed("parse")
+def _to_weather_series(records: list[dict[str, Any]]) -> WeatherSeries:
+    columns = WeatherColumns()
     for index, record in enumerate(records):
         missing = [field for field in REQUIRED_FIELDS if field not in record]
         if missing:
             raise ValueError(f"Record {index} is missing fields: {', '.join(missing)}")
 
-        points.append(
-            WeatherDataPoint(
-                timestamp=_parse_timestamp(record["timestamp"]),
-                temperature=float(record["temperature"]),
-                humidity=float(record["relative_humidity"]),
-                wind_speed=float(record["wind_speed"]),
-            )
+        columns.append(
+            _parse_timestamp(record["timestamp"]),
+            float(record["temperature"]),
+            float(record["relative_humidity"]),
+            float(record["wind_speed"]),
         )
 
-    return WeatherData(data=points)
+    return columns.to_series()
 
 
-def _extract_ttf(result: Any) -> Any:
-    if isinstance(result, dict):
-        return result.get("ttf")
-    if hasattr(result, "firerisks"):
-        firerisks = getattr(result, "firerisks") or []
-        return [getattr(item, "ttf", None) for item in firerisks]
-    return getattr(result, "ttf", None)
+def _series_to_result(series: FireRiskSeries) -> dict[str, Any]:
+    ttf = series.ttf.tolist()
+    return {
+        "ttf": ttf,
+        "result": {
+            "firerisks": [
+                {"timestamp": str(timestamp), "ttf": value}
+                for timestamp, value in zip(series.timestamps, ttf)
+            ]
+        },
+    }
 
 
-def _to_jsonable(value: Any) -> Any:
-    if value is None or isinstance(value, (str, int, float, bool)):
-        return value
-    if isinstance(value, list):
-        return [_to_jsonable(item) for item in value]
-    if isinstance(value, tuple):
-        return [_to_jsonable(item) for item in value]
-    if isinstance(value, dict):
-        return {str(key): _to_jsonable(item) for key, item in value.items()}
-    if is_dataclass(value):
-        return _to_jsonable(asdict(value))
-    if hasattr(value, "model_dump"):
-        return _to_jsonable(value.model_dump())
-    if hasattr(value, "__dict__"):
-        return _to_jsonable(vars(value))
-    return str(value)
+@timed("compute")
+def compute_fire_risk_from_series(series: WeatherSeries) -> dict[str, Any]:
+    return _series_to_result(compute(series))
 
 
 def compute_fire_risk_from_records(records: list[dict[str, Any]]) -> dict[str, Any]:
-    weather_data = _to_weather_data(records)
-    result = compute(weather_data)
-    return {
-        "ttf": _extract_ttf(result),
-        "result": _to_jsonable(result),
-    }
+    return compute_fire_risk_from_series(_to_weather_series(records))
+
+
+def compute_fire_risk_from_record_sets(record_sets: list[list[dict[str, Any]]]) -> list[dict[str, Any]]:
+    """Runs the model for many record lists (e.g. every cell of a grid) in one batched pass; results in input order."""
+    from app.services.fire_risk_kernel import compute_many
+
+    series = [_to_weather_series(records) for records in record_sets]
+    with stage("compute"):
+        return [_series_to_result(result) for result in compute_many(series)]
+
+
+def compute_fire_risk_with_state(
+    records: list[dict[str, Any]], state: ModelState | None, snapshot_at: datetime
+) -> tuple[dict[str, Any], ModelState | None]:
+    """Resumes the model from `state` (or spins up without one) and returns the result and the state at `snapshot_at`."""
+    return compute_fire_risk_series_with_state(_to_weather_series(records), state, snapshot_at)
+
+
+def compute_fire_risk_series_with_state(
+    weather: WeatherSeries, state: ModelState | None, snapshot_at: datetime
+) -> tuple[dict[str, Any], ModelState | None]:
+    with stage("compute"):
+        series = compute(weather, state=state, snapshot_at=snapshot_at)
+        return _series_to_result(series), series.state
 
 
 def compute_fire_risk_from_csv(csv_content: str) -> dict[str, Any]:
-    reader = csv.DictReader(io.StringIO(csv_content))
-    records = [row for row in reader]
-    if not records:
-        raise ValueError("CSV input is empty")
-    return compute_fire_risk_from_records(records)
+    return compute_fire_risk_from_series(parse_weather_text(csv_content, FORMAT_CSV))
@@ -0,0 +1,99 @@
+from __future__ import annotations
+
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any
+
+from app.services.fire_risk_cache_service import TIMESLOT_SECONDS, FireRiskCacheService
+from app.services.fire_risk_service import compute_fire_risk_from_records
+from app.services.lazy_imports import lazy_module
+from app.services.weather_cache_service import WeatherCacheService
+
+firestore = lazy_module("firebase_admin.firestore")
+
+
+WATCHED_LOCATIONS_COLLECTION = "fire_risk_watched_locations"
+MAX_CONCURRENT_WARMUPS = 8
+DEFAULT_POINTS = 12
+
+
+def _points_list(value: Any) -> list[int]:
+    if value is None:
+        return [DEFAULT_POINTS]
+    if isinstance(value, (list, tuple)):
+        return [int(item) for item in value]
+    return [int(value)]
+
+
+class FireRiskWarmingService:
+    """Fills fire_risk_cache for watched locations before the next hourly timeslot starts."""
+
+    def __init__(
+        self,
+        cache: FireRiskCacheService | None = None,
+        max_concurrent: int = MAX_CONCURRENT_WARMUPS,
+        weather: WeatherCacheService | None = None,
+    ) -> None:
+        self.cache = cache or FireRiskCacheService()
+        self.weather = weather or WeatherCacheService(self.cache)
+        self.db = firestore.client()
+        self.max_concurrent = max_concurrent
+
+    def list_watched_locations(self) -> list[tuple[float, float, int]]:
+        locations: list[tuple[float, float, int]] = []
+        for doc in self.db.collection(WATCHED_LOCATIONS_COLLECTION).stream():
+            data = doc.to_dict() or {}
+            if data.get("enabled", True) is False:
+                continue
+            try:
+                lat, lon = float(data["lat"]), float(data["lon"])
+                points_values = _points_list(data.get("points"))
+            except (KeyError, TypeError, ValueError):
+                print(f"Skipping watched location with invalid data: {doc.id}")
+                continue
+            locations.extend((lat, lon, points) for points in points_values if 1 <= points <= 72)
+        return locations
+
+    def _compute_for_slot(self, lat: float, lon: float, points: int, timeslot: int) -> dict[str, Any]:
+        # Forecasten skal starte ved timesloten den caches for, ikke ved timen jobben kjører.
+        records = self.weather.get_records(lat, lon, points, timeslot)
+        return compute_fire_risk_from_records(records)
+
+    def warm(self, timeslot: int | None = None) -> dict[str, Any]:
+        started = time.monotonic()
+        if timeslot is None:
+            timeslot = self.cache.current_timeslot() + TIMESLOT_SECONDS
+
+        cells: dict[str, tuple[float, float, int]] = {}
+        for lat, lon, points in self.list_watched_locations():
+            cells.setdefault(self.cache.get_grid_id(lat, lon, points, timeslot), (lat, lon, points))
+
+        locations = list(cells.values())
+        cached = self.cache.get_cached_risks(locations, timeslot) if locations else []
+        pending = [location for location, hit in zip(locations, cached) if hit is None]
+
+        warmed: list[tuple[float, float, int, dict[str, Any]]] = []
+        failed = 0
+        if pending:
+            with ThreadPoolExecutor(max_workers=min(self.max_concurrent, len(pending))) as executor:
+                futures = [
+                    (location, executor.submit(self._compute_for_slot, *location, timeslot))
+                    for location in pending
+                ]
+                for (lat, lon, points), future in futures:
+                    try:
+                        warmed.append((lat, lon, points, future.result()))
+                    except (ValueError, RuntimeError) as exc:
+                        failed += 1
+                        print(f"Warming failed for ({lat}, {lon}, p{points}): {exc}")
+
+        self.cache.save_many_to_cache(warmed, timeslot)
+
+        return {
+            "timeslot": timeslot,
+            "cells": len(cells),
+            "already_cached": len(locations) - len(pending),
+            "warmed": len(warmed),
+            "failed": failed,
+            "duration_seconds": round(time.monotonic() - started, 3),
+        }
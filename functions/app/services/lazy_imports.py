@@ -0,0 +1,38 @@
+"""
+Deferred imports for heavy dependencies.
+
+`firestore = lazy_module("firebase_admin.firestore")` binds a proxy that imports
+the real module on first attribute access, so loading a module no longer pays
+for google-cloud-firestore (grpc, protobuf) or requests until they are used.
+Attribute writes are forwarded to the real module, so monkeypatching through
+the proxy behaves like patching the module itself.
+"""
+from __future__ import annotations
+
+import importlib
+from typing import Any
+
+
+class LazyModule:
+    def __init__(self, name: str) -> None:
+        object.__setattr__(self, "_name", name)
+
+    def _module(self) -> Any:
+        # import_module er trådsikker og slår opp i sys.modules etter første import.
+        return importlib.import_module(self._name)
+
+    def __getattr__(self, attr: str) -> Any:
+        return getattr(self._module(), attr)
+
+    def __setattr__(self, attr: str, value: Any) -> None:
+        setattr(self._module(), attr, value)
+
+    def __delattr__(self, attr: str) -> None:
+        delattr(self._module(), attr)
+
+    def __repr__(self) -> str:
+        return f"<lazy module {self._name!r}>"
+
+
+def lazy_module(name: str) -> Any:
+    return LazyModule(name)
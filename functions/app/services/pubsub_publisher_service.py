@@ -1,6 +1,11 @@
 from __future__ import annotations
 
+import atexit
 import json
+import os
+import threading
+from concurrent.futures import Future
+from dataclasses import dataclass
 from typing import Any
 
 from firebase_admin import get_app
@@ -8,6 +13,128 @@ from firebase_admin import get_app
 
 DEFAULT_PROJECT_ID = "fireguard-2faea"
 PUBSUB_TOPIC_ID = "fire-risk-updated"
+PUBLISH_TIMEOUT_SECONDS = 10
+
+
+@dataclass(frozen=True)
+class PublisherBatchSettings:
+    max_messages: int = 100
+    max_bytes: int = 1_000_000
+    max_latency: float = 0.01
+
+    @classmethod
+    def from_env(cls) -> PublisherBatchSettings:
+        return cls(
+            max_messages=int(os.getenv("PUBSUB_BATCH_MAX_MESSAGES", cls.max_messages)),
+            max_bytes=int(os.getenv("PUBSUB_BATCH_MAX_BYTES", cls.max_bytes)),
+            max_latency=float(os.getenv("PUBSUB_BATCH_MAX_LATENCY", cls.max_latency)),
+        )
+
+
+class LocalPublisherClient:
+    """
+    In-memory stand-in for pubsub_v1.PublisherClient.
+
+    Batches messages per topic with the same limits as the real client and
+    resolves each future with a message id when its batch is flushed. The
+    flushed batches are kept in `batches` so tests can inspect them.
+    """
+
+    def __init__(self, batch_settings: PublisherBatchSettings | None = None) -> None:
+        self.batch_settings = batch_settings or PublisherBatchSettings()
+        self.batches: list[tuple[str, list[bytes]]] = []
+        self._pending: dict[str, list[tuple[bytes, Future]]] = {}
+        self._timers: dict[str, threading.Timer] = {}
+        self._lock = threading.Lock()
+        self._next_id = 0
+        self.stopped = False
+
+    def topic_path(self, project_id: str, topic_id: str) -> str:
+        return f"projects/{project_id}/topics/{topic_id}"
+
+    def publish(self, topic: str, data: bytes, **attrs: str) -> Future:
+        if self.stopped:
+            raise RuntimeError("Publisher has been stopped.")
+
+        future: Future = Future()
+        with self._lock:
+            pending = self._pending.setdefault(topic, [])
+            if pending and sum(len(item) for item, _ in pending) + len(data) > self.batch_settings.max_bytes:
+                self._flush_locked(topic)
+                pending = self._pending.setdefault(topic, [])
+            pending.append((data, future))
+            if len(pending) >= self.batch_settings.max_messages:
+                self._flush_locked(topic)
+            elif topic not in self._timers:
+                timer = threading.Timer(self.batch_settings.max_latency, self._flush_topic, args=(topic,))
+                timer.daemon = True
+                self._timers[topic] = timer
+                timer.start()
+        return future
+
+    def _flush_topic(self, topic: str) -> None:
+        with self._lock:
+            self._flush_locked(topic)
+
+    def _flush_locked(self, topic: str) -> None:
+        timer = self._timers.pop(topic, None)
+        if timer is not None:
+            timer.cancel()
+        pending = self._pending.pop(topic, [])
+        if not pending:
+            return
+        self.batches.append((topic, [data for data, _ in pending]))
+        for _, future in pending:
+            self._next_id += 1
+            future.set_result(str(self._next_id))
+
+    def stop(self) -> None:
+        with self._lock:
+            for topic in list(self._pending):
+                self._flush_locked(topic)
+            self.stopped = True
+
+
+_publisher_client: Any = None
+_publisher_lock = threading.Lock()
+
+
+def get_publisher_client(batch_settings: PublisherBatchSettings | None = None) -> Any:
+    """Return the process-wide publisher client, creating it on first use."""
+    global _publisher_client
+    if _publisher_client is None:
+        with _publisher_lock:
+            if _publisher_client is None:
+                from google.cloud import pubsub_v1
+
+                settings = batch_settings or PublisherBatchSettings.from_env()
+                _publisher_client = pubsub_v1.PublisherClient(
+                    batch_settings=pubsub_v1.types.BatchSettings(
+                        max_messages=settings.max_messages,
+                        max_bytes=settings.max_bytes,
+                        max_latency=settings.max_latency,
+                    )
+                )
+    return _publisher_client
+
+
+def set_publisher_client(client: Any) -> None:
+    """Replace the process-wide publisher client, e.g. with a LocalPublisherClient."""
+    global _publisher_client
+    with _publisher_lock:
+        _publisher_client = client
+
+
+def shutdown_publisher() -> None:
+    """Flush pending batches and release the process-wide publisher client."""
+    global _publisher_client
+    with _publisher_lock:
+        client, _publisher_client = _publisher_client, None
+    if client is not None:
+        client.stop()
+
+
+atexit.register(shutdown_publisher)
 
 
 def _resolve_project_id() -> str:
@@ -25,26 +152,28 @@ def _resolve_project_id() -> str:
 
 
 class PubSubPublisherService:
-    def __init__(self, project_id: str | None = None, topic_id: str | None = None) -> None:
+    def __init__(self, project_id: str | None = None, topic_id: str | None = None, client: Any = None) -> None:
         self.project_id = project_id or _resolve_project_id()
         self.topic_id = topic_id or PUBSUB_TOPIC_ID
+        self._client = client
 
     def is_configured(self) -> bool:
         return bool(self.project_id and self.topic_id)
 
-    def publish_json(self, payload: dict[str, Any]) -> str:
+    @property
+    def client(self) -> Any:
+        return self._client if self._client is not None else get_publisher_client()
+
+    def publish_json_async(self, payload: dict[str, Any]) -> Future:
         if not self.is_configured():
             raise RuntimeError("Pub/Sub is not configured.")
 
-        from google.cloud import pubsub_v1
-
-        publisher = pubsub_v1.PublisherClient()
-        try:
-            topic_path = publisher.topic_path(self.project_id, self.topic_id)
-            future = publisher.publish(
-                topic_path,
-                json.dumps(payload, separators=(",", ":")).encode("utf-8"),
-            )
-            return future.result(timeout=10)
-        finally:
-            publisher.stop()
+        client = self.client
+        topic_path = client.topic_path(self.project_id, self.topic_id)
+        return client.publish(
+            topic_path,
+            json.dumps(payload, separators=(",", ":")).encode("utf-8"),
+        )
+
+    def publish_json(self, payload: dict[str, Any]) -> str:
+        return self.publish_json_async(payload).result(timeout=PUBLISH_TIMEOUT_SECONDS)
@@ -0,0 +1,145 @@
+"""
+Per-stage request timing.
+
+RequestTimingMiddleware starts a RequestTimings for every HTTP request and
+keeps it in a context variable. Code on the request path wraps its work in
+`with stage("cache_read"):`; outside a request (scheduled jobs, background
+refreshes) stage() does nothing.
+
+When the response starts, the stages measured so far are added as a
+Server-Timing header. When the request is done, one JSON line with every
+stage's total time and call count is printed for Cloud Logging:
+
+  {"severity": "INFO", "message": "request_timing", "path": "/fire-risk/compute-by-location",
+   "status": 200, "cache_status": "miss", "duration_ms": 182.4,
+   "stages_ms": {"api_key": 0.4, "cache_read": 21.7, "met_fetch": 141.2, ...},
+   "stage_counts": {"cache_read": 2, ...}}
+
+Stages: api_key, cache_read, met_fetch, parse, compute, serialize, cache_write,
+plus lease and lease_wait for the cross-instance fill lease.
+Stages that run on several threads at once (batch fetches) are summed, so their
+total can exceed the request's wall time.
+"""
+from __future__ import annotations
+
+import contextvars
+import functools
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Iterator
+
+
+TIMING_LOG_ENABLED = os.getenv("FIRE_RISK_TIMING_LOG", "true").lower() not in ("0", "false", "no")
+
+_current: contextvars.ContextVar[RequestTimings | None] = contextvars.ContextVar("request_timings", default=None)
+
+
+class RequestTimings:
+    def __init__(self) -> None:
+        self._totals: dict[str, float] = {}
+        self._counts: dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def add(self, name: str, millis: float) -> None:
+        with self._lock:
+            self._totals[name] = self._totals.get(name, 0.0) + millis
+            self._counts[name] = self._counts.get(name, 0) + 1
+
+    def totals(self) -> dict[str, float]:
+        with self._lock:
+            return {name: round(millis, 3) for name, millis in self._totals.items()}
+
+    def counts(self) -> dict[str, int]:
+        with self._lock:
+            return dict(self._counts)
+
+    def server_timing(self, total_ms: float | None = None) -> str:
+        entries = [f"{name};dur={millis:.1f}" for name, millis in self.totals().items()]
+        if total_ms is not None:
+            entries.append(f"total;dur={total_ms:.1f}")
+        return ", ".join(entries)
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """Times the block as `name` for the current request. No-op outside a request."""
+    timings = _current.get()
+    if timings is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.add(name, (time.perf_counter() - started) * 1000)
+
+
+def timed(name: str) -> Callable[[Callable[..., Any]], Callable[..., Any]]:
+    """Decorator form of stage(): times every call to the function as `name`."""
+    def decorator(fn: Callable[..., Any]) -> Callable[..., Any]:
+        @functools.wraps(fn)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            with stage(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def bind_context(fn: Callable[..., Any]) -> Callable[..., Any]:
+    """Wraps fn so it runs in a copy of the caller's context, e.g. when submitted to a thread pool."""
+    context = contextvars.copy_context()
+    return lambda *args, **kwargs: context.run(fn, *args, **kwargs)
+
+
+def _header(headers: list[tuple[bytes, bytes]], name: bytes) -> str | None:
+    for key, value in headers:
+        if key.lower() == name:
+            return value.decode("latin1")
+    return None
+
+
+class RequestTimingMiddleware:
+    """ASGI middleware that adds Server-Timing to every response and logs the stage timings as JSON."""
+
+    def __init__(self, app, log_enabled: bool | None = None) -> None:
+        self.app = app
+        self.log_enabled = TIMING_LOG_ENABLED if log_enabled is None else log_enabled
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timings = RequestTimings()
+        token = _current.set(timings)
+        started = time.perf_counter()
+        response: dict[str, Any] = {"status": 500, "cache_status": None}
+
+        async def send_with_timing(message) -> None:
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                response["status"] = message.get("status", 200)
+                response["cache_status"] = _header(headers, b"x-cache-status")
+                headers.append((b"server-timing", timings.server_timing((time.perf_counter() - started) * 1000).encode("latin1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current.reset(token)
+            if self.log_enabled:
+                print(json.dumps({
+                    "severity": "INFO",
+                    "message": "request_timing",
+                    "method": scope.get("method"),
+                    "path": scope.get("path"),
+                    "status": response["status"],
+                    "cache_status": response["cache_status"],
+                    "duration_ms": round((time.perf_counter() - started) * 1000, 3),
+                    "stages_ms": timings.totals(),
+                    "stage_counts": timings.counts(),
+                }))
@@ -0,0 +1,101 @@
+from __future__ import annotations
+
+import os
+import time
+from datetime import datetime, timezone
+from typing import Any
+
+from MET_client import FORECAST_RETENTION_SECONDS, extract_weather_records, fetch_forecast, forecast_issued_at
+from app.services.fire_risk_cache_service import FireRiskCacheService
+from app.services.lazy_imports import lazy_module
+from app.services.memory_cache import TtlLruCache
+from app.services.request_timing import stage, timed
+from app.services.weather_ingest import parse_timestamp
+
+firestore = lazy_module("firebase_admin.firestore")
+
+
+WEATHER_CACHE_COLLECTION = "fire_risk_weather_cache"
+# Hele MET-horisonten lagres (compact gir rundt 90 steg); points-verdier skjæres til fra denne.
+MAX_FORECAST_POINTS = 128
+# L1 foran Firestore, nøkkel er cell_id. Oppføringen utløper når MET sin Expires passeres.
+WEATHER_L1_CACHE = TtlLruCache(max_entries=int(os.getenv("FIRE_RISK_WEATHER_L1_MAX_ENTRIES", "512")))
+
+_COLUMNS = ("temperature", "relative_humidity", "wind_speed")
+
+
+class WeatherCacheService:
+    """
+    Normalized MET forecast per grid cell, stored separately from the computed results.
+
+    One document per cell holds the latest forecast issue (MET's updated_at) as
+    columns. Every points value, batch item and warming job reads its records by
+    slicing this series, so MET is asked once per cell and issue rather than once
+    per points value and coordinate.
+    """
+
+    def __init__(self, cache: FireRiskCacheService | None = None, memory_cache: TtlLruCache | None = None) -> None:
+        self.cache = cache or FireRiskCacheService()
+        self.db = firestore.client()
+        self.memory_cache = memory_cache if memory_cache is not None else WEATHER_L1_CACHE
+
+    @timed("cache_read")
+    def _load(self, cell_id: str, now: float) -> dict[str, Any] | None:
+        forecast = self.memory_cache.get(cell_id)
+        if forecast is not None:
+            return forecast
+
+        doc = self.db.collection(WEATHER_CACHE_COLLECTION).document(cell_id).get()
+        if not doc.exists:
+            return None
+        forecast = doc.to_dict() or {}
+        if forecast.get("expires", 0) <= now or not forecast.get("timestamps"):
+            return None
+        self.memory_cache.set(cell_id, forecast, expires_at=forecast["expires"])
+        return forecast
+
+    def _fetch(self, lat: float, lon: float, cell_id: str) -> dict[str, Any]:
+        raw, expires = fetch_forecast(lat, lon)
+        with stage("parse"):
+            records = extract_weather_records(raw, max_points=MAX_FORECAST_POINTS)
+        forecast: dict[str, Any] = {
+            "cell_id": cell_id,
+            "issued_at": forecast_issued_at(raw),
+            "expires": expires,
+            "fetched_at": time.time(),
+            "expire_at": datetime.fromtimestamp(expires + FORECAST_RETENTION_SECONDS, tz=timezone.utc),
+            "location": {"lat": lat, "lon": lon},
+            "timestamps": [record["timestamp"] for record in records],
+        }
+        for column in _COLUMNS:
+            forecast[column] = [record[column] for record in records]
+
+        with stage("cache_write"):
+            self.db.collection(WEATHER_CACHE_COLLECTION).document(cell_id).set(forecast)
+        self.memory_cache.set(cell_id, forecast, expires_at=expires)
+        return forecast
+
+    def get_forecast(self, lat: float, lon: float) -> dict[str, Any]:
+        """Gjeldende prognose for grid-cellen, fra L1, Firestore eller MET i den rekkefølgen."""
+        cell_id = self.cache.get_cell_id(lat, lon)
+        return self._load(cell_id, time.time()) or self._fetch(lat, lon, cell_id)
+
+    def get_records(self, lat: float, lon: float, points: int, timeslot: int | None = None) -> list[dict[str, Any]]:
+        """De første points timene av prognosen, fra starten av timeslot (standard: gjeldende)."""
+        if points < 1:
+            raise ValueError("points must be >= 1")
+        if timeslot is None:
+            timeslot = self.cache.current_timeslot()
+
+        forecast = self.get_forecast(lat, lon)
+        records: list[dict[str, Any]] = []
+        for index, timestamp in enumerate(forecast["timestamps"]):
+            if parse_timestamp(timestamp).timestamp() < timeslot:
+                continue
+            records.append({"timestamp": timestamp, **{column: forecast[column][index] for column in _COLUMNS}})
+            if len(records) == points:
+                break
+
+        if not records:
+            raise ValueError(f"No forecast records from timeslot {timeslot}")
+        return records
@@ -0,0 +1,266 @@
+"""
+Streaming ingestion of weather input into columnar buffers.
+
+CSV and newline-delimited JSON are parsed one line at a time straight into
+typed array('d') columns, so memory grows with the number of columns times
+rows of 8-byte floats rather than with per-row dicts and model objects.
+Errors carry the 1-based line number of the offending input line.
+
+parse_weather_stream only receives the body on the event loop; the parsing
+itself runs on the compute pool in batches of PARSE_BATCH_BYTES.
+"""
+from __future__ import annotations
+
+import csv
+import json
+from array import array
+from datetime import datetime
+from typing import TYPE_CHECKING, Any, AsyncIterable, Iterable, Iterator
+
+from app.services.executors import run_compute
+
+if TYPE_CHECKING:
+    from app.services.fire_risk_kernel import WeatherSeries
+
+
+REQUIRED_FIELDS = ("timestamp", "temperature", "relative_humidity", "wind_speed")
+
+FORMAT_CSV = "csv"
+FORMAT_NDJSON = "ndjson"
+# Én værlinje er et par hundre byte; lengre linjer avvises i stedet for å bufres i det uendelige.
+MAX_LINE_BYTES = 64 * 1024
+# RFC 7464 (application/json-seq) starter hver post med record separator.
+RECORD_SEPARATOR = "\x1e"
+# Så mange byte samles opp på event-loopen før de parses i compute-poolen (én overlevering per batch).
+PARSE_BATCH_BYTES = 64 * 1024
+
+
+def parse_timestamp(value: Any) -> datetime:
+    if isinstance(value, datetime):
+        return value
+    if not isinstance(value, str):
+        raise ValueError("timestamp must be an ISO-8601 string")
+    normalized = value.replace("Z", "+00:00")
+    try:
+        return datetime.fromisoformat(normalized)
+    except ValueError as exc:
+        raise ValueError(f"Invalid timestamp: {value}") from exc
+
+
+def detect_format(content_type: str) -> str | None:
+    content_type = content_type.lower()
+    if "text/csv" in content_type:
+        return FORMAT_CSV
+    if "ndjson" in content_type or "jsonl" in content_type or "json-seq" in content_type:
+        return FORMAT_NDJSON
+    return None
+
+
+class WeatherColumns:
+    """Growable typed columns for one weather series."""
+
+    def __init__(self) -> None:
+        self.origin: datetime | None = None
+        self.offsets = array("d")
+        self.temperature = array("d")
+        self.humidity = array("d")
+        self.wind_speed = array("d")
+
+    def __len__(self) -> int:
+        return len(self.offsets)
+
+    def append(self, timestamp: datetime, temperature: float, humidity: float, wind_speed: float) -> None:
+        if self.origin is None:
+            self.origin = timestamp
+        try:
+            offset = (timestamp - self.origin).total_seconds()
+        except TypeError as exc:
+            raise ValueError("Timestamps must either all have a timezone or all lack one") from exc
+        self.offsets.append(offset)
+        self.temperature.append(temperature)
+        self.humidity.append(humidity)
+        self.wind_speed.append(wind_speed)
+
+    def to_series(self) -> WeatherSeries:
+        import numpy as np
+
+        from app.services.fire_risk_kernel import WeatherSeries
+
+        if self.origin is None:
+            raise ValueError("Weather data is empty")
+        return WeatherSeries(
+            origin=self.origin,
+            offsets=np.frombuffer(self.offsets, dtype=float),
+            temperature=np.frombuffer(self.temperature, dtype=float),
+            humidity=np.frombuffer(self.humidity, dtype=float),
+            wind_speed=np.frombuffer(self.wind_speed, dtype=float),
+        )
+
+
+def _field_float(value: Any, field: str, line_no: int) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"Line {line_no}: invalid {field} value {value!r}") from None
+
+
+def _field_timestamp(value: Any, line_no: int) -> datetime:
+    try:
+        return parse_timestamp(value)
+    except ValueError as exc:
+        raise ValueError(f"Line {line_no}: {exc}") from None
+
+
+class CsvWeatherParser:
+    empty_message = "CSV input is empty"
+
+    def __init__(self) -> None:
+        self.columns = WeatherColumns()
+        self._index: dict[str, int] | None = None
+
+    def feed_line(self, line_no: int, line: str) -> None:
+        if not line.strip():
+            return
+        row = next(csv.reader([line]))
+        if self._index is None:
+            header = [name.strip() for name in row]
+            missing = [field for field in REQUIRED_FIELDS if field not in header]
+            if missing:
+                raise ValueError(f"Line {line_no}: CSV header is missing columns: {', '.join(missing)}")
+            self._index = {field: header.index(field) for field in REQUIRED_FIELDS}
+            return
+
+        index = self._index
+        if len(row) <= max(index.values()):
+            raise ValueError(f"Line {line_no}: expected at least {max(index.values()) + 1} columns, got {len(row)}")
+        self.columns.append(
+            _field_timestamp(row[index["timestamp"]].strip(), line_no),
+            _field_float(row[index["temperature"]], "temperature", line_no),
+            _field_float(row[index["relative_humidity"]], "relative_humidity", line_no),
+            _field_float(row[index["wind_speed"]], "wind_speed", line_no),
+        )
+
+
+class NdjsonWeatherParser:
+    empty_message = "NDJSON input is empty"
+
+    def __init__(self) -> None:
+        self.columns = WeatherColumns()
+
+    def feed_line(self, line_no: int, line: str) -> None:
+        line = line.lstrip(RECORD_SEPARATOR)
+        if not line.strip():
+            return
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError as exc:
+            raise ValueError(f"Line {line_no}: invalid JSON: {exc.msg}") from None
+        if not isinstance(record, dict):
+            raise ValueError(f"Line {line_no}: expected a JSON object")
+        missing = [field for field in REQUIRED_FIELDS if field not in record]
+        if missing:
+            raise ValueError(f"Line {line_no} is missing fields: {', '.join(missing)}")
+        self.columns.append(
+            _field_timestamp(record["timestamp"], line_no),
+            _field_float(record["temperature"], "temperature", line_no),
+            _field_float(record["relative_humidity"], "relative_humidity", line_no),
+            _field_float(record["wind_speed"], "wind_speed", line_no),
+        )
+
+
+def _make_parser(fmt: str) -> CsvWeatherParser | NdjsonWeatherParser:
+    if fmt == FORMAT_CSV:
+        return CsvWeatherParser()
+    if fmt == FORMAT_NDJSON:
+        return NdjsonWeatherParser()
+    raise ValueError(f"Unsupported weather format: {fmt}")
+
+
+def _decode(line_no: int, raw: bytes | bytearray) -> str:
+    try:
+        text = raw.decode("utf-8")
+    except UnicodeDecodeError:
+        raise ValueError(f"Line {line_no}: invalid UTF-8") from None
+    if line_no == 1:
+        text = text.lstrip("\ufeff")
+    return text.rstrip("\r")
+
+
+class _LineSplitter:
+    """Turns arbitrary byte chunks into complete, numbered lines of at most MAX_LINE_BYTES."""
+
+    def __init__(self) -> None:
+        self._buffer = bytearray()
+        self._line_no = 0
+
+    def _check_length(self, length: int) -> None:
+        if length > MAX_LINE_BYTES:
+            raise ValueError(f"Line {self._line_no + 1}: longer than {MAX_LINE_BYTES} bytes")
+
+    def feed(self, chunk: bytes) -> Iterator[tuple[int, str]]:
+        # Det som ligger i bufferen fra før har ingen linjeskift, så bare de nye bytene søkes gjennom.
+        search_from = len(self._buffer)
+        self._buffer += chunk
+        line_start = 0
+        newline = self._buffer.find(b"\n", search_from)
+        while newline != -1:
+            self._check_length(newline - line_start)
+            self._line_no += 1
+            yield self._line_no, _decode(self._line_no, self._buffer[line_start:newline])
+            line_start = newline + 1
+            newline = self._buffer.find(b"\n", line_start)
+        del self._buffer[:line_start]
+        self._check_length(len(self._buffer))
+
+    def finish(self) -> Iterator[tuple[int, str]]:
+        if self._buffer:
+            self._line_no += 1
+            raw, self._buffer = self._buffer, bytearray()
+            yield self._line_no, _decode(self._line_no, raw)
+
+
+def _finish(parser: CsvWeatherParser | NdjsonWeatherParser) -> WeatherSeries:
+    if len(parser.columns) == 0:
+        raise ValueError(parser.empty_message)
+    return parser.columns.to_series()
+
+
+class WeatherStreamParser:
+    """Incremental parser: feed() byte chunks in order, then finish() for the series."""
+
+    def __init__(self, fmt: str) -> None:
+        self._parser = _make_parser(fmt)
+        self._splitter = _LineSplitter()
+
+    def feed(self, chunks: Iterable[bytes]) -> None:
+        for chunk in chunks:
+            for line_no, line in self._splitter.feed(chunk):
+                self._parser.feed_line(line_no, line)
+
+    def finish(self, chunks: Iterable[bytes] = ()) -> WeatherSeries:
+        self.feed(chunks)
+        for line_no, line in self._splitter.finish():
+            self._parser.feed_line(line_no, line)
+        return _finish(self._parser)
+
+
+def parse_weather_chunks(chunks: Iterable[bytes], fmt: str) -> WeatherSeries:
+    return WeatherStreamParser(fmt).finish(chunks)
+
+
+async def parse_weather_stream(chunks: AsyncIterable[bytes], fmt: str) -> WeatherSeries:
+    parser = WeatherStreamParser(fmt)
+    pending: list[bytes] = []
+    pending_bytes = 0
+    async for chunk in chunks:
+        pending.append(chunk)
+        pending_bytes += len(chunk)
+        if pending_bytes >= PARSE_BATCH_BYTES:
+            # Batchene parses én om gangen, så parseren brukes aldri fra to tråder samtidig.
+            await run_compute(parser.feed, pending)
+            pending, pending_bytes = [], 0
+    return await run_compute(parser.finish, pending)
+
+
+def parse_weather_text(text: str, fmt: str) -> WeatherSeries:
+    return parse_weather_chunks([text.encode("utf-8")], fmt)
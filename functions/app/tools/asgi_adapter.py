@@ -1,30 +1,134 @@
-from asgiref.sync import async_to_sync
-from typing import Callable, Iterable
+from __future__ import annotations
+
+import asyncio
+import queue
+import threading
+import traceback
+from concurrent.futures import Future
+from http import HTTPStatus
+from typing import Any, Callable, Iterable, Iterator
+
+# Chunk size used when handing the request body to the ASGI app.
+BODY_CHUNK_SIZE = 64 * 1024
+
+_DONE = object()
+
+
+class _LoopThread:
+    """One event loop running on a daemon thread for the lifetime of the process."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._loop: asyncio.AbstractEventLoop | None = None
+
+    def get_loop(self) -> asyncio.AbstractEventLoop:
+        if self._loop is None:
+            with self._lock:
+                if self._loop is None:
+                    loop = asyncio.new_event_loop()
+                    ready = threading.Event()
+
+                    def run() -> None:
+                        asyncio.set_event_loop(loop)
+                        loop.call_soon(ready.set)
+                        loop.run_forever()
+
+                    threading.Thread(target=run, name="asgi-event-loop", daemon=True).start()
+                    ready.wait()
+                    self._loop = loop
+        return self._loop
+
+    def submit(self, coro) -> Future:
+        return asyncio.run_coroutine_threadsafe(coro, self.get_loop())
+
+
+_loop_thread = _LoopThread()
+
+# environ key -> ASGI header name, e.g. "HTTP_X_API_KEY" -> b"x-api-key".
+_header_names: dict[str, bytes] = {}
+
+
+def _header_name(key: str) -> bytes:
+    name = _header_names.get(key)
+    if name is None:
+        name = key[5:].replace("_", "-").lower().encode("latin1")
+        _header_names[key] = name
+    return name
+
+
+def _status_line(status_code: int) -> str:
+    try:
+        return f"{status_code} {HTTPStatus(status_code).phrase}"
+    except ValueError:
+        return f"{status_code} Unknown"
+
+
+class _ResponseBody:
+    """Iterates response chunks as the ASGI app sends them."""
+
+    def __init__(self, messages: queue.Queue, task: Future, on_close: Callable[[], None]) -> None:
+        self._messages = messages
+        self._task = task
+        self._on_close = on_close
+        self._finished = False
+
+    def __iter__(self) -> Iterator[bytes]:
+        while not self._finished:
+            message = self._messages.get()
+            if message is _DONE:
+                self._finished = True
+                self._raise_if_failed()
+                break
+            if message["type"] != "http.response.body":
+                continue
+            chunk = message.get("body", b"")
+            if chunk:
+                yield chunk
+            if not message.get("more_body", False):
+                self._finished = True
+
+    def _raise_if_failed(self) -> None:
+        # Statuslinjen er allerede sendt, så feilen kan bare meldes ved å avbryte kroppen.
+        if self._task.cancelled():
+            return
+        exc = self._task.exception()
+        if exc is not None:
+            traceback.print_exception(exc)
+            raise RuntimeError(f"ASGI app failed after the response started: {exc}") from exc
+
+    def close(self) -> None:
+        self._on_close()
+        if not self._task.done():
+            self._task.cancel()
 
 
 class AsgiToWsgi:
-    """Minimal ASGI -> WSGI adapter so FastAPI can run under firebase_functions."""
+    """
+    ASGI -> WSGI adapter so FastAPI can run under firebase_functions.
+
+    Every request is scheduled on one event loop that lives on a background
+    thread for the life of the instance, so async clients and connection pools
+    survive between requests. The response body is streamed back chunk by
+    chunk instead of being buffered.
+    """
 
     def __init__(self, asgi_app):
         self.asgi_app = asgi_app
 
-    def __call__(self, environ, start_response: Callable[[str, list[tuple[str, str]]], None]) -> Iterable[bytes]:
-        # Read only declared bytes to avoid blocking if CONTENT_LENGTH is missing.
-        content_length = int(environ.get("CONTENT_LENGTH") or "0")
-        body = environ["wsgi.input"].read(content_length) if content_length else b""
-
-        headers: list[tuple[bytes, bytes]] = []
-        for key, value in environ.items():
-            if key.startswith("HTTP_"):
-                name = key[5:].replace("_", "-").lower().encode()
-                headers.append((name, str(value).encode()))
+    def _scope(self, environ) -> dict[str, Any]:
+        headers: list[tuple[bytes, bytes]] = [
+            (_header_name(key), str(value).encode("latin1"))
+            for key, value in environ.items()
+            if key.startswith("HTTP_")
+        ]
         if "CONTENT_TYPE" in environ:
-            headers.append((b"content-type", environ["CONTENT_TYPE"].encode()))
+            headers.append((b"content-type", environ["CONTENT_TYPE"].encode("latin1")))
         if "CONTENT_LENGTH" in environ:
-            headers.append((b"content-length", environ["CONTENT_LENGTH"].encode()))
+            headers.append((b"content-length", environ["CONTENT_LENGTH"].encode("latin1")))
 
-        scope = {
+        return {
             "type": "http",
+            "asgi": {"version": "3.0"},
             "http_version": "1.1",
             "method": environ.get("REQUEST_METHOD", "GET"),
             "path": environ.get("PATH_INFO", ""),
@@ -37,34 +141,58 @@ class AsgiToWsgi:
             "client": None,
         }
 
-        response_body: list[bytes] = []
-        status_headers: dict[str, object] = {}
+    def __call__(self, environ, start_response: Callable[[str, list[tuple[str, str]]], None]) -> Iterable[bytes]:
+        # Read only declared bytes to avoid blocking if CONTENT_LENGTH is missing.
+        remaining = int(environ.get("CONTENT_LENGTH") or "0")
+        stream = environ["wsgi.input"]
+        messages: queue.Queue = queue.Queue()
+        loop = _loop_thread.get_loop()
+        body_done = False
+        # Settes når WSGI-serveren lukker svaret (ferdig eller klienten borte).
+        disconnected = asyncio.Event()
+
+        def read_chunk() -> bytes:
+            nonlocal remaining
+            data = stream.read(min(remaining, BODY_CHUNK_SIZE)) if remaining > 0 else b""
+            remaining = remaining - len(data) if data else 0
+            return data
 
         async def receive():
-            nonlocal body
-            data, body = body, b""
-            return {"type": "http.request", "body": data, "more_body": False}
+            nonlocal body_done
+            if body_done:
+                # Etter siste bit venter vi på frakobling i stedet for å returnere tomme meldinger i en løkke.
+                await disconnected.wait()
+                return {"type": "http.disconnect"}
+            data = await loop.run_in_executor(None, read_chunk)
+            body_done = remaining <= 0
+            return {"type": "http.request", "body": data, "more_body": not body_done}
 
         async def send(message):
+            messages.put(message)
+
+        task = _loop_thread.submit(self.asgi_app(self._scope(environ), receive, send))
+        task.add_done_callback(lambda _: messages.put(_DONE))
+
+        # Wait for the response start; body chunks that arrive after it are streamed.
+        start = None
+        while start is None:
+            message = messages.get()
+            if message is _DONE:
+                break
             if message["type"] == "http.response.start":
-                status_headers["status"] = message["status"]
-                status_headers["headers"] = message.get("headers", [])
-            elif message["type"] == "http.response.body":
-                response_body.append(message.get("body", b""))
-
-        try:
-            async_to_sync(self.asgi_app)(scope, receive, send)
-        except Exception as exc:  # pragma: no cover - diagnostic logging for emulator failures
-            import traceback
-
-            traceback.print_exc()
-            status_headers["status"] = 500
-            status_headers["headers"] = [(b"content-type", b"text/plain")]
-            response_body.append(f"ASGI error: {exc}".encode())
-
-        status_code = int(status_headers.get("status", 200))
-        header_list = [
-            (name.decode("latin1"), value.decode("latin1")) for name, value in status_headers.get("headers", [])
-        ]
-        start_response(f"{status_code} OK", header_list)
-        return response_body
+                start = message
+
+        def on_close() -> None:
+            loop.call_soon_threadsafe(disconnected.set)
+
+        if start is None:
+            on_close()
+            exc = task.exception()
+            if exc is not None:  # pragma: no cover - diagnostic logging for emulator failures
+                traceback.print_exception(exc)
+            start_response("500 Internal Server Error", [("content-type", "text/plain")])
+            return [f"ASGI error: {exc}".encode()]
+
+        header_list = [(name.decode("latin1"), value.decode("latin1")) for name, value in start.get("headers", [])]
+        start_response(_status_line(int(start.get("status", 200))), header_list)
+        return _ResponseBody(messages, task, on_close)
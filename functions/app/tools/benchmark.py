@@ -0,0 +1,450 @@
+"""
+Offline benchmark suite for the request hot paths.
+
+Runs without network access or credentials: Firestore, MET and Pub/Sub are
+replaced by the in-process fakes in app.tools.offline. Measures:
+- compute: compute_fire_risk_from_records at 12 to 10k hourly points
+- parse: the CSV and JSON body paths of POST /fire-risk/compute
+- serialize: _to_jsonable and render_json of a computed result
+- adapter: AsgiToWsgi round trip against a minimal ASGI app, next to calling
+  the app directly on an event loop
+- api: main.api end to end (health, compute-by-location hit/miss, CSV compute)
+
+Results are written as JSON (one entry per case with median, p95, mean, min
+and max in milliseconds, plus the git commit and runtime versions), so runs
+from two commits can be compared:
+
+Run from the functions directory:
+  python -m app.tools.benchmark --output bench-main.json
+  python -m app.tools.benchmark --output bench-branch.json --compare bench-main.json --fail-on-regression
+  python -m app.tools.benchmark --only compute --only parse --quick
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import io
+import json
+import math
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable
+
+import numpy as np
+
+
+SCHEMA_VERSION = 1
+GROUPS = ("compute", "parse", "serialize", "adapter", "api")
+COMPUTE_POINTS = (12, 72, 720, 10_000)
+PARSE_POINTS = (72, 10_000)
+SERIALIZE_POINTS = (72, 800)
+BENCH_API_KEY = "bench-key"
+BENCH_LOCATION = {"lat": "60.3913", "lon": "5.3221"}
+DEFAULT_REGRESSION_THRESHOLD = 0.10
+# Omtrentlig måletid per case. Tunge caser (10k punkter, kald cache) måles færre ganger, minst 5.
+REPEAT_BUDGET_MS = 1500
+
+
+@dataclass
+class Case:
+    group: str
+    name: str
+    fn: Callable[[], Any]
+    params: dict[str, Any] = field(default_factory=dict)
+    setup: Callable[[], Any] | None = None
+    repeat: int | None = None
+
+
+def synthetic_records(points: int) -> list[dict[str, Any]]:
+    start = datetime(2026, 4, 13, 12, tzinfo=timezone.utc)
+    rng = np.random.default_rng(points)
+    temperature = 8.0 + 7.0 * np.sin(np.arange(points) / 24 * 2 * math.pi) + rng.normal(0, 0.5, points)
+    humidity = np.clip(60.0 + 30.0 * np.cos(np.arange(points) / 17) + rng.normal(0, 2, points), 5, 100)
+    wind = 3.0 + rng.uniform(0, 5, points)
+    return [
+        {
+            "timestamp": (start + timedelta(hours=hour)).strftime("%Y-%m-%dT%H:%M:%SZ"),
+            "temperature": round(float(temperature[hour]), 2),
+            "relative_humidity": round(float(humidity[hour]), 2),
+            "wind_speed": round(float(wind[hour]), 2),
+        }
+        for hour in range(points)
+    ]
+
+
+def csv_body(records: list[dict[str, Any]]) -> bytes:
+    lines = ["timestamp,temperature,relative_humidity,wind_speed"]
+    lines.extend(
+        f"{record['timestamp']},{record['temperature']},{record['relative_humidity']},{record['wind_speed']}"
+        for record in records
+    )
+    return ("\n".join(lines) + "\n").encode("utf-8")
+
+
+def json_body(records: list[dict[str, Any]]) -> bytes:
+    return json.dumps({"records": records}).encode("utf-8")
+
+
+def _chunks(body: bytes, size: int = 64 * 1024) -> list[bytes]:
+    return [body[start:start + size] for start in range(0, len(body), size)]
+
+
+def measure(case: Case, repeat: int, warmup: int) -> dict[str, Any]:
+    for _ in range(warmup):
+        if case.setup is not None:
+            case.setup()
+        case.fn()
+
+    samples: list[float] = []
+    for _ in range(repeat):
+        if case.setup is not None:
+            case.setup()
+        started = time.perf_counter_ns()
+        case.fn()
+        samples.append((time.perf_counter_ns() - started) / 1e6)
+
+    ordered = sorted(samples)
+    return {
+        "group": case.group,
+        "name": case.name,
+        "params": case.params,
+        "repeat": repeat,
+        "median_ms": round(statistics.median(ordered), 4),
+        "p95_ms": round(ordered[min(len(ordered) - 1, math.ceil(0.95 * len(ordered)) - 1)], 4),
+        "mean_ms": round(statistics.fmean(ordered), 4),
+        "min_ms": round(ordered[0], 4),
+        "max_ms": round(ordered[-1], 4),
+    }
+
+
+def compute_cases() -> list[Case]:
+    from app.services.fire_risk_service import compute_fire_risk_from_records
+    from app.tools.benchmark_serialization import legacy_to_jsonable
+
+    cases = []
+    for points in COMPUTE_POINTS:
+        records = synthetic_records(points)
+        cases.append(Case("compute", f"compute_records[{points}]", lambda r=records: compute_fire_risk_from_records(r), {"points": points}))
+    return cases
+
+
+def parse_cases() -> list[Case]:
+    from app.api.fire_risk import _extract_records
+    from app.services.fire_risk_service import _to_weather_series
+    from app.services.weather_ingest import FORMAT_CSV, parse_weather_chunks
+
+    cases = []
+    for points in PARSE_POINTS:
+        records = synthetic_records(points)
+        csv_chunks = _chunks(csv_body(records))
+        body = json_body(records)
+        cases.append(
+            Case("parse", f"parse_csv[{points}]", lambda c=csv_chunks: parse_weather_chunks(c, FORMAT_CSV), {"points": points})
+        )
+        cases.append(
+            Case(
+                "parse",
+                f"parse_json[{points}]",
+                lambda b=body: _to_weather_series(_extract_records(json.loads(b))),
+                {"points": points},
+            )
+        )
+    return cases
+
+
+def serialize_cases() -> list[Case]:
+    from app.api.responses import render_json
+    from app.services.fire_risk_service import compute_fire_risk_from_records
+    from app.tools.benchmark_serialization import legacy_to_jsonable
+
+    cases = []
+    for points in SERIALIZE_POINTS:
+        result = compute_fire_risk_from_records(synthetic_records(points))
+        cases.append(Case("serialize", f"to_jsonable[{points}]", lambda r=result: legacy_to_jsonable(r), {"points": points}))
+        cases.append(Case("serialize", f"render_json[{points}]", lambda r=result: render_json(r), {"points": points}))
+    return cases
+
+
+async def _minimal_app(scope, receive, send) -> None:
+    message = await receive()
+    while message.get("more_body"):
+        message = await receive()
+    await send({"type": "http.response.start", "status": 200, "headers": [(b"content-type", b"application/json")]})
+    await send({"type": "http.response.body", "body": b'{"status":"ok"}'})
+
+
+def _asgi_scope(method: str, body: bytes) -> dict[str, Any]:
+    return {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": method,
+        "path": "/bench",
+        "raw_path": b"/bench",
+        "root_path": "",
+        "query_string": b"",
+        "headers": [(b"content-length", str(len(body)).encode())],
+        "scheme": "http",
+        "server": ("localhost", 80),
+        "client": None,
+    }
+
+
+def adapter_cases() -> list[Case]:
+    from app.tools.asgi_adapter import AsgiToWsgi
+
+    adapter = AsgiToWsgi(_minimal_app)
+    loop = asyncio.new_event_loop()
+
+    def direct(method: str, body: bytes) -> None:
+        async def receive():
+            return {"type": "http.request", "body": body, "more_body": False}
+
+        async def send(message):
+            pass
+
+        loop.run_until_complete(_minimal_app(_asgi_scope(method, body), receive, send))
+
+    def through_adapter(method: str, body: bytes) -> None:
+        environ = {
+            "REQUEST_METHOD": method,
+            "PATH_INFO": "/bench",
+            "QUERY_STRING": "",
+            "CONTENT_LENGTH": str(len(body)),
+            "wsgi.input": io.BytesIO(body),
+            "wsgi.url_scheme": "http",
+            "SERVER_NAME": "localhost",
+            "SERVER_PORT": "80",
+        }
+        result = adapter(environ, lambda status, headers, exc_info=None: None)
+        try:
+            for _ in result:
+                pass
+        finally:
+            close = getattr(result, "close", None)
+            if close is not None:
+                close()
+
+    upload = csv_body(synthetic_records(10_000))
+    return [
+        Case("adapter", "asgi_direct[get]", lambda: direct("GET", b"")),
+        Case("adapter", "asgi_adapter[get]", lambda: through_adapter("GET", b"")),
+        Case("adapter", "asgi_direct[post]", lambda: direct("POST", upload), {"bytes": len(upload)}),
+        Case("adapter", "asgi_adapter[post]", lambda: through_adapter("POST", upload), {"bytes": len(upload)}),
+    ]
+
+
+def api_cases() -> list[Case]:
+    import firebase_admin
+
+    from app.security.api_keys import API_KEY_HEADER
+    from app.tools.offline import install_offline_backends, reset_caches
+
+    backends = install_offline_backends(api_keys_to_seed=[BENCH_API_KEY])
+    # main.py kaller initialize_app() ved import; offline finnes det ingen credentials å initialisere med.
+    firebase_admin.initialize_app = lambda *args, **kwargs: None
+
+    import main
+    from firebase_functions import https_fn
+    from werkzeug.test import EnvironBuilder
+
+    def call(path: str, method: str = "GET", query: dict[str, str] | None = None, body: bytes | None = None, content_type: str | None = None):
+        environ = EnvironBuilder(
+            path=path,
+            method=method,
+            query_string=query,
+            data=body,
+            content_type=content_type,
+            headers={API_KEY_HEADER: BENCH_API_KEY},
+        ).get_environ()
+        response = main.api(https_fn.Request(environ))
+        data = response.get_data()
+        if response.status_code != 200:
+            raise RuntimeError(f"{method} {path} returned {response.status_code}: {data[:200]!r}")
+        return data
+
+    def drop_results() -> None:
+        # Resultatcachen tømmes, men værcachen beholdes: måler beregning, ikke MET.
+        from app.services import fire_risk_cache_service
+
+        fire_risk_cache_service.L1_CACHE.clear()
+        fire_risk_cache_service.LAST_KNOWN_CACHE.clear()
+        for collection in ("fire_risk_cache", "fire_risk_cache_leases"):
+            for document_id in backends.db.documents(collection):
+                backends.db.collection(collection).document(document_id).delete()
+
+    def drop_everything() -> None:
+        reset_caches()
+        for collection in ("fire_risk_cache", "fire_risk_cache_leases", "fire_risk_weather_cache"):
+            for document_id in backends.db.documents(collection):
+                backends.db.collection(collection).document(document_id).delete()
+
+    upload = csv_body(synthetic_records(72))
+    return [
+        Case("api", "api_health", lambda: call("/health")),
+        Case("api", "api_by_location[hit]", lambda: call("/fire-risk/compute-by-location", query=BENCH_LOCATION), BENCH_LOCATION),
+        Case(
+            "api",
+            "api_by_location[miss]",
+            lambda: call("/fire-risk/compute-by-location", query=BENCH_LOCATION),
+            BENCH_LOCATION,
+            setup=drop_results,
+        ),
+        Case(
+            "api",
+            "api_by_location[cold]",
+            lambda: call("/fire-risk/compute-by-location", query=BENCH_LOCATION),
+            BENCH_LOCATION,
+            setup=drop_everything,
+        ),
+        Case(
+            "api",
+            "api_compute_csv[72]",
+            lambda: call("/fire-risk/compute", method="POST", body=upload, content_type="text/csv"),
+            {"points": 72},
+        ),
+    ]
+
+
+CASE_BUILDERS: dict[str, Callable[[], list[Case]]] = {
+    "compute": compute_cases,
+    "parse": parse_cases,
+    "serialize": serialize_cases,
+    "adapter": adapter_cases,
+    "api": api_cases,
+}
+
+
+def _repeat_for(case: Case, default: int) -> int:
+    if case.repeat is not None:
+        return case.repeat
+    # Én prøvekjøring bestemmer hvor mange målinger som får plass i budsjettet, innenfor [5, default].
+    if case.setup is not None:
+        case.setup()
+    started = time.perf_counter()
+    case.fn()
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    return max(5, min(default, int(REPEAT_BUDGET_MS / max(elapsed_ms, 1e-3))))
+
+
+def _git_commit() -> str | None:
+    try:
+        completed = subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            capture_output=True,
+            text=True,
+            timeout=5,
+        )
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return completed.stdout.strip() or None
+
+
+def environment() -> dict[str, Any]:
+    return {
+        "git_commit": _git_commit(),
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "numpy": np.__version__,
+    }
+
+
+def run(groups: list[str], repeat: int, warmup: int) -> dict[str, Any]:
+    cases: list[dict[str, Any]] = []
+    skipped: list[dict[str, str]] = []
+    for group in groups:
+        try:
+            group_cases = CASE_BUILDERS[group]()
+        except ImportError as exc:
+            skipped.append({"group": group, "reason": str(exc)})
+            continue
+        for case in group_cases:
+            cases.append(measure(case, _repeat_for(case, repeat), warmup))
+    return {
+        "schema_version": SCHEMA_VERSION,
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "environment": environment(),
+        "cases": cases,
+        "skipped": skipped,
+    }
+
+
+def compare(current: dict[str, Any], baseline: dict[str, Any], threshold: float) -> list[dict[str, Any]]:
+    """Median per case against the baseline. A case regresses when it is more than threshold slower."""
+    previous = {case["name"]: case for case in baseline.get("cases", [])}
+    rows = []
+    for case in current["cases"]:
+        before = previous.get(case["name"])
+        if before is None or not before.get("median_ms"):
+            continue
+        ratio = case["median_ms"] / before["median_ms"]
+        rows.append(
+            {
+                "name": case["name"],
+                "baseline_median_ms": before["median_ms"],
+                "median_ms": case["median_ms"],
+                "ratio": round(ratio, 4),
+                "regression": ratio > 1 + threshold,
+            }
+        )
+    return rows
+
+
+def _print_report(report: dict[str, Any]) -> None:
+    print(f"{'case':<28} {'repeat':>6} {'median ms':>11} {'p95 ms':>11} {'min ms':>11}")
+    for case in report["cases"]:
+        print(f"{case['name']:<28} {case['repeat']:>6} {case['median_ms']:>11.4f} {case['p95_ms']:>11.4f} {case['min_ms']:>11.4f}")
+    for skipped in report["skipped"]:
+        print(f"skipped {skipped['group']}: {skipped['reason']}")
+
+
+def _print_comparison(rows: list[dict[str, Any]]) -> None:
+    print(f"\n{'case':<28} {'baseline ms':>12} {'current ms':>12} {'ratio':>8}")
+    for row in rows:
+        marker = "  REGRESSION" if row["regression"] else ""
+        print(f"{row['name']:<28} {row['baseline_median_ms']:>12.4f} {row['median_ms']:>12.4f} {row['ratio']:>8.3f}{marker}")
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Offline benchmarks for the FireGuard request hot paths")
+    parser.add_argument("--only", action="append", choices=GROUPS, help="Run only these groups (repeatable)")
+    parser.add_argument("--repeat", type=int, default=200, help="Maximum measurements per case")
+    parser.add_argument("--warmup", type=int, default=3, help="Untimed runs per case before measuring")
+    parser.add_argument("--quick", action="store_true", help="Few measurements per case, for smoke runs")
+    parser.add_argument("--output", help="Write the results as JSON to this file")
+    parser.add_argument("--compare", help="Baseline JSON from an earlier run to compare medians against")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_REGRESSION_THRESHOLD, help="Allowed slowdown, 0.10 = 10%%")
+    parser.add_argument("--fail-on-regression", action="store_true", help="Exit with status 1 if any case regressed")
+    args = parser.parse_args(argv)
+
+    repeat, warmup = (5, 1) if args.quick else (args.repeat, args.warmup)
+    report = run(args.only or list(GROUPS), repeat, warmup)
+    _print_report(report)
+
+    regressed = False
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as handle:
+            rows = compare(report, json.load(handle), args.threshold)
+        report["comparison"] = {"baseline": args.compare, "threshold": args.threshold, "cases": rows}
+        _print_comparison(rows)
+        regressed = any(row["regression"] for row in rows)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as handle:
+            json.dump(report, handle, indent=2)
+            handle.write("\n")
+    return 1 if regressed and args.fail_on_regression else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,94 @@
+"""
+Compare response serialization paths for a fire-risk result.
+
+Builds a synthetic result with the same shape as /fire-risk/compute output and
+times:
+- legacy: _to_jsonable + FastAPI jsonable_encoder + JSONResponse rendering
+- direct: app.api.responses.render_json
+- direct+gzip / direct+br: render_json followed by compression
+
+Run from the functions directory:
+  python -m app.tools.benchmark_serialization --points 800 --repeat 200
+"""
+from __future__ import annotations
+
+import argparse
+import time
+from dataclasses import asdict, is_dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable
+
+import numpy as np
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from app.api.responses import brotli, compress, render_json
+from app.services.fire_risk_kernel import FireRiskSeries
+from app.services.fire_risk_service import _series_to_result
+
+
+def build_result(points: int) -> dict[str, Any]:
+    start = datetime(2026, 4, 13, 12, tzinfo=timezone.utc)
+    rng = np.random.default_rng(0)
+    series = FireRiskSeries(
+        timestamps=[start + timedelta(hours=hour) for hour in range(points)],
+        ttf=rng.uniform(2.0, 9.0, points),
+    )
+    return _series_to_result(series)
+
+
+def legacy_to_jsonable(value: Any) -> Any:
+    """The generic converter every result went through before render_json; kept as the baseline."""
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    if isinstance(value, list):
+        return [legacy_to_jsonable(item) for item in value]
+    if isinstance(value, tuple):
+        return [legacy_to_jsonable(item) for item in value]
+    if isinstance(value, dict):
+        return {str(key): legacy_to_jsonable(item) for key, item in value.items()}
+    if is_dataclass(value):
+        return legacy_to_jsonable(asdict(value))
+    if hasattr(value, "model_dump"):
+        return legacy_to_jsonable(value.model_dump())
+    if hasattr(value, "__dict__"):
+        return legacy_to_jsonable(vars(value))
+    return str(value)
+
+
+def legacy_render(result: dict[str, Any]) -> bytes:
+    return JSONResponse(jsonable_encoder(legacy_to_jsonable(result))).body
+
+
+def time_call(fn: Callable[[], bytes], repeat: int) -> tuple[float, int]:
+    size = len(fn())
+    started = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - started) / repeat * 1000, size
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--points", type=int, default=800, help="Hourly points in the synthetic result")
+    parser.add_argument("--repeat", type=int, default=200, help="Iterations per serialization path")
+    args = parser.parse_args()
+
+    result = build_result(args.points)
+    paths: list[tuple[str, Callable[[], bytes]]] = [
+        ("legacy", lambda: legacy_render(result)),
+        ("direct", lambda: render_json(result)),
+        ("direct+gzip", lambda: compress(render_json(result), "gzip")),
+    ]
+    if brotli is not None:
+        paths.append(("direct+br", lambda: compress(render_json(result), "br")))
+
+    print(f"{'path':<12} {'ms/op':>9} {'bytes':>9}")
+    for name, fn in paths:
+        millis, size = time_call(fn, args.repeat)
+        print(f"{name:<12} {millis:>9.3f} {size:>9}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
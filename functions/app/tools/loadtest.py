@@ -0,0 +1,349 @@
+"""
+Offline load test for main.api.
+
+Client threads send a weighted mix of requests through the deployed request
+path: main.api, AsgiToWsgi and the FastAPI app with its middleware and API-key
+check. Firestore and Pub/Sub are the in-process fakes from app.tools.offline.
+MET and Open-Meteo are served by a local stub HTTP server with a fixed
+latency. Nothing leaves the machine and no credentials are needed.
+
+Request kinds:
+- hit: compute-by-location in a cell that was computed before the run
+- miss: compute-by-location in a cell never seen before (MET fetch, compute, cache write)
+- csv: POST /fire-risk/compute with a 72-hour CSV body
+- publish: POST /messaging/publish-fire-risk for one of the warm cells
+- health: GET /health
+
+The driver is closed-loop: each of --concurrency workers sends its next
+request as soon as the previous one returns. It reports throughput, p50/p95/p99
+and a latency histogram per kind, plus the mean Server-Timing stages, so you
+can see where the time goes. Results can also be written as JSON.
+
+Run from the functions directory:
+  python -m app.tools.loadtest --concurrency 16 --duration 30 --met-latency-ms 150
+  python -m app.tools.loadtest --mix hit=70,miss=10,csv=10,publish=10 --requests 2000 --output load-main.json
+"""
+from __future__ import annotations
+
+import argparse
+import itertools
+import json
+import math
+import random
+import sys
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable
+
+from app.tools.benchmark import csv_body, environment, synthetic_records
+
+
+SCHEMA_VERSION = 1
+KINDS = ("hit", "miss", "csv", "publish", "health")
+DEFAULT_MIX = "hit=70,miss=10,csv=10,publish=10"
+LOAD_API_KEY = "load-key"
+WARM_LOCATIONS = 16
+CSV_POINTS = 72
+# Øvre grenser (ms) for histogrammet; siste bøtte tar alt over.
+HISTOGRAM_BOUNDS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+
+
+@dataclass
+class KindStats:
+    latencies_ms: list[float] = field(default_factory=list)
+    statuses: dict[int, int] = field(default_factory=dict)
+    stages_ms: dict[str, float] = field(default_factory=dict)
+
+
+class Recorder:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.kinds: dict[str, KindStats] = {}
+
+    def record(self, kind: str, status: int, millis: float, server_timing: str | None) -> None:
+        stages = _parse_server_timing(server_timing)
+        with self._lock:
+            stats = self.kinds.setdefault(kind, KindStats())
+            stats.latencies_ms.append(millis)
+            stats.statuses[status] = stats.statuses.get(status, 0) + 1
+            for name, value in stages.items():
+                stats.stages_ms[name] = stats.stages_ms.get(name, 0.0) + value
+
+
+def _parse_server_timing(header: str | None) -> dict[str, float]:
+    stages: dict[str, float] = {}
+    for entry in (header or "").split(","):
+        name, _, params = entry.strip().partition(";")
+        if name and name != "total" and params.startswith("dur="):
+            stages[name] = float(params[4:])
+    return stages
+
+
+def parse_mix(value: str) -> dict[str, float]:
+    mix: dict[str, float] = {}
+    for part in value.split(","):
+        kind, _, weight = part.partition("=")
+        kind = kind.strip()
+        if kind not in KINDS:
+            raise ValueError(f"Unknown request kind {kind!r}; expected one of {', '.join(KINDS)}")
+        mix[kind] = float(weight or 1)
+    if not any(weight > 0 for weight in mix.values()):
+        raise ValueError("The request mix needs at least one positive weight")
+    return mix
+
+
+def percentile(ordered: list[float], fraction: float) -> float:
+    return ordered[min(len(ordered) - 1, max(0, math.ceil(fraction * len(ordered)) - 1))]
+
+
+def histogram(latencies_ms: list[float]) -> list[dict[str, Any]]:
+    counts = [0] * (len(HISTOGRAM_BOUNDS_MS) + 1)
+    for millis in latencies_ms:
+        index = next((i for i, bound in enumerate(HISTOGRAM_BOUNDS_MS) if millis <= bound), len(HISTOGRAM_BOUNDS_MS))
+        counts[index] += 1
+    return [
+        {"le_ms": HISTOGRAM_BOUNDS_MS[index] if index < len(HISTOGRAM_BOUNDS_MS) else None, "count": count}
+        for index, count in enumerate(counts)
+    ]
+
+
+def summarize(kind: str, stats: KindStats, elapsed: float) -> dict[str, Any]:
+    ordered = sorted(stats.latencies_ms)
+    count = len(ordered)
+    return {
+        "kind": kind,
+        "requests": count,
+        "throughput_rps": round(count / elapsed, 2) if elapsed > 0 else None,
+        "statuses": {str(status): total for status, total in sorted(stats.statuses.items())},
+        "p50_ms": round(percentile(ordered, 0.50), 3),
+        "p95_ms": round(percentile(ordered, 0.95), 3),
+        "p99_ms": round(percentile(ordered, 0.99), 3),
+        "mean_ms": round(sum(ordered) / count, 3),
+        "max_ms": round(ordered[-1], 3),
+        "histogram": histogram(ordered),
+        "mean_stages_ms": {name: round(total / count, 3) for name, total in sorted(stats.stages_ms.items())},
+    }
+
+
+class LoadTarget:
+    """main.api with offline backends, plus one function per request kind."""
+
+    def __init__(self, met_latency_seconds: float, http_stub: bool) -> None:
+        import firebase_admin
+
+        from app.services import request_timing
+        from app.tools.offline import install_offline_backends
+
+        self.backends = install_offline_backends(
+            api_keys_to_seed=[LOAD_API_KEY], met_latency_seconds=met_latency_seconds, http_stub=http_stub
+        )
+        # main.py kaller initialize_app() ved import; offline finnes det ingen credentials å initialisere med.
+        firebase_admin.initialize_app = lambda *args, **kwargs: None
+        # Én JSON-loggelinje per forespørsel ville druknet rapporten; stegene leses fra Server-Timing i stedet.
+        request_timing.TIMING_LOG_ENABLED = False
+
+        import main
+        from firebase_functions import https_fn
+        from werkzeug.test import EnvironBuilder
+
+        from app.security.api_keys import API_KEY_HEADER
+
+        self._api = main.api
+        self._request = https_fn.Request
+        self._environ = EnvironBuilder
+        self._api_key_header = API_KEY_HEADER
+        self._csv = csv_body(synthetic_records(CSV_POINTS))
+        self._miss_counter = itertools.count()
+        self._miss_lock = threading.Lock()
+        self.warm_cells = [(60.0 + 0.02 * index, 5.0) for index in range(WARM_LOCATIONS)]
+
+    def call(
+        self,
+        path: str,
+        method: str = "GET",
+        query: dict[str, str] | None = None,
+        body: bytes | None = None,
+        content_type: str | None = None,
+    ) -> tuple[int, str | None]:
+        environ = self._environ(
+            path=path,
+            method=method,
+            query_string=query,
+            data=body,
+            content_type=content_type,
+            headers={self._api_key_header: LOAD_API_KEY},
+        ).get_environ()
+        response = self._api(self._request(environ))
+        response.get_data()  # bodyen strømmes fra adapteren; tiden skal inkludere hele svaret
+        return response.status_code, response.headers.get("server-timing")
+
+    def _location(self, lat: float, lon: float) -> dict[str, str]:
+        return {"lat": f"{lat:.4f}", "lon": f"{lon:.4f}"}
+
+    def warm(self) -> None:
+        for lat, lon in self.warm_cells:
+            status, _ = self.call("/fire-risk/compute-by-location", query=self._location(lat, lon))
+            if status != 200:
+                raise RuntimeError(f"Warm-up request for ({lat}, {lon}) returned {status}")
+
+    def requests(self, rng: random.Random) -> dict[str, Callable[[], tuple[int, str | None]]]:
+        def hit():
+            return self.call("/fire-risk/compute-by-location", query=self._location(*rng.choice(self.warm_cells)))
+
+        def miss():
+            with self._miss_lock:
+                index = next(self._miss_counter)
+            # Hver miss får sin egen celle, sørover fra de varme cellene, så den aldri treffer cachen.
+            lat, lon = 50.0 - 0.02 * (index // 500), 5.0 + 0.02 * (index % 500)
+            return self.call("/fire-risk/compute-by-location", query=self._location(lat, lon))
+
+        def csv():
+            return self.call("/fire-risk/compute", method="POST", body=self._csv, content_type="text/csv")
+
+        def publish():
+            return self.call(
+                "/messaging/publish-fire-risk", method="POST", query=self._location(*rng.choice(self.warm_cells))
+            )
+
+        def health():
+            return self.call("/health")
+
+        return {"hit": hit, "miss": miss, "csv": csv, "publish": publish, "health": health}
+
+
+def run(
+    mix: dict[str, float],
+    concurrency: int,
+    duration: float | None,
+    total_requests: int | None,
+    met_latency_seconds: float,
+    http_stub: bool = True,
+    seed: int = 1,
+) -> dict[str, Any]:
+    target = LoadTarget(met_latency_seconds, http_stub)
+    target.warm()
+
+    recorder = Recorder()
+    kinds = [kind for kind, weight in mix.items() if weight > 0]
+    weights = [mix[kind] for kind in kinds]
+    budget = itertools.count() if total_requests is not None else None
+    budget_lock = threading.Lock()
+    errors: list[str] = []
+
+    def worker(number: int, deadline: float | None) -> None:
+        rng = random.Random(seed * 1000 + number)
+        calls = target.requests(rng)
+        while deadline is None or time.perf_counter() < deadline:
+            if budget is not None:
+                with budget_lock:
+                    if next(budget) >= total_requests:
+                        return
+            kind = rng.choices(kinds, weights)[0]
+            started = time.perf_counter()
+            try:
+                status, server_timing = calls[kind]()
+            except Exception as exc:  # en feil i en arbeider skal synes i rapporten, ikke stoppe kjøringen
+                status, server_timing = 599, None
+                errors.append(f"{kind}: {exc!r}")
+            recorder.record(kind, status, (time.perf_counter() - started) * 1000, server_timing)
+
+    started = time.perf_counter()
+    deadline = started + duration if duration is not None else None
+    threads = [
+        threading.Thread(target=worker, args=(number, deadline), name=f"load-{number}", daemon=True)
+        for number in range(concurrency)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    if target.backends.server is not None:
+        target.backends.server.stop()
+
+    all_stats = KindStats()
+    for stats in recorder.kinds.values():
+        all_stats.latencies_ms.extend(stats.latencies_ms)
+        for status, count in stats.statuses.items():
+            all_stats.statuses[status] = all_stats.statuses.get(status, 0) + count
+
+    return {
+        "schema_version": SCHEMA_VERSION,
+        "environment": environment(),
+        "config": {
+            "mix": mix,
+            "concurrency": concurrency,
+            "duration_seconds": duration,
+            "requests": total_requests,
+            "met_latency_ms": met_latency_seconds * 1000,
+            "http_stub": http_stub,
+            "seed": seed,
+        },
+        "elapsed_seconds": round(elapsed, 3),
+        "met_requests": target.backends.weather.calls,
+        "total": summarize("total", all_stats, elapsed) if all_stats.latencies_ms else None,
+        "kinds": [summarize(kind, recorder.kinds[kind], elapsed) for kind in KINDS if kind in recorder.kinds],
+        "errors": errors[:20],
+    }
+
+
+def _print_report(report: dict[str, Any]) -> None:
+    print(f"{'kind':<10} {'requests':>8} {'rps':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9}  statuses")
+    for row in [*report["kinds"], *([report["total"]] if report["total"] else [])]:
+        print(
+            f"{row['kind']:<10} {row['requests']:>8} {row['throughput_rps']:>9.1f} {row['p50_ms']:>9.2f} "
+            f"{row['p95_ms']:>9.2f} {row['p99_ms']:>9.2f} {row['max_ms']:>9.2f}  {row['statuses']}"
+        )
+
+    if report["total"]:
+        print("\nlatency histogram (all kinds)")
+        peak = max(bucket["count"] for bucket in report["total"]["histogram"]) or 1
+        for bucket in report["total"]["histogram"]:
+            label = f"<= {bucket['le_ms']} ms" if bucket["le_ms"] is not None else f"> {HISTOGRAM_BOUNDS_MS[-1]} ms"
+            print(f"{label:>12} {bucket['count']:>8} {'#' * round(40 * bucket['count'] / peak)}")
+
+    print("\nmean Server-Timing stages per request (ms)")
+    for row in report["kinds"]:
+        stages = ", ".join(f"{name}={value}" for name, value in row["mean_stages_ms"].items())
+        print(f"{row['kind']:<10} {stages}")
+    print(f"\nMET/Open-Meteo requests: {report['met_requests']}, elapsed: {report['elapsed_seconds']} s")
+    for error in report["errors"]:
+        print(f"error: {error}")
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Offline load test for main.api with in-memory backends")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help=f"Weighted request kinds, e.g. {DEFAULT_MIX}")
+    parser.add_argument("--concurrency", type=int, default=8, help="Number of concurrent client threads")
+    parser.add_argument("--duration", type=float, help="Run for this many seconds (default 10 unless --requests)")
+    parser.add_argument("--requests", type=int, help="Stop after this many requests in total")
+    parser.add_argument("--met-latency-ms", type=float, default=100.0, help="Latency of the stub MET/Open-Meteo server")
+    parser.add_argument("--in-process-weather", action="store_true", help="Skip the stub HTTP server and its network stack")
+    parser.add_argument("--seed", type=int, default=1, help="Seed for the request mix")
+    parser.add_argument("--output", help="Write the results as JSON to this file")
+    args = parser.parse_args(argv)
+
+    duration = args.duration if args.duration is not None or args.requests is not None else 10.0
+    report = run(
+        parse_mix(args.mix),
+        concurrency=max(1, args.concurrency),
+        duration=duration,
+        total_requests=args.requests,
+        met_latency_seconds=args.met_latency_ms / 1000,
+        http_stub=not args.in_process_weather,
+        seed=args.seed,
+    )
+    _print_report(report)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as handle:
+            json.dump(report, handle, indent=2)
+            handle.write("\n")
+    failed = sum(count for row in report["kinds"] for status, count in row["statuses"].items() if int(status) >= 500)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
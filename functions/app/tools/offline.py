@@ -0,0 +1,420 @@
+"""
+In-process stand-ins for Firestore, MET/Open-Meteo and Pub/Sub.
+
+Used by the benchmark and load-test tools so the request paths can run without
+network access or credentials:
+
+  backends = install_offline_backends(api_keys_to_seed=["bench-key"])
+
+install_offline_backends() replaces firestore.client(), the shared MET HTTP
+session and the process-wide Pub/Sub publisher. reset_caches() empties every
+in-process cache so a run can start cold.
+
+With http_stub=True the synthetic MET and Open-Meteo responses are served by a
+local HTTP server (StubWeatherServer) instead, so weather fetches go through
+the real requests session, connection pool and JSON decoding.
+
+Development only: the module is listed under "ignore" in firebase.json and is
+not deployed with the functions.
+"""
+from __future__ import annotations
+
+import hashlib
+import itertools
+import json
+import math
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Iterator
+from urllib.parse import parse_qsl, urlsplit
+
+from google.api_core.exceptions import AlreadyExists, FailedPrecondition, NotFound
+
+import MET_client
+from app.security import api_keys
+from app.services import fire_risk_cache_service, weather_cache_service
+from app.services.pubsub_publisher_service import LocalPublisherClient, set_publisher_client
+
+
+_OPERATORS = {
+    "<": lambda value, other: value < other,
+    "<=": lambda value, other: value <= other,
+    "==": lambda value, other: value == other,
+    ">": lambda value, other: value > other,
+    ">=": lambda value, other: value >= other,
+}
+
+
+class _Snapshot:
+    def __init__(self, reference: _DocumentReference, data: dict[str, Any] | None, update_time: int | None) -> None:
+        self.reference = reference
+        self.id = reference.id
+        self._data = data
+        self.update_time = update_time
+
+    @property
+    def exists(self) -> bool:
+        return self._data is not None
+
+    def to_dict(self) -> dict[str, Any] | None:
+        return dict(self._data) if self._data is not None else None
+
+
+class _DocumentReference:
+    def __init__(self, db: InMemoryFirestore, collection: str, document_id: str) -> None:
+        self._db = db
+        self._collection = collection
+        self.id = document_id
+
+    def get(self) -> _Snapshot:
+        return self._db._read(self._collection, self.id, self)
+
+    def set(self, data: dict[str, Any]) -> None:
+        self._db._write(self._collection, self.id, data)
+
+    def create(self, data: dict[str, Any]) -> None:
+        self._db._write(self._collection, self.id, data, create=True)
+
+    def update(self, data: dict[str, Any]) -> None:
+        self._db._write(self._collection, self.id, data, merge=True)
+
+    def delete(self, option: dict[str, Any] | None = None) -> None:
+        self._db._delete(self._collection, self.id, option)
+
+
+class _AggregateResult:
+    def __init__(self, value: int) -> None:
+        self.value = value
+
+
+class _CountQuery:
+    def __init__(self, query: _Query) -> None:
+        self._query = query
+
+    def get(self) -> list[list[_AggregateResult]]:
+        return [[_AggregateResult(sum(1 for _ in self._query.stream()))]]
+
+
+class _Query:
+    def __init__(self, db: InMemoryFirestore, collection: str, filters=(), limit: int | None = None) -> None:
+        self._db = db
+        self._collection = collection
+        self._filters = tuple(filters)
+        self._limit = limit
+
+    def where(self, field: str, op: str, value: Any) -> _Query:
+        return _Query(self._db, self._collection, (*self._filters, (field, _OPERATORS[op], value)), self._limit)
+
+    def limit(self, count: int) -> _Query:
+        return _Query(self._db, self._collection, self._filters, count)
+
+    def count(self) -> _CountQuery:
+        return _CountQuery(self)
+
+    def stream(self) -> Iterator[_Snapshot]:
+        matches = []
+        for document_id, (data, version) in self._db._items(self._collection):
+            try:
+                if all(field in data and op(data[field], value) for field, op, value in self._filters):
+                    matches.append(_Snapshot(_DocumentReference(self._db, self._collection, document_id), data, version))
+            except TypeError:
+                continue
+        return iter(matches[: self._limit] if self._limit is not None else matches)
+
+
+class _CollectionReference(_Query):
+    def document(self, document_id: str) -> _DocumentReference:
+        return _DocumentReference(self._db, self._collection, document_id)
+
+
+class _WriteBatch:
+    def __init__(self, db: InMemoryFirestore) -> None:
+        self._db = db
+        self._operations: list[tuple[str, _DocumentReference, dict[str, Any] | None]] = []
+
+    def set(self, reference: _DocumentReference, data: dict[str, Any]) -> None:
+        self._operations.append(("set", reference, data))
+
+    def delete(self, reference: _DocumentReference) -> None:
+        self._operations.append(("delete", reference, None))
+
+    def commit(self) -> None:
+        self._db.commits += 1
+        for operation, reference, data in self._operations:
+            if operation == "set":
+                reference.set(data)
+            else:
+                reference.delete()
+        self._operations = []
+
+
+class InMemoryFirestore:
+    """Thread-safe in-memory firestore.Client covering the calls this codebase makes."""
+
+    def __init__(self) -> None:
+        self._collections: dict[str, dict[str, tuple[dict[str, Any], int]]] = {}
+        self._lock = threading.Lock()
+        self._versions = itertools.count(1)
+        self.reads = 0
+        self.writes = 0
+        self.commits = 0
+
+    def collection(self, name: str) -> _CollectionReference:
+        return _CollectionReference(self, name)
+
+    def batch(self) -> _WriteBatch:
+        return _WriteBatch(self)
+
+    def get_all(self, references) -> Iterator[_Snapshot]:
+        return iter([reference.get() for reference in references])
+
+    def write_option(self, last_update_time: Any = None) -> dict[str, Any]:
+        return {"last_update_time": last_update_time}
+
+    def _items(self, collection: str) -> list[tuple[str, tuple[dict[str, Any], int]]]:
+        with self._lock:
+            self.reads += 1
+            return list(self._collections.get(collection, {}).items())
+
+    def _read(self, collection: str, document_id: str, reference: _DocumentReference) -> _Snapshot:
+        with self._lock:
+            self.reads += 1
+            data, version = self._collections.get(collection, {}).get(document_id, (None, None))
+        return _Snapshot(reference, data, version)
+
+    def _write(self, collection: str, document_id: str, data: dict[str, Any], create=False, merge=False) -> None:
+        with self._lock:
+            self.writes += 1
+            documents = self._collections.setdefault(collection, {})
+            if create and document_id in documents:
+                raise AlreadyExists(f"{collection}/{document_id} already exists")
+            if merge:
+                if document_id not in documents:
+                    raise NotFound(f"{collection}/{document_id} not found")
+                data = {**documents[document_id][0], **data}
+            documents[document_id] = (dict(data), next(self._versions))
+
+    def _delete(self, collection: str, document_id: str, option: dict[str, Any] | None) -> None:
+        with self._lock:
+            self.writes += 1
+            documents = self._collections.get(collection, {})
+            if option is not None:
+                current = documents.get(document_id)
+                if current is None or current[1] != option.get("last_update_time"):
+                    raise FailedPrecondition(f"{collection}/{document_id} changed")
+            documents.pop(document_id, None)
+
+    def documents(self, collection: str) -> dict[str, dict[str, Any]]:
+        with self._lock:
+            return {document_id: dict(data) for document_id, (data, _) in self._collections.get(collection, {}).items()}
+
+
+class StubResponse:
+    def __init__(self, payload: Any, headers: dict[str, str], status_code: int = 200) -> None:
+        self._payload = payload
+        self.headers = headers
+        self.status_code = status_code
+
+    def raise_for_status(self) -> None:
+        return None
+
+    def json(self) -> Any:
+        return self._payload
+
+
+def met_forecast(lat: float, lon: float, now: datetime | None = None) -> dict[str, Any]:
+    """Synthetic MET compact forecast: hourly for 60 hours, then every 6 hours out to 9 days."""
+    now = now or datetime.now(timezone.utc)
+    start = now.replace(minute=0, second=0, microsecond=0)
+    offsets = list(range(61)) + list(range(66, 217, 6))
+    timeseries = []
+    for hour in offsets:
+        phase = (hour + lon / 15) / 24 * 2 * math.pi
+        timeseries.append(
+            {
+                "time": (start + timedelta(hours=hour)).strftime("%Y-%m-%dT%H:%M:%SZ"),
+                "data": {
+                    "instant": {
+                        "details": {
+                            "air_temperature": round(8.0 + 6.0 * math.sin(phase) - abs(lat - 60) / 4, 1),
+                            "relative_humidity": round(65.0 + 25.0 * math.cos(phase), 1),
+                            "wind_speed": round(3.0 + 2.0 * abs(math.sin(phase / 3)), 1),
+                        }
+                    }
+                },
+            }
+        )
+    return {"properties": {"meta": {"updated_at": start.strftime("%Y-%m-%dT%H:%M:%SZ")}, "timeseries": timeseries}}
+
+
+def open_meteo_hourly(
+    lat: float,
+    lon: float,
+    past_days: int,
+    forecast_days: int,
+    now: datetime | None = None,
+    timeformat: str = "iso8601",
+) -> dict[str, Any]:
+    """Synthetic Open-Meteo hourly response in UTC, covering past_days back and forecast_days ahead."""
+    now = now or datetime.now(timezone.utc)
+    start = now.replace(hour=0, minute=0, second=0, microsecond=0) - timedelta(days=past_days)
+    hours = (past_days + forecast_days) * 24
+    phases = [((hour + lon / 15) / 24) * 2 * math.pi for hour in range(hours)]
+    return {
+        "latitude": lat,
+        "longitude": lon,
+        "hourly": {
+            "time": [
+                int((start + timedelta(hours=hour)).timestamp())
+                if timeformat == "unixtime"
+                else (start + timedelta(hours=hour)).strftime("%Y-%m-%dT%H:%M")
+                for hour in range(hours)
+            ],
+            "temperature_2m": [round(8.0 + 6.0 * math.sin(phase), 1) for phase in phases],
+            "relative_humidity_2m": [round(65.0 + 25.0 * math.cos(phase), 1) for phase in phases],
+            "wind_speed_10m": [round(3.0 + 2.0 * abs(math.sin(phase / 3)), 1) for phase in phases],
+        },
+    }
+
+
+class StubWeatherSession:
+    """
+    Drop-in for the shared requests.Session in MET_client.
+
+    Answers MET locationforecast and Open-Meteo requests with synthetic data
+    after an optional fixed latency, and counts the calls it served.
+    """
+
+    def __init__(self, latency_seconds: float = 0.0, expires_in_seconds: int = 1800) -> None:
+        self.latency_seconds = latency_seconds
+        self.expires_in_seconds = expires_in_seconds
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def get(self, url: str, params: dict[str, Any] | None = None, headers=None, timeout=None) -> StubResponse:
+        with self._lock:
+            self.calls += 1
+        if self.latency_seconds:
+            time.sleep(self.latency_seconds)
+        params = params or {}
+        if url == MET_client.OPEN_METEO_URL:
+            # Som Open-Meteo: kommaseparerte koordinater gir en liste, én koordinat gir et objekt.
+            locations = [
+                open_meteo_hourly(
+                    float(lat),
+                    float(lon),
+                    int(params.get("past_days", 0)),
+                    int(params.get("forecast_days", 3)),
+                    timeformat=params.get("timeformat", "iso8601"),
+                )
+                for lat, lon in zip(str(params["latitude"]).split(","), str(params["longitude"]).split(","))
+            ]
+            return StubResponse(locations[0] if len(locations) == 1 else locations, {})
+        now = datetime.now(timezone.utc)
+        expires = now + timedelta(seconds=self.expires_in_seconds)
+        return StubResponse(
+            met_forecast(float(params["lat"]), float(params["lon"]), now),
+            {"Expires": format_datetime(expires, usegmt=True), "Last-Modified": format_datetime(now, usegmt=True)},
+        )
+
+
+class StubWeatherServer:
+    """
+    Serves a StubWeatherSession over HTTP on 127.0.0.1.
+
+    /compact answers like MET locationforecast and /v1/forecast like
+    Open-Meteo, with the session's latency applied per request.
+    """
+
+    def __init__(self, weather: StubWeatherSession) -> None:
+        self.weather = weather
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, name="stub-weather-server", daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self._server.server_port}"
+
+    def _handler(self) -> type[BaseHTTPRequestHandler]:
+        weather = self.weather
+
+        class Handler(BaseHTTPRequestHandler):
+            # Keep-alive, slik at klientens connection pool gjenbruker forbindelsene som mot MET.
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self) -> None:
+                url = urlsplit(self.path)
+                upstream = MET_client.OPEN_METEO_URL if url.path == "/v1/forecast" else MET_client.MET_FORECAST_URL
+                response = weather.get(upstream, params=dict(parse_qsl(url.query)))
+                body = json.dumps(response.json()).encode("utf-8")
+                self.send_response(response.status_code)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                for name, value in response.headers.items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args) -> None:
+                pass
+
+        return Handler
+
+    def start(self) -> StubWeatherServer:
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+
+@dataclass
+class OfflineBackends:
+    db: InMemoryFirestore
+    weather: StubWeatherSession
+    publisher: LocalPublisherClient
+    server: StubWeatherServer | None = None
+
+
+def reset_caches() -> None:
+    """Empties every in-process cache: fire-risk L1, last known results, weather, raw MET and API keys."""
+    fire_risk_cache_service.L1_CACHE.clear()
+    fire_risk_cache_service.LAST_KNOWN_CACHE.clear()
+    weather_cache_service.WEATHER_L1_CACHE.clear()
+    MET_client._forecast_cache.clear()
+    api_keys._verification_cache.clear()
+
+
+def install_offline_backends(
+    api_keys_to_seed=(), met_latency_seconds: float = 0.0, http_stub: bool = False
+) -> OfflineBackends:
+    """Points Firestore, MET and Pub/Sub at in-process fakes and seeds the given raw API keys as valid."""
+    from firebase_admin import firestore
+
+    db = InMemoryFirestore()
+    firestore.client = lambda *args, **kwargs: db
+    weather = StubWeatherSession(latency_seconds=met_latency_seconds)
+    server = None
+    if http_stub:
+        server = StubWeatherServer(weather).start()
+        MET_client.MET_FORECAST_URL = f"{server.base_url}/compact"
+        MET_client.OPEN_METEO_URL = f"{server.base_url}/v1/forecast"
+        # Ekte requests-sesjon, opprettes ved første kall mot stub-serveren.
+        MET_client._session = None
+    else:
+        MET_client._session = weather
+    publisher = LocalPublisherClient()
+    set_publisher_client(publisher)
+
+    for raw_key in api_keys_to_seed:
+        key_hash = hashlib.sha256(raw_key.encode("utf-8")).hexdigest()
+        db.collection(api_keys.COLLECTION).document(key_hash).set({"revoked": False, "label": "offline"})
+
+    reset_caches()
+    return OfflineBackends(db=db, weather=weather, publisher=publisher, server=server)
@@ -38,6 +38,7 @@ def main() -> int:
 
     doc_ref.update({"revoked": True})
     print("Revoked key hash:", key_hash)
+    print("Running instances stop accepting the key once their verification cache expires (API_KEY_CACHE_TTL_SECONDS, default 60 s).")
     return 0
 
 
@@ -0,0 +1,68 @@
+"""
+Register a location whose fire risk cache is pre-warmed every hour.
+
+Stores one document per location in Firestore:
+- collection: fire_risk_watched_locations
+- fields: name, lat, lon, points (list of horizons), enabled, created_at
+
+Run:
+  export GOOGLE_APPLICATION_CREDENTIALS=/path/to/serviceAccountKey.json
+  python tools/watch_location.py --name "Bergen sentrum" --lat 60.3913 --lon 5.3221 --points 12 72
+  python tools/watch_location.py --name "Bergen sentrum" --disable
+"""
+from __future__ import annotations
+
+import argparse
+import re
+from datetime import datetime, timezone
+
+import firebase_admin
+from firebase_admin import credentials, firestore
+
+
+COLLECTION = "fire_risk_watched_locations"
+
+
+def document_id(name: str) -> str:
+    return re.sub(r"[^a-z0-9]+", "-", name.lower()).strip("-")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--name", required=True, help="Human readable location name")
+    parser.add_argument("--lat", type=float, help="Latitude")
+    parser.add_argument("--lon", type=float, help="Longitude")
+    parser.add_argument("--points", type=int, nargs="+", default=[12], help="Hourly horizons to pre-warm")
+    parser.add_argument("--disable", action="store_true", help="Stop pre-warming this location")
+    args = parser.parse_args()
+
+    firebase_admin.initialize_app(credentials.ApplicationDefault())
+    db = firestore.client()
+    doc_ref = db.collection(COLLECTION).document(document_id(args.name))
+
+    if args.disable:
+        doc_ref.set({"enabled": False}, merge=True)
+        print("Disabled watched location:", doc_ref.id)
+        return 0
+
+    if args.lat is None or args.lon is None:
+        parser.error("--lat and --lon are required unless --disable is given")
+    if any(points < 1 or points > 72 for points in args.points):
+        parser.error("--points must be between 1 and 72")
+
+    doc_ref.set(
+        {
+            "name": args.name,
+            "lat": args.lat,
+            "lon": args.lon,
+            "points": args.points,
+            "enabled": True,
+            "created_at": datetime.now(timezone.utc).isoformat(),
+        }
+    )
+    print("Watching location:", doc_ref.id)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
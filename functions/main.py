@@ -3,16 +3,21 @@
 # Deploy with `firebase deploy`
 from __future__ import annotations
 
+import json
 import os
 
 from fastapi import Depends, FastAPI
 from firebase_admin import initialize_app
-from firebase_functions import https_fn
+from firebase_functions import https_fn, scheduler_fn
 from firebase_functions.options import set_global_options
 
 from app.api.fire_risk import router as fire_risk_router
 from app.api.messaging import router as messaging_router
-from app.security.api_keys import require_api_key
+from app.security.api_keys import cache_stats as api_key_cache_stats, require_api_key
+from app.services.fire_risk_cache_service import L1_CACHE
+from app.services.fire_risk_compaction_service import FireRiskCacheCompactionService
+from app.services.fire_risk_warming_service import FireRiskWarmingService
+from app.services.request_timing import RequestTimingMiddleware
 from app.tools.asgi_adapter import AsgiToWsgi
 
 # For cost control, you can set the maximum number of containers that can be
@@ -26,12 +31,22 @@ initialize_app()
 ROOT_PATH = "/fireguard-2faea/us-central1/api" if os.getenv("FUNCTIONS_EMULATOR") == "true" else "/api"
 
 app = FastAPI(title="FireGuard API", root_path=ROOT_PATH)
+# Server-Timing-header og en JSON-loggelinje med tid per steg for hver forespørsel.
+app.add_middleware(RequestTimingMiddleware)
 
 # Public
 @app.get("/health")
 async def health() -> dict[str, str]:
     return {"status": "ok", "service": "fireguard"}
 
+# Cache-statistikk avslører trafikkmønster og nøkkelbruk, så den krever API-nøkkel.
+@app.get("/health/caches", dependencies=[Depends(require_api_key)])
+async def health_caches() -> dict[str, object]:
+    return {
+        "api_keys": api_key_cache_stats(),
+        "fire_risk_l1": L1_CACHE.stats(),
+    }
+
 # Protected routers
 app.include_router(
     fire_risk_router,
@@ -52,20 +67,29 @@ def api(req: https_fn.Request) -> https_fn.Response:
         status_headers["status"] = status
         status_headers["headers"] = headers
 
-    body_parts: list[bytes] = []
     try:
         result = wsgi_app(req.environ, start_response)
-        for chunk in result:
-            body_parts.append(chunk)
     except Exception as exc:  # pragma: no cover - diagnostic logging for emulator failures
         import traceback
 
         traceback.print_exc()
         return https_fn.Response(f"Adapter error: {exc}", status=500)
-    finally:
-        if "result" in locals() and hasattr(result, "close"):
-            result.close()
 
     status_code = int(str(status_headers.get("status", "200")).split(" ", 1)[0])
     headers = dict(status_headers.get("headers", []))
-    return https_fn.Response(b"".join(body_parts), status=status_code, headers=headers)
+    # The body iterator is streamed as the app produces it; the response closes it when done.
+    return https_fn.Response(result, status=status_code, headers=headers)
+
+
+# Fyller cachen for overvåkede lokasjoner før neste timeslot starter.
+@scheduler_fn.on_schedule(schedule="50 * * * *", timezone="Etc/UTC", max_instances=1, timeout_sec=540)
+def warm_fire_risk_cache(event: scheduler_fn.ScheduledEvent) -> None:
+    report = FireRiskWarmingService().warm()
+    print(json.dumps({"message": "fire_risk_cache_warmed", **report}))
+
+
+# Sletter utløpte timesloter fra fire_risk_cache og logger antall dokumenter og estimert lagring.
+@scheduler_fn.on_schedule(schedule="20 * * * *", timezone="Etc/UTC", max_instances=1, timeout_sec=540)
+def compact_fire_risk_cache(event: scheduler_fn.ScheduledEvent) -> None:
+    report = FireRiskCacheCompactionService().compact()
+    print(json.dumps({"message": "fire_risk_cache_compacted", **report}))
@@ -32,11 +32,20 @@ class FakeCollectionReference:
 class FakeFirestoreClient:
     def __init__(self, snapshot):
         self._snapshot = snapshot
+        self.reads = 0
 
     def collection(self, _collection_name):
+        self.reads += 1
         return FakeCollectionReference(self._snapshot)
 
 
+@pytest.fixture(autouse=True)
+def clear_verification_cache():
+    api_keys._verification_cache.clear()
+    yield
+    api_keys._verification_cache.clear()
+
+
 def test_require_api_key_missing_header_returns_401():
     with pytest.raises(HTTPException) as exc_info:
         api_keys.require_api_key(None)
@@ -55,3 +64,44 @@ def test_require_api_key_revoked_key_returns_403(monkeypatch):
 
     assert exc_info.value.status_code == 403
     assert exc_info.value.detail == "API key revoked"
+
+
+def test_require_api_key_caches_valid_key(monkeypatch):
+    fake_client = FakeFirestoreClient(snapshot=FakeSnapshot(exists=True, data={"revoked": False}))
+    monkeypatch.setattr("app.security.api_keys.firestore.client", lambda: fake_client)
+
+    api_keys.require_api_key("FGK_valid")
+    api_keys.require_api_key("FGK_valid")
+
+    assert fake_client.reads == 1
+    assert api_keys.cache_stats()["hits"] == 1
+
+
+def test_require_api_key_caches_invalid_key(monkeypatch):
+    fake_client = FakeFirestoreClient(snapshot=FakeSnapshot(exists=False))
+    monkeypatch.setattr("app.security.api_keys.firestore.client", lambda: fake_client)
+
+    for _ in range(3):
+        with pytest.raises(HTTPException) as exc_info:
+            api_keys.require_api_key("FGK_unknown")
+        assert exc_info.value.detail == "Invalid API key"
+
+    assert fake_client.reads == 1
+
+
+def test_revocation_takes_effect_after_cache_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("app.security.api_keys.time.time", lambda: now[0])
+    valid_client = FakeFirestoreClient(snapshot=FakeSnapshot(exists=True, data={"revoked": False}))
+    monkeypatch.setattr("app.security.api_keys.firestore.client", lambda: valid_client)
+    api_keys.require_api_key("FGK_soon_revoked")
+
+    revoked_client = FakeFirestoreClient(snapshot=FakeSnapshot(exists=True, data={"revoked": True}))
+    monkeypatch.setattr("app.security.api_keys.firestore.client", lambda: revoked_client)
+    api_keys.require_api_key("FGK_soon_revoked")
+
+    now[0] += api_keys.API_KEY_CACHE_TTL_SECONDS
+    with pytest.raises(HTTPException) as exc_info:
+        api_keys.require_api_key("FGK_soon_revoked")
+
+    assert exc_info.value.detail == "API key revoked"
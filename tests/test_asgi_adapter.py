@@ -0,0 +1,159 @@
+import asyncio
+import io
+import threading
+
+import pytest
+
+from app.tools.asgi_adapter import AsgiToWsgi
+
+
+def _environ(body=b"", **extra):
+    environ = {
+        "REQUEST_METHOD": "POST" if body else "GET",
+        "PATH_INFO": "/echo",
+        "QUERY_STRING": "",
+        "wsgi.input": io.BytesIO(body),
+        "wsgi.url_scheme": "http",
+        "SERVER_NAME": "localhost",
+        "SERVER_PORT": "80",
+    }
+    if body:
+        environ["CONTENT_LENGTH"] = str(len(body))
+    environ.update(extra)
+    return environ
+
+
+def _call(app, environ):
+    captured = {}
+
+    def start_response(status, headers, exc_info=None):
+        captured["status"] = status
+        captured["headers"] = headers
+
+    result = AsgiToWsgi(app)(environ, start_response)
+    try:
+        chunks = list(result)
+    finally:
+        if hasattr(result, "close"):
+            result.close()
+    return captured, chunks
+
+
+def test_streams_response_chunks_in_order():
+    async def app(scope, receive, send):
+        await send({"type": "http.response.start", "status": 201, "headers": [(b"content-type", b"text/plain")]})
+        for part in (b"a", b"b", b"c"):
+            await send({"type": "http.response.body", "body": part, "more_body": True})
+        await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+    captured, chunks = _call(app, _environ())
+
+    assert captured["status"] == "201 Created"
+    assert captured["headers"] == [("content-type", "text/plain")]
+    assert chunks == [b"a", b"b", b"c"]
+
+
+def test_request_body_is_delivered_in_chunks(monkeypatch):
+    monkeypatch.setattr("app.tools.asgi_adapter.BODY_CHUNK_SIZE", 4)
+    received = []
+
+    async def app(scope, receive, send):
+        while True:
+            message = await receive()
+            received.append(message["body"])
+            if not message["more_body"]:
+                break
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"".join(received)})
+
+    _, chunks = _call(app, _environ(b"0123456789"))
+
+    assert received == [b"0123", b"4567", b"89"]
+    assert chunks == [b"0123456789"]
+
+
+def test_requests_share_one_persistent_event_loop():
+    loops = []
+
+    async def app(scope, receive, send):
+        loops.append(asyncio.get_running_loop())
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"ok"})
+
+    _call(app, _environ())
+    _call(app, _environ())
+
+    assert loops[0] is loops[1]
+    assert loops[0].is_running()
+
+
+def test_headers_are_passed_to_scope():
+    seen = {}
+
+    async def app(scope, receive, send):
+        seen.update(dict(scope["headers"]))
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+
+    _call(app, _environ(HTTP_X_API_KEY="secret", CONTENT_TYPE="text/csv"))
+
+    assert seen[b"x-api-key"] == b"secret"
+    assert seen[b"content-type"] == b"text/csv"
+
+
+def test_app_error_before_response_start_returns_500():
+    async def app(scope, receive, send):
+        raise RuntimeError("boom")
+
+    captured, chunks = _call(app, _environ())
+
+    assert captured["status"] == "500 Internal Server Error"
+    assert chunks == [b"ASGI error: boom"]
+
+
+def test_receive_waits_for_disconnect_after_the_body_instead_of_spinning():
+    receives = []
+    disconnected = threading.Event()
+    listeners = []
+
+    async def app(scope, receive, send):
+        await receive()
+
+        async def listen_for_disconnect():
+            while True:
+                message = await receive()
+                receives.append(message["type"])
+                if message["type"] == "http.disconnect":
+                    disconnected.set()
+                    return
+
+        # Egen task, som i Starlette; den overlever at adapteren avbryter appen når svaret lukkes.
+        listeners.append(asyncio.ensure_future(listen_for_disconnect()))
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        for part in (b"a", b"b", b"c"):
+            await asyncio.sleep(0.01)
+            await send({"type": "http.response.body", "body": part, "more_body": True})
+        await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+    captured, chunks = _call(app, _environ(b"payload"))
+
+    assert chunks == [b"a", b"b", b"c"]
+    assert disconnected.wait(2.0)
+    assert receives == ["http.disconnect"]
+
+
+def test_app_error_after_response_start_aborts_the_body(capsys):
+    async def app(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"partial", "more_body": True})
+        raise ValueError("stream broke")
+
+    result = AsgiToWsgi(app)(_environ(), lambda status, headers, exc_info=None: None)
+    chunks = []
+    with pytest.raises(RuntimeError, match="failed after the response started: stream broke"):
+        for chunk in result:
+            chunks.append(chunk)
+    result.close()
+
+    assert chunks == [b"partial"]
+    assert "ValueError: stream broke" in capsys.readouterr().err
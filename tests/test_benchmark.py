@@ -0,0 +1,41 @@
+import json
+
+import pytest
+
+pytest.importorskip("frcm")
+
+from app.tools import benchmark
+
+
+def test_benchmark_writes_machine_readable_results(tmp_path, monkeypatch):
+    monkeypatch.setattr(benchmark, "COMPUTE_POINTS", (12,))
+    monkeypatch.setattr(benchmark, "PARSE_POINTS", (24,))
+    output = tmp_path / "bench.json"
+
+    exit_code = benchmark.main(["--only", "compute", "--only", "parse", "--quick", "--output", str(output)])
+
+    report = json.loads(output.read_text(encoding="utf-8"))
+    assert exit_code == 0
+    assert report["schema_version"] == benchmark.SCHEMA_VERSION
+    assert "python" in report["environment"]
+    assert [case["name"] for case in report["cases"]] == ["compute_records[12]", "parse_csv[24]", "parse_json[24]"]
+    assert all(case["repeat"] == 5 and 0 < case["min_ms"] <= case["median_ms"] <= case["max_ms"] for case in report["cases"])
+
+
+def test_compare_flags_cases_slower_than_threshold():
+    baseline = {"cases": [{"name": "a", "median_ms": 10.0}, {"name": "b", "median_ms": 10.0}]}
+    current = {"cases": [{"name": "a", "median_ms": 10.5}, {"name": "b", "median_ms": 12.0}, {"name": "new", "median_ms": 1.0}]}
+
+    rows = benchmark.compare(current, baseline, threshold=0.10)
+
+    assert [(row["name"], row["regression"]) for row in rows] == [("a", False), ("b", True)]
+
+
+def test_regression_fails_run_when_requested(tmp_path, monkeypatch):
+    monkeypatch.setattr(benchmark, "COMPUTE_POINTS", (12,))
+    baseline = tmp_path / "baseline.json"
+    baseline.write_text(json.dumps({"cases": [{"name": "compute_records[12]", "median_ms": 1e-6}]}), encoding="utf-8")
+
+    exit_code = benchmark.main(["--only", "compute", "--quick", "--compare", str(baseline), "--fail-on-regression"])
+
+    assert exit_code == 1
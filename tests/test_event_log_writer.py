@@ -0,0 +1,153 @@
+import threading
+import time
+
+import pytest
+
+from app.services import event_log_writer
+from app.services.event_log_writer import EventLogSettings, EventLogWriter
+
+
+class RecordingFirestore:
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.commits = []
+        self.store = {}
+        self.committed = threading.Event()
+
+    def collection(self, _name):
+        return self
+
+    def document(self, document_id):
+        return document_id
+
+    def batch(self):
+        if self.fail:
+            raise RuntimeError("Firestore unavailable")
+        return RecordingBatch(self)
+
+
+class SlowFirestore(RecordingFirestore):
+    def __init__(self, delay):
+        super().__init__()
+        self.delay = delay
+
+    def batch(self):
+        time.sleep(self.delay)
+        return super().batch()
+
+
+class RecordingBatch:
+    def __init__(self, db):
+        self.db = db
+        self.writes = []
+
+    def set(self, document_id, data):
+        self.writes.append((document_id, data))
+
+    def commit(self):
+        self.db.commits.append(len(self.writes))
+        self.db.store.update(self.writes)
+        self.db.committed.set()
+
+
+def _wait_for(predicate, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, "writer did not flush in time"
+        time.sleep(0.005)
+
+
+def test_flushes_in_background_when_max_entries_is_reached():
+    db = RecordingFirestore()
+    writer = EventLogWriter(db=db, settings=EventLogSettings(max_entries=3, max_latency=60.0))
+
+    writer.write_many([("a", {}), ("b", {})])
+    time.sleep(0.05)
+    assert db.commits == []
+
+    writer.write("c", {})
+    _wait_for(lambda: db.commits == [3])
+    assert set(db.store) == {"a", "b", "c"}
+
+
+def test_flushes_after_max_latency():
+    db = RecordingFirestore()
+    writer = EventLogWriter(db=db, settings=EventLogSettings(max_entries=100, max_latency=0.02))
+
+    writer.write("a", {"ttf": [1.0]})
+
+    assert db.committed.wait(2.0)
+    assert db.store == {"a": {"ttf": [1.0]}}
+    assert writer.written == 1
+
+
+def test_splits_commits_at_the_batch_limit(monkeypatch):
+    monkeypatch.setattr(event_log_writer, "MAX_BATCH_WRITES", 2)
+    db = RecordingFirestore()
+    writer = EventLogWriter(db=db, settings=EventLogSettings(max_latency=60.0))
+
+    writer.write_many([(str(index), {}) for index in range(5)])
+    writer.flush()
+
+    assert db.commits == [2, 2, 1]
+
+
+def test_failed_commits_and_overflow_are_dropped_not_raised():
+    writer = EventLogWriter(db=RecordingFirestore(fail=True), settings=EventLogSettings(max_latency=60.0, max_buffered=2))
+
+    writer.write_many([("a", {}), ("b", {}), ("c", {})])
+    writer.flush()
+
+    assert (writer.written, writer.dropped) == (0, 3)
+
+
+def test_stop_flushes_pending_entries_and_rejects_new_ones():
+    db = RecordingFirestore()
+    writer = EventLogWriter(db=db, settings=EventLogSettings(max_latency=60.0))
+    writer.write("a", {})
+
+    writer.stop()
+
+    assert db.store == {"a": {}}
+    with pytest.raises(RuntimeError, match="stopped"):
+        writer.write("b", {})
+
+
+def test_process_wide_writer_is_flushed_on_shutdown(monkeypatch):
+    db = RecordingFirestore()
+    monkeypatch.setattr(event_log_writer, "_event_log_writer", None)
+    monkeypatch.setenv("EVENT_LOG_MAX_LATENCY", "60")
+    monkeypatch.setattr("app.services.event_log_writer.firestore.client", lambda: db)
+
+    writer = event_log_writer.get_event_log_writer()
+    assert writer.settings.max_latency == 60.0
+    writer.write("a", {})
+    event_log_writer.shutdown_event_log_writer()
+
+    assert db.store == {"a": {}}
+    assert event_log_writer._event_log_writer is None
+
+
+def test_flush_with_timeout_hands_the_commit_to_the_writer_thread():
+    db = SlowFirestore(delay=0.3)
+    writer = EventLogWriter(db=db, settings=EventLogSettings(max_latency=60.0))
+    writer.write("a", {})
+
+    started = time.monotonic()
+    assert writer.flush(timeout=0.05) is False
+    assert time.monotonic() - started < 0.25
+
+    assert db.committed.wait(2.0)
+    assert db.store == {"a": {}}
+    assert writer.flush(timeout=1.0) is True
+
+
+def test_record_dropped_counts_under_the_lock():
+    writer = EventLogWriter(db=RecordingFirestore())
+    threads = [threading.Thread(target=writer.record_dropped, args=(1, "test")) for _ in range(50)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert writer.dropped == 50
@@ -0,0 +1,87 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+np = pytest.importorskip("numpy")
+httpx = pytest.importorskip("httpx")
+
+from fastapi import FastAPI
+
+from app.api.fire_risk import router
+from app.services import fire_risk_service
+from app.services.fire_risk_kernel import FireRiskSeries
+from app.services.executors import run_blocking, run_compute, submit_compute
+from app.services.request_timing import RequestTimingMiddleware, stage
+
+SLOW_COMPUTE_SECONDS = 0.5
+
+RECORDS = [
+    {"timestamp": "2026-02-23T12:00:00Z", "temperature": 20.5, "relative_humidity": 55.0, "wind_speed": 3.2}
+]
+
+
+class HitCache:
+    def get_cached_entry(self, lat, lon, points):
+        return {"ttf": [5.0], "result": {"firerisks": []}}, time.time()
+
+
+@pytest.mark.anyio
+async def test_slow_compute_does_not_delay_cache_hits(monkeypatch):
+    def slow_compute(series):
+        # Holder tråden opptatt slik en lang modellkjøring ville gjort.
+        time.sleep(SLOW_COMPUTE_SECONDS)
+        return FireRiskSeries(timestamps=[series.origin], ttf=np.array([1.0]))
+
+    monkeypatch.setattr(fire_risk_service, "compute", slow_compute)
+    monkeypatch.setattr("app.api.fire_risk.FireRiskCacheService", HitCache)
+    app = FastAPI()
+    app.include_router(router)
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://testserver") as client:
+        started = time.perf_counter()
+        compute = asyncio.create_task(client.post("/fire-risk/compute", json=RECORDS))
+        await asyncio.sleep(0.05)
+
+        hit = await client.get("/fire-risk/compute-by-location", params={"lat": 60.39, "lon": 5.32})
+        hit_done = time.perf_counter() - started
+        computed = await compute
+
+    assert hit.status_code == 200
+    assert hit.headers["x-cache-status"] == "hit"
+    assert computed.status_code == 200
+    assert hit_done < SLOW_COMPUTE_SECONDS
+
+
+@pytest.mark.anyio
+async def test_pools_run_off_the_loop_and_keep_request_timings():
+    app = FastAPI()
+    app.add_middleware(RequestTimingMiddleware, log_enabled=False)
+    threads: dict[str, str] = {}
+
+    def work(name: str) -> str:
+        threads[name] = threading.current_thread().name
+        return name
+
+    @app.get("/work")
+    async def handler():
+        def timed_work(name: str) -> str:
+            with stage(name):
+                return work(name)
+
+        await run_compute(timed_work, "compute")
+        await run_blocking(timed_work, "cache_read")
+        await run_blocking(lambda: submit_compute(timed_work, "nested").result())
+        return {"ok": True}
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://testserver") as client:
+        response = await client.get("/work")
+
+    assert threads["compute"].startswith("fire-risk-compute")
+    assert threads["cache_read"].startswith("fire-risk-io")
+    assert threads["nested"].startswith("fire-risk-compute")
+    stages = {entry.strip().split(";")[0] for entry in response.headers["server-timing"].split(",")}
+    assert {"compute", "cache_read", "nested"} <= stages
@@ -1,3 +1,5 @@
+import time
+
 import pytest
 
 pytest.importorskip("frcm")
@@ -20,17 +22,17 @@ async def test_compute_by_location_returns_cached_result(app: FastAPI, monkeypat
     cached_response = {"ttf": [12.5], "result": {"source": "cache"}}
 
     class FakeCacheService:
-        def get_cached_risk(self, lat: float, lon: float, points: int):
+        def get_cached_entry(self, lat: float, lon: float, points: int):
             assert lat == 59.9123
             assert lon == 10.7543
             assert points == 12
-            return cached_response
+            return cached_response, time.time() - 30
 
     def fail_if_called(*args, **kwargs):
         raise AssertionError("Weather fetch should not run on cache hit")
 
     monkeypatch.setattr("app.api.fire_risk.FireRiskCacheService", FakeCacheService)
-    monkeypatch.setattr("app.api.fire_risk.fetch_weather_records_for_location", fail_if_called)
+    monkeypatch.setattr("app.api.fire_risk.WeatherCacheService", fail_if_called)
 
     transport = httpx.ASGITransport(app=app)
     async with httpx.AsyncClient(transport=transport, base_url="http://testserver") as client:
@@ -41,3 +43,124 @@ async def test_compute_by_location_returns_cached_result(app: FastAPI, monkeypat
 
     assert response.status_code == 200
     assert response.json() == cached_response
+    assert response.headers["x-cache-status"] == "hit"
+    assert 30 <= int(response.headers["age"]) <= 35
+
+
+@pytest.mark.anyio
+async def test_grid_computes_cells_once_and_serves_them_from_the_cell_cache(app: FastAPI, monkeypatch):
+    import MET_client
+    from app.tools.offline import InMemoryFirestore, StubWeatherSession, reset_caches
+
+    db = InMemoryFirestore()
+    weather = StubWeatherSession()
+    monkeypatch.setattr("firebase_admin.firestore.client", lambda *args, **kwargs: db)
+    monkeypatch.setattr(MET_client, "_session", weather)
+    reset_caches()
+    params = {"min_lat": 60.38, "min_lon": 5.3, "max_lat": 60.42, "max_lon": 5.32, "points": 6}
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://testserver") as client:
+        first = (await client.get("/fire-risk/grid", params=params)).json()
+        second = (await client.get("/fire-risk/grid", params=params)).json()
+        cell = await client.get("/fire-risk/compute-by-location", params={"lat": 60.4, "lon": 5.32, "points": 6})
+    reset_caches()
+
+    assert first["shape"] == [6, 3, 2]
+    assert (first["cached"], first["computed"], first["errors"]) == (0, 6, [])
+    assert all(value is not None for hour in first["ttf"] for value in hour)
+    assert weather.calls == 6
+    assert (second["cached"], second["computed"]) == (6, 0)
+    assert second["ttf"] == first["ttf"]
+    assert cell.headers["x-cache-status"] == "hit"
+    assert cell.json()["ttf"] == [hour[3] for hour in first["ttf"]]
+
+
+@pytest.mark.anyio
+async def test_compute_history_resumes_from_saved_state_and_caches_the_result(app: FastAPI, monkeypatch):
+    import MET_client
+    from app.services.fire_risk_cache_service import FireRiskCacheService
+    from app.tools.offline import InMemoryFirestore, StubWeatherSession, reset_caches
+
+    db = InMemoryFirestore()
+    weather = StubWeatherSession()
+    monkeypatch.setattr("firebase_admin.firestore.client", lambda *args, **kwargs: db)
+    monkeypatch.setattr(MET_client, "_session", weather)
+    reset_caches()
+    params = {"lat": 60.3913, "lon": 5.3221}
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://testserver") as client:
+        first = await client.get("/fire-risk/compute-history", params=params)
+        second = await client.get("/fire-risk/compute-history", params=params)
+        forecast = await client.get("/fire-risk/compute-by-location", params={**params, "points": 6})
+    reset_caches()
+
+    assert first.status_code == 200
+    assert 0 < len(first.json()["ttf"]) <= 72
+    assert len(first.json()["result"]["firerisks"]) == len(first.json()["ttf"])
+    assert FireRiskCacheService().get_model_state(60.3913, 5.3221) is not None
+    assert second.json() == first.json()
+    assert weather.calls == 2
+    assert forecast.status_code == 200
+    assert len(forecast.json()["ttf"]) == 6
+
+
+@pytest.mark.anyio
+async def test_compute_history_batch_shares_open_meteo_requests_and_the_cache(app: FastAPI, monkeypatch):
+    import MET_client
+    from app.tools.offline import InMemoryFirestore, StubWeatherSession, reset_caches
+
+    db = InMemoryFirestore()
+    weather = StubWeatherSession()
+    monkeypatch.setattr("firebase_admin.firestore.client", lambda *args, **kwargs: db)
+    monkeypatch.setattr(MET_client, "_session", weather)
+    reset_caches()
+    locations = [{"lat": 60.3913, "lon": 5.3221}, {"lat": 59.9123, "lon": 10.7543}, {"lat": 60.3914, "lon": 5.3222}]
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://testserver") as client:
+        first = (await client.post("/fire-risk/compute-history-batch", json={"locations": locations})).json()
+        single = (await client.get("/fire-risk/compute-history", params=locations[1])).json()
+        second = (await client.post("/fire-risk/compute-history-batch", json={"locations": locations})).json()
+    reset_caches()
+
+    assert [item["status"] for item in first["results"]] == ["ok", "ok", "ok"]
+    assert [item["cached"] for item in first["results"]] == [False, False, False]
+    assert first["results"][0]["ttf"] == first["results"][2]["ttf"]
+    assert weather.calls == 1
+    assert single["ttf"] == first["results"][1]["ttf"]
+    assert [item["cached"] for item in second["results"]] == [True, True, True]
+
+
+@pytest.mark.anyio
+async def test_compute_history_negotiates_layout_and_maps_upstream_errors(app: FastAPI, monkeypatch):
+    result = {"ttf": [6.0], "result": {"firerisks": [{"timestamp": "2026-04-13 00:00:00+00:00", "ttf": 6.0}]}}
+
+    class FakeCache:
+        def get_cached_risk(self, lat, lon, points):
+            return result if lat == 60.0 else None
+
+    class FailingHistoryService:
+        def __init__(self, cache):
+            pass
+
+        def compute_for_location(self, lat, lon):
+            raise RuntimeError("Failed to fetch historical weather")
+
+    monkeypatch.setattr("app.api.fire_risk.FireRiskCacheService", FakeCache)
+    monkeypatch.setattr("app.api.fire_risk.FireRiskHistoryService", FailingHistoryService)
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://testserver") as client:
+        columnar = await client.get(
+            "/fire-risk/compute-history",
+            params={"lat": 60.0, "lon": 5.0},
+            headers={"accept": "application/vnd.fireguard.columnar+json"},
+        )
+        failed = await client.get("/fire-risk/compute-history", params={"lat": 61.0, "lon": 5.0})
+
+    assert columnar.headers["content-type"] == "application/vnd.fireguard.columnar+json"
+    assert columnar.json() == {"timestamps": ["2026-04-13 00:00:00+00:00"], "ttf": [6.0]}
+    assert failed.status_code == 502
+    assert failed.json()["detail"] == "Failed to fetch historical weather"
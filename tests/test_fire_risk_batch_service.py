@@ -0,0 +1,67 @@
+import pytest
+
+pytest.importorskip("frcm")
+
+from app.services.fire_risk_batch_service import FireRiskBatchService
+
+
+class FakeCache:
+    def __init__(self, hits):
+        self.hits = hits
+        self.saved = []
+
+    def get_grid_id(self, lat, lon, points):
+        return f"grid_{round(lat, 1)}_{round(lon, 1)}_p{points}"
+
+    def get_cached_risks(self, locations):
+        return [self.hits.get(self.get_grid_id(*location)) for location in locations]
+
+    def save_many_to_cache(self, entries):
+        self.saved.extend(entries)
+
+
+class FakeWeatherCache:
+    def __init__(self):
+        self.fetched = []
+
+    def get_records(self, lat, lon, points):
+        self.fetched.append((lat, lon, points))
+        if lat == 0.0:
+            raise RuntimeError("MET unavailable")
+        return [{"lat": lat}]
+
+
+def test_compute_batch_returns_results_in_request_order(monkeypatch):
+    cache = FakeCache(hits={"grid_60.4_5.3_p12": {"ttf": [1.0], "result": {"source": "cache"}}})
+    weather = FakeWeatherCache()
+    monkeypatch.setattr(
+        "app.services.fire_risk_batch_service.compute_fire_risk_from_records",
+        lambda records: {"ttf": [records[0]["lat"]], "result": {}},
+    )
+
+    service = FireRiskBatchService(cache=cache, max_concurrent_fetches=2, weather=weather)
+    results = service.compute_batch(
+        [
+            (59.91, 10.75, 12),
+            (60.39, 5.32, 12),
+            (0.0, 0.0, 12),
+            (59.92, 10.76, 12),
+        ]
+    )
+
+    assert [item["status"] for item in results] == ["ok", "ok", "error", "ok"]
+    assert results[0]["ttf"] == [59.91]
+    assert results[0]["cached"] is False
+    assert results[1]["cached"] is True
+    assert results[2]["status_code"] == 502
+    assert results[3]["ttf"] == [59.91]
+    assert sorted(weather.fetched) == [(0.0, 0.0, 12), (59.91, 10.75, 12)]
+    assert cache.saved == [(59.91, 10.75, 12, {"ttf": [59.91], "result": {}})]
+
+
+def test_compute_batch_rejects_oversized_batch(monkeypatch):
+    monkeypatch.setattr("app.services.fire_risk_batch_service.MAX_BATCH_SIZE", 1)
+    service = FireRiskBatchService(cache=FakeCache(hits={}), weather=FakeWeatherCache())
+
+    with pytest.raises(ValueError, match="at most 1 locations"):
+        service.compute_batch([(60.0, 5.0, 12), (61.0, 5.0, 12)])
@@ -1,9 +1,26 @@
+from datetime import datetime, timezone
+
+import pytest
+from google.api_core.exceptions import AlreadyExists, FailedPrecondition
+
+from app.services import fire_risk_cache_service
 from app.services.fire_risk_cache_service import FireRiskCacheService
 
 
+@pytest.fixture(autouse=True)
+def clear_l1_cache():
+	fire_risk_cache_service.L1_CACHE.clear()
+	fire_risk_cache_service.LAST_KNOWN_CACHE.clear()
+	yield
+	fire_risk_cache_service.L1_CACHE.clear()
+	fire_risk_cache_service.LAST_KNOWN_CACHE.clear()
+
+
 class FakeSnapshot:
-	def __init__(self, data):
+	def __init__(self, data, document_id=None, update_time=None):
 		self._data = data
+		self.id = document_id
+		self.update_time = update_time
 
 	@property
 	def exists(self):
@@ -19,11 +36,23 @@ class FakeDocumentReference:
 		self._document_id = document_id
 
 	def get(self):
-		return FakeSnapshot(self._store.get(self._document_id))
+		data = self._store.get(self._document_id)
+		return FakeSnapshot(data, self._document_id, update_time=id(data) if data is not None else None)
 
 	def set(self, data):
 		self._store[self._document_id] = data
 
+	def create(self, data):
+		if self._document_id in self._store:
+			raise AlreadyExists("document exists")
+		self._store[self._document_id] = data
+
+	def delete(self, option=None):
+		current = self._store.get(self._document_id)
+		if option is not None and (current is None or id(current) != option):
+			raise FailedPrecondition("document changed")
+		self._store.pop(self._document_id, None)
+
 
 class FakeCollectionReference:
 	def __init__(self, store):
@@ -33,12 +62,39 @@ class FakeCollectionReference:
 		return FakeDocumentReference(self._store, document_id)
 
 
+class FakeWriteBatch:
+	def __init__(self, client):
+		self._client = client
+		self._writes = []
+
+	def set(self, doc_ref, data):
+		self._writes.append((doc_ref, data))
+
+	def commit(self):
+		self._client.commits.append(len(self._writes))
+		for doc_ref, data in self._writes:
+			doc_ref.set(data)
+
+
 class FakeFirestoreClient:
 	def __init__(self):
 		self.store = {}
+		self.collections = {"fire_risk_cache": self.store}
+		self.get_all_calls = []
+		self.commits = []
+
+	def collection(self, collection_name):
+		return FakeCollectionReference(self.collections.setdefault(collection_name, {}))
+
+	def write_option(self, last_update_time):
+		return last_update_time
 
-	def collection(self, _collection_name):
-		return FakeCollectionReference(self.store)
+	def get_all(self, refs):
+		self.get_all_calls.append(len(refs))
+		return [ref.get() for ref in refs]
+
+	def batch(self):
+		return FakeWriteBatch(self)
 
 
 def _build_service(monkeypatch, fake_client, fake_time):
@@ -91,3 +147,179 @@ def test_save_to_cache_persists_expected_payload(monkeypatch):
 	assert stored["timestamp"] == 9999
 	assert stored["result"] == result_payload
 	assert stored["location"] == {"lat": 60.3913, "lon": 5.3221}
+
+
+def test_get_cached_risks_reads_all_locations_in_one_call(monkeypatch):
+	fake_client = FakeFirestoreClient()
+	service = _build_service(monkeypatch, fake_client, fake_time=7200)
+
+	hit_id = service.get_grid_id(lat=60.3913, lon=5.3221, points=12)
+	fake_client.store[hit_id] = {"result": {"ttf": [1.0]}}
+
+	cached = service.get_cached_risks([(59.9123, 10.7543, 12), (60.3913, 5.3221, 12), (60.3901, 5.3199, 12)])
+
+	assert cached == [None, {"ttf": [1.0]}, {"ttf": [1.0]}]
+	assert fake_client.get_all_calls == [2]
+
+
+def test_save_many_to_cache_commits_in_chunks(monkeypatch):
+	fake_client = FakeFirestoreClient()
+	service = _build_service(monkeypatch, fake_client, fake_time=9999)
+	monkeypatch.setattr("app.services.fire_risk_cache_service.MAX_BATCH_WRITES", 2)
+
+	entries = [(60.0 + index, 5.0, 12, {"ttf": [float(index)]}) for index in range(3)]
+	service.save_many_to_cache(entries)
+
+	assert fake_client.commits == [2, 1]
+	stored = fake_client.store[service.get_grid_id(lat=62.0, lon=5.0, points=12)]
+	assert stored["result"] == {"ttf": [2.0]}
+	assert stored["location"] == {"lat": 62.0, "lon": 5.0}
+
+
+def test_get_cached_risk_serves_repeat_lookups_from_l1(monkeypatch):
+	fake_client = FakeFirestoreClient()
+	service = _build_service(monkeypatch, fake_client, fake_time=7200)
+
+	service.save_to_cache(lat=60.3913, lon=5.3221, points=12, result={"ttf": [3.3]})
+	fake_client.store.clear()
+
+	assert service.get_cached_risk(lat=60.3913, lon=5.3221, points=12) == {"ttf": [3.3]}
+	assert service.l1_stats()["hits"] == 1
+
+
+def test_l1_entry_expires_with_its_timeslot(monkeypatch):
+	fake_client = FakeFirestoreClient()
+	service = _build_service(monkeypatch, fake_client, fake_time=7200)
+	grid_id = service.get_grid_id(lat=60.3913, lon=5.3221, points=12)
+	fake_client.store[grid_id] = {"result": {"ttf": [1.0]}}
+
+	assert service.get_cached_risk(lat=60.3913, lon=5.3221, points=12) == {"ttf": [1.0]}
+
+	monkeypatch.setattr("app.services.fire_risk_cache_service.time.time", lambda: 10800)
+
+	assert service.memory_cache.get(grid_id) is None
+	assert service.get_cached_risk(lat=60.3913, lon=5.3221, points=12) is None
+
+
+def test_try_acquire_lease_is_exclusive_until_released(monkeypatch):
+	fake_client = FakeFirestoreClient()
+	service = _build_service(monkeypatch, fake_client, fake_time=7200)
+	grid_id = service.get_grid_id(lat=60.3913, lon=5.3221, points=12)
+
+	assert service.try_acquire_lease(grid_id) is True
+	assert service.try_acquire_lease(grid_id) is False
+
+	service.release_lease(grid_id)
+
+	assert fake_client.collections[fire_risk_cache_service.LEASE_COLLECTION] == {}
+	assert service.try_acquire_lease(grid_id) is True
+
+
+def test_try_acquire_lease_takes_over_expired_lease(monkeypatch):
+	fake_client = FakeFirestoreClient()
+	service = _build_service(monkeypatch, fake_client, fake_time=7200)
+	grid_id = service.get_grid_id(lat=60.3913, lon=5.3221, points=12)
+	fake_client.collection(fire_risk_cache_service.LEASE_COLLECTION).document(grid_id).set(
+		{"owner": "other-instance", "expires_at": 7199}
+	)
+
+	assert service.try_acquire_lease(grid_id) is True
+	lease = fake_client.collections[fire_risk_cache_service.LEASE_COLLECTION][grid_id]
+	assert lease["owner"] == fire_risk_cache_service.LEASE_OWNER
+	assert lease["expire_at"] == datetime.fromtimestamp(7200 + fire_risk_cache_service.LEASE_SECONDS, tz=timezone.utc)
+
+
+def test_release_lease_keeps_lease_owned_by_other_instance(monkeypatch):
+	fake_client = FakeFirestoreClient()
+	service = _build_service(monkeypatch, fake_client, fake_time=7200)
+	leases = fake_client.collections.setdefault(fire_risk_cache_service.LEASE_COLLECTION, {})
+	leases["grid"] = {"owner": "other-instance", "expires_at": 9000}
+
+	service.release_lease("grid")
+
+	assert "grid" in leases
+
+
+def test_wait_for_cached_risk_returns_result_written_by_lease_owner(monkeypatch):
+	fake_client = FakeFirestoreClient()
+	service = _build_service(monkeypatch, fake_client, fake_time=7200)
+	monkeypatch.setattr(fire_risk_cache_service, "LEASE_POLL_SECONDS", 0)
+	grid_id = service.get_grid_id(lat=60.3913, lon=5.3221, points=12)
+	fake_client.store[grid_id] = {"result": {"ttf": [5.0]}}
+
+	assert service.wait_for_cached_risk(grid_id, timeout=1) == {"ttf": [5.0]}
+	assert service.wait_for_cached_risk("missing", timeout=0) is None
+
+
+def test_wait_for_cached_risk_remembers_computed_at_and_location(monkeypatch):
+	fake_client = FakeFirestoreClient()
+	service = _build_service(monkeypatch, fake_client, fake_time=7200)
+	monkeypatch.setattr(fire_risk_cache_service, "LEASE_POLL_SECONDS", 0)
+	grid_id = service.get_grid_id(lat=60.3913, lon=5.3221, points=12)
+	fake_client.store[grid_id] = {
+		"result": {"ttf": [5.0]},
+		"timestamp": 7100,
+		"points": 12,
+		"location": {"lat": 60.3913, "lon": 5.3221},
+	}
+
+	service.wait_for_cached_risk(grid_id, timeout=0)
+
+	assert fire_risk_cache_service.L1_CACHE.get(grid_id) == ({"ttf": [5.0]}, 7100)
+	assert service.get_stale_entry(lat=60.3913, lon=5.3221, points=12) == ({"ttf": [5.0]}, 7100)
+
+
+def test_model_state_is_stored_per_grid_cell(monkeypatch):
+	fake_client = FakeFirestoreClient()
+	service = _build_service(monkeypatch, fake_client, fake_time=9999)
+	state = {"timestamp": "2026-04-13T00:00:00+00:00", "wall": [1.0] * 10, "rh_in": 0.4, "cw_in": 0.007, "c_wall": 0.0}
+
+	service.save_model_state(lat=60.3913, lon=5.3221, state=state)
+
+	stored = fake_client.collections["fire_risk_model_state"]["cell_60.400_5.320"]
+	assert stored["state"] == state
+	assert stored["updated_at"] == 9999
+	assert service.get_model_state(lat=60.395, lon=5.318) == state
+	assert service.get_model_state(lat=59.91, lon=10.75) is None
+
+
+def test_get_stale_entry_reads_previous_timeslot_from_firestore(monkeypatch):
+	fake_client = FakeFirestoreClient()
+	service = _build_service(monkeypatch, fake_client, fake_time=7300)
+	previous_id = service.get_grid_id(lat=60.3913, lon=5.3221, points=12, timeslot=3600)
+	fake_client.store[previous_id] = {"result": {"ttf": [4.0]}, "timestamp": 3700}
+
+	assert service.get_cached_entry(lat=60.3913, lon=5.3221, points=12) is None
+	assert service.get_stale_entry(lat=60.3913, lon=5.3221, points=12, max_stale_seconds=3600) == ({"ttf": [4.0]}, 3700)
+	assert service.get_stale_entry(lat=60.3913, lon=5.3221, points=12, max_stale_seconds=3000) is None
+
+
+def test_get_stale_entry_serves_last_known_result_from_memory(monkeypatch):
+	fake_client = FakeFirestoreClient()
+	service = _build_service(monkeypatch, fake_client, fake_time=3700)
+	service.save_to_cache(lat=60.3913, lon=5.3221, points=12, result={"ttf": [4.0]})
+
+	monkeypatch.setattr("app.services.fire_risk_cache_service.time.time", lambda: 7200)
+
+	assert service.get_cached_entry(lat=60.3913, lon=5.3221, points=12) is None
+	assert service.get_stale_entry(lat=60.3913, lon=5.3221, points=12) == ({"ttf": [4.0]}, 3700)
+	assert fake_client.get_all_calls == []
+
+
+def test_get_stale_entry_is_disabled_with_zero_staleness(monkeypatch):
+	service = _build_service(monkeypatch, FakeFirestoreClient(), fake_time=7300)
+
+	assert service.get_stale_entry(lat=60.3913, lon=5.3221, points=12, max_stale_seconds=0) is None
+
+
+def test_saved_documents_expire_after_their_stale_window(monkeypatch):
+	fake_client = FakeFirestoreClient()
+	service = _build_service(monkeypatch, fake_client, fake_time=7300)
+
+	service.save_to_cache(lat=60.3913, lon=5.3221, points=12, result={"ttf": [1.0]})
+	service.save_many_to_cache([(60.3913, 5.3221, 24, {"ttf": [2.0]})], timeslot=10800)
+
+	expected_current = 7200 + 3600 + fire_risk_cache_service.MAX_STALE_SECONDS
+	expected_next = 10800 + 3600 + fire_risk_cache_service.MAX_STALE_SECONDS
+	assert fake_client.store[service.get_grid_id(60.3913, 5.3221, 12)]["expire_at"].timestamp() == expected_current
+	assert fake_client.store[service.get_grid_id(60.3913, 5.3221, 24, 10800)]["expire_at"].timestamp() == expected_next
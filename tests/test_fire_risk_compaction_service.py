@@ -0,0 +1,141 @@
+from datetime import datetime, timezone
+
+from app.services import fire_risk_compaction_service
+from app.services.fire_risk_compaction_service import FireRiskCacheCompactionService, estimate_document_size
+
+
+class FakeSnapshot:
+    def __init__(self, store, document_id):
+        self.id = document_id
+        self.reference = (store, document_id)
+        self._data = store[document_id]
+
+    def to_dict(self):
+        return self._data
+
+
+class FakeAggregation:
+    def __init__(self, value):
+        self.value = value
+
+
+class FakeQuery:
+    def __init__(self, store, filters=(), limit=None):
+        self._store = store
+        self._filters = filters
+        self._limit = limit
+
+    def where(self, field, op, value):
+        assert op == "<"
+        return FakeQuery(self._store, (*self._filters, (field, value)), self._limit)
+
+    def limit(self, count):
+        return FakeQuery(self._store, self._filters, count)
+
+    def stream(self):
+        matches = [
+            document_id
+            for document_id, data in self._store.items()
+            if all(field in data and data[field] < value for field, value in self._filters)
+        ]
+        return iter([FakeSnapshot(self._store, document_id) for document_id in matches[: self._limit]])
+
+    def count(self):
+        store = self._store
+
+        class _Count:
+            def get(self):
+                return [[FakeAggregation(len(store))]]
+
+        return _Count()
+
+
+class FakeWriteBatch:
+    def __init__(self, client):
+        self._client = client
+        self._deletes = []
+
+    def delete(self, reference):
+        self._deletes.append(reference)
+
+    def commit(self):
+        self._client.commits.append(len(self._deletes))
+        for store, document_id in self._deletes:
+            store.pop(document_id, None)
+
+
+class FakeFirestoreClient:
+    def __init__(self, store, leases=None):
+        self.store = store
+        self.leases = leases if leases is not None else {}
+        self.commits = []
+
+    def collection(self, collection_name):
+        stores = {"fire_risk_cache": self.store, "fire_risk_cache_leases": self.leases}
+        return FakeQuery(stores[collection_name])
+
+    def batch(self):
+        return FakeWriteBatch(self)
+
+
+def _at(seconds):
+    return datetime.fromtimestamp(seconds, tz=timezone.utc)
+
+
+def _build_service(monkeypatch, store, leases=None, **kwargs):
+    client = FakeFirestoreClient(store, leases)
+    monkeypatch.setattr("app.services.fire_risk_compaction_service.firestore.client", lambda: client)
+    return FireRiskCacheCompactionService(**kwargs), client
+
+
+def test_compact_deletes_expired_and_legacy_documents(monkeypatch):
+    now = 100_000
+    store = {
+        "expired": {"timestamp": now - 100, "expire_at": _at(now - 1), "result": {"ttf": [1.0]}},
+        "fresh": {"timestamp": now - 100, "expire_at": _at(now + 3600), "result": {"ttf": [1.0]}},
+        "legacy": {"timestamp": now - fire_risk_compaction_service.LEGACY_MAX_AGE_SECONDS - 1, "result": {}},
+    }
+    service, _ = _build_service(monkeypatch, store)
+
+    report = service.compact(now=now)
+
+    assert set(store) == {"fresh"}
+    assert report["deleted"] == 2
+    assert report["documents"] == 1
+    assert report["estimated_bytes"] == estimate_document_size("fire_risk_cache", "fresh", store["fresh"])
+    assert report["limit_reached"] is False
+
+
+def test_compact_sweeps_leases_left_by_dead_instances(monkeypatch):
+    now = 100_000
+    leases = {
+        "abandoned": {"owner": "dead", "expires_at": now - 1, "expire_at": _at(now - 1)},
+        "legacy": {"owner": "old", "expires_at": now - 3600},
+        "held": {"owner": "live", "expires_at": now + 30, "expire_at": _at(now + 30)},
+    }
+    service, _ = _build_service(monkeypatch, {}, leases)
+
+    report = service.compact(now=now)
+
+    assert set(leases) == {"held"}
+    assert report["leases_deleted"] == 2
+    assert report["deleted"] == 0
+
+
+def test_delete_expired_commits_in_batches_and_respects_limit(monkeypatch):
+    monkeypatch.setattr(fire_risk_compaction_service, "MAX_BATCH_WRITES", 3)
+    store = {f"doc{index}": {"timestamp": 0, "expire_at": _at(0)} for index in range(8)}
+    service, client = _build_service(monkeypatch, store, max_deletes=7)
+
+    deleted = service.delete_expired(now=10)
+
+    assert deleted == 7
+    assert client.commits == [3, 3, 1]
+    assert len(store) == 1
+
+
+def test_estimate_document_size_follows_firestore_rules():
+    size = estimate_document_size("c", "d", {"a": "xy", "n": 1.5, "l": [True, None]})
+
+    # name: "c"+1 + "d"+1 + 16; fields: a(2)+xy(3), n(2)+8, l(2)+1+1; overhead 32
+    assert size == 20 + 5 + 10 + 4 + 32
@@ -1,12 +1,24 @@
+import time
+from datetime import timedelta
+
 import pytest
 
 pytest.importorskip("frcm")
+np = pytest.importorskip("numpy")
 httpx = pytest.importorskip("httpx")
 
 from fastapi import FastAPI
 
 from app.api.fire_risk import router
 from app.services import fire_risk_service
+from app.services.fire_risk_kernel import FireRiskSeries
+
+
+def _fire_risk_series(series, ttf):
+    return FireRiskSeries(
+        timestamps=[series.origin + timedelta(hours=hour) for hour in range(len(ttf))],
+        ttf=np.asarray(ttf, dtype=float),
+    )
 
 
 @pytest.fixture
@@ -18,9 +30,9 @@ def app() -> FastAPI:
 
 @pytest.mark.anyio
 async def test_compute_endpoint_json_success(app: FastAPI, monkeypatch):
-    def fake_compute(weather_data):
-        assert len(weather_data.data) == 1
-        return {"ttf": 7.5, "risk": "moderate"}
+    def fake_compute(series):
+        assert len(series) == 1
+        return _fire_risk_series(series, [7.5])
 
     monkeypatch.setattr(fire_risk_service, "compute", fake_compute)
 
@@ -38,8 +50,8 @@ async def test_compute_endpoint_json_success(app: FastAPI, monkeypatch):
         response = await client.post("/fire-risk/compute", json=payload)
 
     assert response.status_code == 200
-    assert response.json()["ttf"] == 7.5
-    assert response.json()["result"]["risk"] == "moderate"
+    assert response.json()["ttf"] == [7.5]
+    assert response.json()["result"]["firerisks"] == [{"timestamp": "2026-02-23 12:00:00+00:00", "ttf": 7.5}]
 
 
 @pytest.mark.anyio
@@ -55,39 +67,55 @@ async def test_compute_endpoint_rejects_invalid_payload(app: FastAPI):
 @pytest.mark.anyio
 async def test_compute_by_location_success(app: FastAPI, monkeypatch):
     class FakeCache:
-        def get_cached_risk(self, lat, lon, points):
+        def get_cached_entry(self, lat, lon, points):
             return None  # Simulerer alltid en "cache miss" i testen
+
+        def get_stale_entry(self, lat, lon, points):
+            return None
         
         def save_to_cache(self, lat, lon, points, result):
             pass  # Gjør ingenting når vi prøver å lagre
 
+        def get_grid_id(self, lat, lon, points):
+            return f"grid_{lat}_{lon}_p{points}"
+
+        def try_acquire_lease(self, grid_id):
+            return True
+
+        def release_lease(self, grid_id):
+            pass
+
     
     monkeypatch.setattr("app.api.fire_risk.FireRiskCacheService", FakeCache) #la til denne
 
-    def fake_fetch(lat: float, lon: float, max_points: int):
-        assert lat == 60.3913
-        assert lon == 5.3221
-        assert max_points == 2
-        return [
-            {
-                "timestamp": "2026-02-23T12:00:00Z",
-                "temperature": 20.5,
-                "relative_humidity": 55.0,
-                "wind_speed": 3.2,
-            },
-            {
-                "timestamp": "2026-02-23T13:00:00Z",
-                "temperature": 21.0,
-                "relative_humidity": 53.0,
-                "wind_speed": 4.0,
-            },
-        ]
+    class FakeWeatherCache:
+        def __init__(self, cache):
+            pass
 
-    def fake_compute(weather_data):
-        assert len(weather_data.data) == 2
-        return {"ttf": 9.1, "risk": "low"}
+        def get_records(self, lat: float, lon: float, points: int):
+            assert lat == 60.3913
+            assert lon == 5.3221
+            assert points == 2
+            return [
+                {
+                    "timestamp": "2026-02-23T12:00:00Z",
+                    "temperature": 20.5,
+                    "relative_humidity": 55.0,
+                    "wind_speed": 3.2,
+                },
+                {
+                    "timestamp": "2026-02-23T13:00:00Z",
+                    "temperature": 21.0,
+                    "relative_humidity": 53.0,
+                    "wind_speed": 4.0,
+                },
+            ]
 
-    monkeypatch.setattr("app.api.fire_risk.fetch_weather_records_for_location", fake_fetch)
+    def fake_compute(series):
+        assert len(series) == 2
+        return _fire_risk_series(series, [9.1, 8.7])
+
+    monkeypatch.setattr("app.api.fire_risk.WeatherCacheService", FakeWeatherCache)
     monkeypatch.setattr(fire_risk_service, "compute", fake_compute)
 
     transport = httpx.ASGITransport(app=app)
@@ -95,4 +123,197 @@ async def test_compute_by_location_success(app: FastAPI, monkeypatch):
         response = await client.get("/fire-risk/compute-by-location", params={"lat": 60.3913, "lon": 5.3221, "points": 2})
 
     assert response.status_code == 200
-    assert response.json()["ttf"] == 9.1
+    assert response.json()["ttf"] == [9.1, 8.7]
+    assert response.headers["x-cache-status"] == "miss"
+    assert response.headers["age"] == "0"
+
+
+@pytest.mark.anyio
+async def test_compute_batch_returns_per_location_results(app: FastAPI, monkeypatch):
+    class FakeBatchService:
+        def compute_batch(self, locations):
+            assert locations == [(60.3913, 5.3221, 12), (59.9123, 10.7543, 24)]
+            return [
+                {"lat": 60.3913, "lon": 5.3221, "points": 12, "status": "ok", "cached": True, "ttf": [1.0]},
+                {"lat": 59.9123, "lon": 10.7543, "points": 24, "status": "error", "status_code": 502, "error": "MET"},
+            ]
+
+    monkeypatch.setattr("app.api.fire_risk.FireRiskBatchService", FakeBatchService)
+
+    payload = {
+        "locations": [
+            {"lat": 60.3913, "lon": 5.3221},
+            {"lat": 59.9123, "lon": 10.7543, "points": 24},
+        ]
+    }
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://testserver") as client:
+        response = await client.post("/fire-risk/compute-batch", json=payload)
+
+    assert response.status_code == 200
+    assert [item["status"] for item in response.json()["results"]] == ["ok", "error"]
+
+
+@pytest.mark.anyio
+async def test_compute_by_location_waits_for_other_instance_holding_lease(app: FastAPI, monkeypatch):
+    class FakeCache:
+        def get_cached_entry(self, lat, lon, points):
+            return None
+
+        def get_stale_entry(self, lat, lon, points):
+            return None
+
+        def get_grid_id(self, lat, lon, points):
+            return "grid_60.400_5.320_p12_t0"
+
+        def try_acquire_lease(self, grid_id):
+            return False
+
+        def wait_for_cached_risk(self, grid_id, timeout):
+            assert grid_id == "grid_60.400_5.320_p12_t0"
+            return {"ttf": [3.0], "result": {"source": "other-instance"}}
+
+    def fail_if_called(*args, **kwargs):
+        raise AssertionError("Weather fetch should not run while another instance holds the lease")
+
+    monkeypatch.setattr("app.api.fire_risk.FireRiskCacheService", FakeCache)
+    monkeypatch.setattr("app.api.fire_risk.WeatherCacheService", fail_if_called)
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://testserver") as client:
+        response = await client.get("/fire-risk/compute-by-location", params={"lat": 60.3913, "lon": 5.3221})
+
+    assert response.status_code == 200
+    assert response.json()["result"]["source"] == "other-instance"
+
+
+@pytest.mark.anyio
+async def test_compute_endpoint_accepts_ndjson(app: FastAPI, monkeypatch):
+    def fake_compute(series):
+        assert len(series) == 2
+        return _fire_risk_series(series, [6.0, 5.5])
+
+    monkeypatch.setattr(fire_risk_service, "compute", fake_compute)
+
+    body = (
+        '{"timestamp": "2026-02-23T12:00:00Z", "temperature": 20.5, "relative_humidity": 55.0, "wind_speed": 3.2}\n'
+        '{"timestamp": "2026-02-23T13:00:00Z", "temperature": 21.0, "relative_humidity": 53.0, "wind_speed": 4.0}\n'
+    )
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://testserver") as client:
+        response = await client.post(
+            "/fire-risk/compute",
+            content=body,
+            headers={"content-type": "application/x-ndjson"},
+        )
+
+    assert response.status_code == 200
+    assert response.json()["ttf"] == [6.0, 5.5]
+
+
+@pytest.mark.anyio
+async def test_compute_endpoint_reports_csv_line_number(app: FastAPI):
+    body = "timestamp,temperature,relative_humidity,wind_speed\n2026-02-23T12:00:00Z,20.5,humid,3.2\n"
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://testserver") as client:
+        response = await client.post("/fire-risk/compute", content=body, headers={"content-type": "text/csv"})
+
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Line 2: invalid relative_humidity value 'humid'"
+
+
+@pytest.mark.anyio
+async def test_compute_endpoint_compresses_large_results(app: FastAPI, monkeypatch):
+    ttf = [5.0 + index / 7 for index in range(200)]
+
+    def fake_compute(series):
+        return _fire_risk_series(series, ttf)
+
+    monkeypatch.setattr(fire_risk_service, "compute", fake_compute)
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://testserver") as client:
+        response = await client.post(
+            "/fire-risk/compute",
+            content='{"timestamp": "2026-02-23T12:00:00Z", "temperature": 20.5, "relative_humidity": 55.0, "wind_speed": 3.2}\n',
+            headers={"content-type": "application/x-ndjson", "accept-encoding": "gzip"},
+        )
+
+    assert response.status_code == 200
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.json()["ttf"] == ttf
+
+
+@pytest.mark.anyio
+async def test_compute_endpoint_returns_columnar_layout_when_requested(app: FastAPI, monkeypatch):
+    def fake_compute(series):
+        return _fire_risk_series(series, [6.0])
+
+    monkeypatch.setattr(fire_risk_service, "compute", fake_compute)
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://testserver") as client:
+        response = await client.post(
+            "/fire-risk/compute",
+            content='{"timestamp": "2026-02-23T12:00:00Z", "temperature": 20.5, "relative_humidity": 55.0, "wind_speed": 3.2}\n',
+            headers={
+                "content-type": "application/x-ndjson",
+                "accept": "application/vnd.fireguard.columnar+json",
+            },
+        )
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/vnd.fireguard.columnar+json"
+    assert response.json() == {"timestamps": ["2026-02-23 12:00:00+00:00"], "ttf": [6.0]}
+
+
+@pytest.mark.anyio
+async def test_compute_by_location_serves_stale_result_and_refreshes_in_background(app: FastAPI, monkeypatch):
+    refreshed = []
+
+    class FakeCache:
+        def get_cached_entry(self, lat, lon, points):
+            return None
+
+        def get_stale_entry(self, lat, lon, points):
+            return {"ttf": [4.0], "result": {"source": "previous-slot"}}, time.time() - 125
+
+        def get_grid_id(self, lat, lon, points):
+            return "grid_60.400_5.320_p12_t3600"
+
+    def fake_refresh(cache, grid_id, lat, lon, points):
+        refreshed.append(grid_id)
+
+    monkeypatch.setattr("app.api.fire_risk.FireRiskCacheService", FakeCache)
+    monkeypatch.setattr("app.api.fire_risk._refresh_location", fake_refresh)
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://testserver") as client:
+        response = await client.get("/fire-risk/compute-by-location", params={"lat": 60.3913, "lon": 5.3221})
+
+    deadline = time.monotonic() + 5
+    while not refreshed and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert response.status_code == 200
+    assert response.json()["result"]["source"] == "previous-slot"
+    assert response.headers["x-cache-status"] == "stale"
+    assert 125 <= int(response.headers["age"]) <= 130
+    assert refreshed == ["grid_60.400_5.320_p12_t3600"]
+
+
+def test_background_refresh_logs_unexpected_errors(monkeypatch, capsys):
+    from app.api import fire_risk
+
+    def failing_fill(cache, lat, lon, points):
+        raise KeyError("updated_at")
+
+    monkeypatch.setattr(fire_risk, "_compute_and_cache_location", failing_fill)
+    fire_risk._refreshing.add("grid_60.400_5.320_p12_t3600")
+
+    fire_risk._refresh_location(None, "grid_60.400_5.320_p12_t3600", 60.4, 5.32, 12)
+
+    assert "Background refresh failed for grid_60.400_5.320_p12_t3600: 'updated_at'" in capsys.readouterr().out
+    assert "grid_60.400_5.320_p12_t3600" not in fire_risk._refreshing
@@ -0,0 +1,92 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+pytest.importorskip("frcm")
+
+from app.services.fire_risk_grid_service import FireRiskGridService
+
+TIMESLOT = int(datetime(2026, 4, 13, 12, tzinfo=timezone.utc).timestamp())
+
+
+def _result(ttf, start_hour=0):
+    start = datetime.fromtimestamp(TIMESLOT, tz=timezone.utc) + timedelta(hours=start_hour)
+    return {
+        "ttf": ttf,
+        "result": {"firerisks": [{"timestamp": str(start + timedelta(hours=hour)), "ttf": value} for hour, value in enumerate(ttf)]},
+    }
+
+
+class FakeCache:
+    grid_res = 0.02
+
+    def __init__(self, hits):
+        self.hits = hits
+        self.saved = []
+
+    def current_timeslot(self):
+        return TIMESLOT
+
+    def get_cached_risks(self, locations, timeslot=None):
+        assert timeslot == TIMESLOT
+        return [self.hits.get((lat, lon)) for lat, lon, _ in locations]
+
+    def save_many_to_cache(self, entries, timeslot=None):
+        self.saved.extend((lat, lon, points) for lat, lon, points, _ in entries)
+
+
+class FakeWeatherCache:
+    def __init__(self):
+        self.fetched = []
+
+    def get_records(self, lat, lon, points, timeslot=None):
+        self.fetched.append((lat, lon))
+        if lon == 5.34:
+            raise RuntimeError("MET unavailable")
+        return [{"lat": lat, "lon": lon}]
+
+
+def test_compute_grid_runs_misses_in_one_batch_and_builds_the_raster(monkeypatch):
+    batches = []
+
+    def fake_compute(record_sets):
+        batches.append(len(record_sets))
+        return [_result([records[0]["lat"], records[0]["lon"]]) for records in record_sets]
+
+    monkeypatch.setattr("app.services.fire_risk_grid_service.compute_fire_risk_from_record_sets", fake_compute)
+    cache = FakeCache(hits={(60.4, 5.3): _result([1.0], start_hour=1)})
+    weather = FakeWeatherCache()
+
+    tile = FireRiskGridService(cache=cache, weather=weather).compute_grid(60.38, 5.3, 60.4, 5.34, 0.02, 2)
+
+    assert tile["lats"] == [60.4, 60.38]
+    assert tile["lons"] == [5.3, 5.32, 5.34]
+    assert tile["shape"] == [2, 2, 3]
+    assert tile["ttf"] == [
+        [None, 60.4, None, 60.38, 60.38, None],
+        [1.0, 5.32, None, 5.3, 5.32, None],
+    ]
+    assert tile["timestamps"] == ["2026-04-13 12:00:00+00:00", "2026-04-13 13:00:00+00:00"]
+    assert (tile["cached"], tile["computed"]) == (1, 3)
+    assert [(error["lat"], error["lon"], error["status_code"]) for error in tile["errors"]] == [
+        (60.4, 5.34, 502),
+        (60.38, 5.34, 502),
+    ]
+    assert batches == [3]
+    assert sorted(cache.saved) == [(60.38, 5.3, 2), (60.38, 5.32, 2), (60.4, 5.32, 2)]
+
+
+def test_cells_follow_resolution_and_reject_invalid_grids(monkeypatch):
+    service = FireRiskGridService(cache=FakeCache(hits={}), weather=FakeWeatherCache())
+
+    lats, lons = service.cells(60.0, 5.0, 60.1, 5.08, 0.04)
+    assert lats == [60.08, 60.04, 60.0]
+    assert lons == [5.0, 5.04, 5.08]
+
+    with pytest.raises(ValueError, match="multiple of 0.02"):
+        service.cells(60.0, 5.0, 60.1, 5.1, 0.03)
+    with pytest.raises(ValueError, match="min_lat <= max_lat"):
+        service.cells(61.0, 5.0, 60.0, 5.1, 0.02)
+    monkeypatch.setattr("app.services.fire_risk_grid_service.MAX_GRID_CELLS", 4)
+    with pytest.raises(ValueError, match="at most 4 are allowed"):
+        service.cells(60.0, 5.0, 60.04, 5.04, 0.02)
@@ -0,0 +1,144 @@
+import math
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+pytest.importorskip("frcm")
+np = pytest.importorskip("numpy")
+
+import MET_client
+from app.services import fire_risk_history_service
+from app.services.fire_risk_history_service import FireRiskHistoryService
+
+
+DAY_START = datetime(2026, 4, 13, tzinfo=timezone.utc)
+
+
+class FakeCache:
+    def __init__(self, state=None):
+        self.state = state
+        self.saved_states = []
+
+    def get_model_state(self, lat, lon):
+        return self.state
+
+    def save_model_state(self, lat, lon, state):
+        self.saved_states.append(state)
+        self.state = state
+
+
+def _weather(hour: datetime) -> dict:
+    index = (hour - DAY_START) / timedelta(hours=1)
+    return {
+        "timestamp": hour.strftime("%Y-%m-%dT%H:%MZ"),
+        "temperature": 8.0 + 7.0 * math.sin(index / 24 * 2 * math.pi),
+        "relative_humidity": 60.0 + 30.0 * math.cos(index / 17),
+        "wind_speed": 3.0,
+    }
+
+
+def _install_fetch(monkeypatch, day_start):
+    calls = []
+
+    def fake_fetch(lat, lon, past_days):
+        calls.append(past_days)
+        start = day_start - timedelta(days=past_days)
+        hours = (past_days + 3) * 24
+        return [_weather(start + timedelta(hours=hour)) for hour in range(hours)]
+
+    monkeypatch.setattr(fire_risk_history_service, "fetch_historical_weather", fake_fetch)
+    return calls
+
+
+def _service(cache, now):
+    return FireRiskHistoryService(cache=cache, clock=lambda: now.timestamp())
+
+
+def test_cold_start_spins_up_and_saves_state_at_day_start(monkeypatch):
+    calls = _install_fetch(monkeypatch, DAY_START)
+    cache = FakeCache()
+
+    result = _service(cache, DAY_START + timedelta(hours=9)).compute_for_location(60.39, 5.32)
+
+    assert calls == [5]
+    assert len(result["ttf"]) == 72
+    assert result["result"]["firerisks"][0]["timestamp"] == str(DAY_START)
+    assert cache.saved_states[0]["timestamp"] == DAY_START.isoformat()
+
+
+def test_same_day_call_resumes_without_history(monkeypatch):
+    calls = _install_fetch(monkeypatch, DAY_START)
+    cache = FakeCache()
+    cold = _service(cache, DAY_START + timedelta(hours=9)).compute_for_location(60.39, 5.32)
+
+    warm = _service(cache, DAY_START + timedelta(hours=15)).compute_for_location(60.39, 5.32)
+
+    assert calls == [5, 0]
+    assert len(cache.saved_states) == 1
+    np.testing.assert_allclose(warm["ttf"], cold["ttf"], rtol=1e-12)
+
+
+def test_next_day_call_advances_state_by_one_day(monkeypatch):
+    _install_fetch(monkeypatch, DAY_START)
+    cache = FakeCache()
+    _service(cache, DAY_START + timedelta(hours=9)).compute_for_location(60.39, 5.32)
+
+    next_day = DAY_START + timedelta(days=1)
+    calls = _install_fetch(monkeypatch, next_day)
+    result = _service(cache, next_day + timedelta(hours=1)).compute_for_location(60.39, 5.32)
+
+    assert calls == [1]
+    assert cache.state["timestamp"] == next_day.isoformat()
+    assert result["result"]["firerisks"][0]["timestamp"] == str(next_day)
+
+
+def test_state_older_than_spinup_window_is_ignored(monkeypatch):
+    old_state = {
+        "timestamp": (DAY_START - timedelta(days=9)).isoformat(),
+        "wall": [50.0] * 10,
+        "rh_in": 0.4,
+        "cw_in": 0.007,
+        "c_wall": 0.0,
+    }
+    calls = _install_fetch(monkeypatch, DAY_START)
+    cache = FakeCache(state=old_state)
+
+    _service(cache, DAY_START + timedelta(hours=3)).compute_for_location(60.39, 5.32)
+
+    assert calls == [5]
+    assert cache.state["timestamp"] == DAY_START.isoformat()
+
+
+def test_compute_for_locations_shares_one_fetch_per_past_days_group(monkeypatch):
+    single_calls = _install_fetch(monkeypatch, DAY_START)
+    bulk_calls = []
+
+    def fake_fetch_many(locations, past_days):
+        bulk_calls.append((len(locations), past_days))
+        weather = []
+        start = DAY_START - timedelta(days=past_days)
+        records = [_weather(start + timedelta(hours=hour)) for hour in range((past_days + 3) * 24)]
+        for lat, lon in locations:
+            weather.append(
+                MET_client.HourlyWeather(
+                    lat=lat,
+                    lon=lon,
+                    time=[int((start + timedelta(hours=hour)).timestamp()) for hour in range(len(records))],
+                    temperature=[record["temperature"] for record in records],
+                    relative_humidity=[record["relative_humidity"] for record in records],
+                    wind_speed=[record["wind_speed"] for record in records],
+                )
+            )
+        return weather
+
+    monkeypatch.setattr(fire_risk_history_service, "fetch_historical_weather_many", fake_fetch_many)
+    now = DAY_START + timedelta(hours=9)
+
+    results = _service(FakeCache(), now).compute_for_locations([(60.39, 5.32), (59.91, 10.75)])
+    expected = _service(FakeCache(), now).compute_for_location(60.39, 5.32)
+
+    assert bulk_calls == [(2, 5)]
+    assert single_calls == [5]
+    np.testing.assert_allclose(results[0]["ttf"], expected["ttf"], rtol=1e-12)
+    assert results[0]["result"]["firerisks"] == expected["result"]["firerisks"]
+    assert len(results[1]["ttf"]) == 72
@@ -0,0 +1,137 @@
+import math
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+pytest.importorskip("frcm")
+np = pytest.importorskip("numpy")
+
+from frcm.datamodel.model import WeatherData, WeatherDataPoint
+from frcm.fireriskmodel.compute import compute as frcm_compute
+
+from app.services import fire_risk_kernel
+from app.services.fire_risk_service import compute_fire_risk_from_records
+
+
+def _synthetic_records(hours: int) -> list[dict]:
+    start = datetime(2026, 4, 10, tzinfo=timezone.utc)
+    records = []
+    for hour in range(hours):
+        records.append(
+            {
+                "timestamp": (start + timedelta(hours=hour)).isoformat(),
+                "temperature": 8.0 + 7.0 * math.sin(hour / 24 * 2 * math.pi),
+                "relative_humidity": 60.0 + 30.0 * math.cos(hour / 17),
+                "wind_speed": 3.0 + (hour % 5),
+            }
+        )
+    return records
+
+
+def _frcm_ttf(records: list[dict]) -> list[float]:
+    weather_data = WeatherData(
+        data=[
+            WeatherDataPoint(
+                timestamp=datetime.fromisoformat(record["timestamp"]),
+                temperature=record["temperature"],
+                humidity=record["relative_humidity"],
+                wind_speed=record["wind_speed"],
+            )
+            for record in records
+        ]
+    )
+    return [risk.ttf for risk in frcm_compute(weather_data).firerisks]
+
+
+@pytest.mark.parametrize("hours", [2, 12, 72, 200])
+def test_compute_matches_frcm_ttf(hours):
+    records = _synthetic_records(hours)
+
+    result = compute_fire_risk_from_records(records)
+
+    assert len(result["ttf"]) == hours
+    np.testing.assert_allclose(result["ttf"], _frcm_ttf(records), rtol=1e-9)
+
+
+def test_compute_keeps_frcm_timestamps_and_sorts_input():
+    records = _synthetic_records(6)
+    expected = [str(datetime.fromisoformat(record["timestamp"])) for record in records]
+
+    result = compute_fire_risk_from_records(list(reversed(records)))
+
+    assert [item["timestamp"] for item in result["result"]["firerisks"]] == expected
+
+
+def test_compute_fr_batch_matches_single_series():
+    hours = 48
+    grid = hours * fire_risk_kernel.STEPS_PER_HOUR
+    temperature = np.stack([np.linspace(-5, 20, grid), np.linspace(15, 2, grid)])
+    humidity = np.stack([np.linspace(90, 30, grid), np.full(grid, 55.0)])
+
+    _, batch_ttf = fire_risk_kernel.compute_fr(temperature, humidity)
+
+    for row in range(2):
+        _, single_ttf = fire_risk_kernel.compute_fr(temperature[row], humidity[row])
+        np.testing.assert_allclose(batch_ttf[row], single_ttf, rtol=1e-12)
+
+
+def test_compute_many_matches_single_runs_and_keeps_input_order():
+    series = [
+        _series(_synthetic_records(24)),
+        _series(_synthetic_records(12)),
+        _series([{**record, "temperature": record["temperature"] + 4} for record in _synthetic_records(24)]),
+    ]
+
+    results = fire_risk_kernel.compute_many(series)
+
+    for item, result in zip(series, results):
+        single = fire_risk_kernel.compute(item)
+        assert result.timestamps == single.timestamps
+        np.testing.assert_allclose(result.ttf, single.ttf, rtol=1e-12)
+
+
+def test_compute_interpolates_missing_values():
+    records = _synthetic_records(12)
+    records[5]["temperature"] = float("nan")
+
+    result = compute_fire_risk_from_records(records)
+
+    np.testing.assert_allclose(result["ttf"], _frcm_ttf(records), rtol=1e-9)
+
+
+def _series(records: list[dict]) -> fire_risk_kernel.WeatherSeries:
+    return fire_risk_kernel.WeatherSeries.from_timestamps(
+        [datetime.fromisoformat(record["timestamp"]) for record in records],
+        [record["temperature"] for record in records],
+        [record["relative_humidity"] for record in records],
+        [record["wind_speed"] for record in records],
+    )
+
+
+def test_resuming_from_saved_state_reproduces_full_run():
+    records = _synthetic_records(120)
+    snapshot_at = datetime.fromisoformat(records[48]["timestamp"])
+
+    full = fire_risk_kernel.compute(_series(records), snapshot_at=snapshot_at)
+    state = fire_risk_kernel.ModelState.from_dict(full.state.to_dict())
+    resumed = fire_risk_kernel.compute(_series(records[40:]), state=state)
+
+    assert full.state.timestamp == snapshot_at
+    assert resumed.timestamps == full.timestamps[48:]
+    np.testing.assert_allclose(resumed.ttf, full.ttf[48:], rtol=1e-12)
+
+
+def test_snapshot_outside_grid_is_ignored():
+    records = _synthetic_records(12)
+
+    result = fire_risk_kernel.compute(_series(records), snapshot_at=datetime(2030, 1, 1, tzinfo=timezone.utc))
+
+    assert result.state is None
+
+
+def test_resuming_requires_weather_covering_state_time():
+    records = _synthetic_records(24)
+    full = fire_risk_kernel.compute(_series(records), snapshot_at=datetime.fromisoformat(records[6]["timestamp"]))
+
+    with pytest.raises(ValueError, match="does not cover model state time"):
+        fire_risk_kernel.compute(_series(records[10:]), state=full.state)
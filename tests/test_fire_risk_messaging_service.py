@@ -1,8 +1,19 @@
+import threading
+import time
+from concurrent.futures import Future
+
 import pytest
 
 pytest.importorskip("frcm")
 
+from app.services import event_log_writer, fire_risk_messaging_service
+from app.services.event_log_writer import EventLogSettings, EventLogWriter
 from app.services.fire_risk_messaging_service import FireRiskMessagingService
+from app.services.pubsub_publisher_service import (
+    LocalPublisherClient,
+    PublisherBatchSettings,
+    PubSubPublisherService,
+)
 
 
 class FakeDocumentReference:
@@ -22,13 +33,41 @@ class FakeCollectionReference:
         return FakeDocumentReference(self.store, document_id)
 
 
+class FakeWriteBatch:
+    def __init__(self, client):
+        self.client = client
+        self.writes = []
+
+    def set(self, doc_ref, data):
+        self.writes.append((doc_ref, data))
+
+    def commit(self):
+        self.client.commits.append(len(self.writes))
+        for doc_ref, data in self.writes:
+            doc_ref.set(data)
+
+
 class FakeFirestoreClient:
     def __init__(self):
         self.store = {}
+        self.commits = []
 
     def collection(self, _collection_name):
         return FakeCollectionReference(self.store)
 
+    def batch(self):
+        return FakeWriteBatch(self)
+
+
+class FailingFirestoreClient(FakeFirestoreClient):
+    def batch(self):
+        raise RuntimeError("Firestore unavailable")
+
+
+def _writer(db):
+    # Lang ventetid, så testene styrer selv når køen skrives.
+    return EventLogWriter(db=db, settings=EventLogSettings(max_latency=60.0))
+
 
 class FakePublisher:
     def __init__(self):
@@ -39,6 +78,13 @@ class FakePublisher:
         return "message-123"
 
 
+class FakePublisherAsync(FakePublisher):
+    def publish_json_async(self, payload):
+        future = Future()
+        future.set_result(self.publish_json(payload))
+        return future
+
+
 def test_publish_for_location_computes_and_logs_event(monkeypatch):
     fake_firestore = FakeFirestoreClient()
     fake_publisher = FakePublisher()
@@ -51,23 +97,165 @@ def test_publish_for_location_computes_and_logs_event(monkeypatch):
         }
     ]
 
-    monkeypatch.setattr(
-        "app.services.fire_risk_messaging_service.firestore.client",
-        lambda: fake_firestore,
-    )
     monkeypatch.setattr(
         "app.services.fire_risk_messaging_service.fetch_weather_records_for_location",
         lambda lat, lon, max_points: records,
     )
     monkeypatch.setattr(
         "app.services.fire_risk_messaging_service.compute_fire_risk_from_records",
-        lambda incoming_records: {"ttf": [4.2], "result": {"risk": "high"}},
+        lambda incoming_records: {"ttf": [4.2], "result": {"firerisks": [{"ttf": 4.2}]}},
     )
 
-    service = FireRiskMessagingService(publisher=fake_publisher)
+    writer = _writer(fake_firestore)
+    service = FireRiskMessagingService(publisher=fake_publisher, event_log=writer)
     outcome = service.publish_for_location(60.3913, 5.3221, 1)
 
     assert outcome["message_id"] == "message-123"
     assert outcome["event"]["event_type"] == "fire_risk_updated"
     assert len(fake_publisher.payloads) == 1
-    assert len(fake_firestore.store) == 1
+    assert fake_firestore.store == {}
+
+    writer.flush()
+    document = fake_firestore.store[outcome["event"]["event_id"]]
+    assert document["message_id"] == "message-123"
+    assert document["payload"]["ttf"] == [4.2]
+    assert "result" not in document["payload"]
+    assert document["payload"]["location"] == {"lat": 60.3913, "lon": 5.3221}
+
+
+def test_publish_for_location_ignores_event_log_failures(monkeypatch):
+    monkeypatch.setattr(
+        "app.services.fire_risk_messaging_service.fetch_weather_records_for_location",
+        lambda lat, lon, max_points: [{"timestamp": "2026-03-25T09:00:00Z"}],
+    )
+    monkeypatch.setattr(
+        "app.services.fire_risk_messaging_service.compute_fire_risk_from_records",
+        lambda incoming_records: {"ttf": [4.2], "result": {}},
+    )
+
+    writer = _writer(FailingFirestoreClient())
+    service = FireRiskMessagingService(publisher=FakePublisher(), event_log=writer)
+    outcome = service.publish_for_location(60.3913, 5.3221, 1)
+    writer.flush()
+
+    assert outcome["message_id"] == "message-123"
+    assert (writer.written, writer.dropped) == (0, 1)
+
+
+def test_publish_after_event_log_shutdown_still_succeeds(monkeypatch):
+    monkeypatch.setattr(
+        "app.services.fire_risk_messaging_service.fetch_weather_records_for_location",
+        lambda lat, lon, max_points: [{"timestamp": "2026-03-25T09:00:00Z"}],
+    )
+    monkeypatch.setattr(
+        "app.services.fire_risk_messaging_service.compute_fire_risk_from_records",
+        lambda incoming_records: {"ttf": [4.2], "result": {}},
+    )
+
+    fake_firestore = FakeFirestoreClient()
+    writer = _writer(fake_firestore)
+    writer.stop()
+    service = FireRiskMessagingService(publisher=FakePublisherAsync(), event_log=writer)
+
+    assert service.publish_for_location(60.3913, 5.3221, 1)["message_id"] == "message-123"
+    assert [item["status"] for item in service.publish_for_locations([(60.0, 5.0, 1), (61.0, 5.0, 1)])] == [
+        "published",
+        "published",
+    ]
+    assert writer.dropped == 3
+    assert fake_firestore.store == {}
+
+
+def test_publish_for_locations_batches_publishes_and_event_log(monkeypatch):
+    fake_firestore = FakeFirestoreClient()
+    client = LocalPublisherClient(PublisherBatchSettings(max_messages=2, max_latency=0.01))
+    publisher = PubSubPublisherService(project_id="test-project", topic_id="test-topic", client=client)
+
+    def fake_fetch(lat, lon, max_points):
+        if lat == 0.0:
+            raise RuntimeError("MET unavailable")
+        return [
+            {
+                "timestamp": "2026-03-25T09:00:00Z",
+                "temperature": 12.0,
+                "relative_humidity": 45.0,
+                "wind_speed": 5.0,
+            }
+        ]
+
+    monkeypatch.setattr("app.services.fire_risk_messaging_service.fetch_weather_records_for_location", fake_fetch)
+    monkeypatch.setattr(
+        "app.services.fire_risk_messaging_service.compute_fire_risk_from_records",
+        lambda incoming_records: {"ttf": [4.2], "result": {"risk": "high"}},
+    )
+    monkeypatch.setattr(event_log_writer, "MAX_BATCH_WRITES", 2)
+
+    writer = _writer(fake_firestore)
+    service = FireRiskMessagingService(publisher=publisher, event_log=writer)
+    outcomes = service.publish_for_locations(
+        [(60.39, 5.32, 1), (0.0, 0.0, 1), (59.91, 10.75, 1), (63.43, 10.39, 1)]
+    )
+
+    assert [item["status"] for item in outcomes] == ["published", "error", "published", "published"]
+    assert outcomes[1]["stage"] == "compute"
+    assert [len(messages) for _, messages in client.batches] == [2, 1]
+    assert fake_firestore.commits == [2, 1]
+    assert fake_firestore.store[outcomes[0]["event_id"]]["message_id"] == outcomes[0]["message_id"]
+
+
+def test_publish_for_locations_rejects_too_many_locations(monkeypatch):
+    monkeypatch.setattr(fire_risk_messaging_service, "MAX_BULK_LOCATIONS", 1)
+
+    service = FireRiskMessagingService(publisher=FakePublisher(), event_log=_writer(FakeFirestoreClient()))
+
+    with pytest.raises(ValueError, match="at most 1 locations"):
+        service.publish_for_locations([(60.0, 5.0, 1), (61.0, 5.0, 1)])
+
+
+def test_bulk_publish_runs_the_model_on_the_shared_compute_pool(monkeypatch):
+    compute_threads = []
+
+    def fake_compute(incoming_records):
+        compute_threads.append(threading.current_thread().name)
+        return {"ttf": [4.2], "result": {}}
+
+    monkeypatch.setattr(
+        "app.services.fire_risk_messaging_service.fetch_weather_records_for_location",
+        lambda lat, lon, max_points: [{"timestamp": "2026-03-25T09:00:00Z"}],
+    )
+    monkeypatch.setattr("app.services.fire_risk_messaging_service.compute_fire_risk_from_records", fake_compute)
+
+    service = FireRiskMessagingService(publisher=FakePublisherAsync(), event_log=_writer(FakeFirestoreClient()))
+    outcomes = service.publish_for_locations([(60.0 + index / 100, 5.0, 1) for index in range(6)])
+
+    assert [item["status"] for item in outcomes] == ["published"] * 6
+    assert len(compute_threads) == 6
+    assert all(name.startswith("fire-risk-compute") for name in compute_threads)
+
+
+def test_bulk_publish_waits_at_most_flush_timeout_for_the_event_log(monkeypatch):
+    class SlowFirestoreClient(FakeFirestoreClient):
+        def batch(self):
+            time.sleep(0.5)
+            return super().batch()
+
+    monkeypatch.setattr(
+        "app.services.fire_risk_messaging_service.fetch_weather_records_for_location",
+        lambda lat, lon, max_points: [{"timestamp": "2026-03-25T09:00:00Z"}],
+    )
+    monkeypatch.setattr(
+        "app.services.fire_risk_messaging_service.compute_fire_risk_from_records",
+        lambda incoming_records: {"ttf": [4.2], "result": {}},
+    )
+
+    fake_firestore = SlowFirestoreClient()
+    writer = EventLogWriter(db=fake_firestore, settings=EventLogSettings(max_latency=60.0, flush_timeout=0.05))
+    service = FireRiskMessagingService(publisher=FakePublisherAsync(), event_log=writer)
+
+    started = time.monotonic()
+    outcomes = service.publish_for_locations([(60.0, 5.0, 1), (61.0, 5.0, 1)])
+
+    assert time.monotonic() - started < 0.4
+    assert [item["status"] for item in outcomes] == ["published", "published"]
+    writer.flush()
+    assert len(fake_firestore.store) == 2
@@ -1,14 +1,25 @@
+from datetime import timedelta
+
 import pytest
 
 pytest.importorskip("frcm")
+np = pytest.importorskip("numpy")
 
 from app.services import fire_risk_service
+from app.services.fire_risk_kernel import FireRiskSeries
+
+
+def _fire_risk_series(series, ttf):
+    return FireRiskSeries(
+        timestamps=[series.origin + timedelta(hours=hour) for hour in range(len(ttf))],
+        ttf=np.asarray(ttf, dtype=float),
+    )
 
 
 def test_compute_fire_risk_from_records_returns_ttf_and_result(monkeypatch):
-    def fake_compute(weather_data):
-        assert len(weather_data.data) == 1
-        return {"ttf": 42.0, "status": "ok"}
+    def fake_compute(series):
+        assert len(series) == 1
+        return _fire_risk_series(series, [42.0])
 
     monkeypatch.setattr(fire_risk_service, "compute", fake_compute)
 
@@ -23,14 +34,14 @@ def test_compute_fire_risk_from_records_returns_ttf_and_result(monkeypatch):
 
     result = fire_risk_service.compute_fire_risk_from_records(payload)
 
-    assert result["ttf"] == 42.0
-    assert result["result"]["status"] == "ok"
+    assert result["ttf"] == [42.0]
+    assert result["result"]["firerisks"] == [{"timestamp": "2026-02-23 12:00:00+00:00", "ttf": 42.0}]
 
 
 def test_compute_fire_risk_from_csv_parses_rows(monkeypatch):
-    def fake_compute(weather_data):
-        assert len(weather_data.data) == 2
-        return {"ttf": 15.5}
+    def fake_compute(series):
+        assert len(series) == 2
+        return _fire_risk_series(series, [15.5, 14.0])
 
     monkeypatch.setattr(fire_risk_service, "compute", fake_compute)
 
@@ -42,7 +53,7 @@ def test_compute_fire_risk_from_csv_parses_rows(monkeypatch):
 
     result = fire_risk_service.compute_fire_risk_from_csv(csv_payload)
 
-    assert result["ttf"] == 15.5
+    assert result["ttf"] == [15.5, 14.0]
 
 
 def test_compute_fire_risk_from_records_missing_field_raises():
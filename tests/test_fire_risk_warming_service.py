@@ -0,0 +1,114 @@
+import pytest
+
+pytest.importorskip("frcm")
+
+from app.services.fire_risk_warming_service import FireRiskWarmingService
+
+
+class FakeDocument:
+    def __init__(self, document_id, data):
+        self.id = document_id
+        self._data = data
+
+    def to_dict(self):
+        return self._data
+
+
+class FakeCollectionReference:
+    def __init__(self, documents):
+        self._documents = documents
+
+    def stream(self):
+        return iter(self._documents)
+
+
+class FakeFirestoreClient:
+    def __init__(self, documents):
+        self._documents = documents
+
+    def collection(self, _collection_name):
+        return FakeCollectionReference(self._documents)
+
+
+class FakeCache:
+    def __init__(self, cached_ids=()):
+        self.cached_ids = set(cached_ids)
+        self.saved = []
+        self.saved_timeslot = None
+
+    def current_timeslot(self):
+        return 7200
+
+    def get_grid_id(self, lat, lon, points, timeslot=None):
+        return f"grid_{round(lat, 1)}_{round(lon, 1)}_p{points}_t{timeslot}"
+
+    def get_cached_risks(self, locations, timeslot=None):
+        return [
+            {"ttf": [0.0]} if self.get_grid_id(*location, timeslot) in self.cached_ids else None
+            for location in locations
+        ]
+
+    def save_many_to_cache(self, entries, timeslot=None):
+        self.saved.extend(entries)
+        self.saved_timeslot = timeslot
+
+
+def test_warm_computes_uncached_cells_for_next_timeslot(monkeypatch):
+    documents = [
+        FakeDocument("bergen", {"lat": 60.39, "lon": 5.32, "points": [12, 24]}),
+        FakeDocument("bergen-nabo", {"lat": 60.41, "lon": 5.33, "points": 12}),
+        FakeDocument("oslo", {"lat": 59.91, "lon": 10.75, "points": 12}),
+        FakeDocument("disabled", {"lat": 63.43, "lon": 10.39, "enabled": False}),
+        FakeDocument("broken", {"lat": "north"}),
+    ]
+    monkeypatch.setattr(
+        "app.services.fire_risk_warming_service.firestore.client",
+        lambda: FakeFirestoreClient(documents),
+    )
+
+    class FakeWeatherCache:
+        def get_records(self, lat, lon, points, timeslot):
+            assert timeslot == 10800
+            return [
+                {"timestamp": "1970-01-01T03:00:00Z", "lat": lat},
+                {"timestamp": "1970-01-01T04:00:00Z", "lat": lat},
+            ][:points]
+
+    computed = []
+
+    def fake_compute(records):
+        computed.append([record["timestamp"] for record in records])
+        return {"ttf": [records[0]["lat"]]}
+
+    monkeypatch.setattr("app.services.fire_risk_warming_service.compute_fire_risk_from_records", fake_compute)
+
+    cache = FakeCache(cached_ids={"grid_59.9_10.8_p12_t10800"})
+    report = FireRiskWarmingService(cache=cache, max_concurrent=2, weather=FakeWeatherCache()).warm()
+
+    assert report["timeslot"] == 10800
+    assert report["cells"] == 3
+    assert report["already_cached"] == 1
+    assert report["warmed"] == 2
+    assert report["failed"] == 0
+    assert cache.saved_timeslot == 10800
+    assert sorted((lat, points) for lat, _, points, _ in cache.saved) == [(60.39, 12), (60.39, 24)]
+    assert all(timestamps[0] == "1970-01-01T03:00:00Z" for timestamps in computed)
+
+
+def test_warm_reports_failed_cells(monkeypatch):
+    documents = [FakeDocument("bergen", {"lat": 60.39, "lon": 5.32})]
+    monkeypatch.setattr(
+        "app.services.fire_risk_warming_service.firestore.client",
+        lambda: FakeFirestoreClient(documents),
+    )
+
+    class FailingWeatherCache:
+        def get_records(self, lat, lon, points, timeslot):
+            raise RuntimeError("MET unavailable")
+
+    cache = FakeCache()
+    report = FireRiskWarmingService(cache=cache, weather=FailingWeatherCache()).warm(timeslot=3600)
+
+    assert report["warmed"] == 0
+    assert report["failed"] == 1
+    assert cache.saved == []
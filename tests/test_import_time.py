@@ -0,0 +1,102 @@
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("firebase_functions")
+pytest.importorskip("werkzeug")
+
+FUNCTIONS_DIR = Path(__file__).resolve().parents[1] / "functions"
+# Romslig grense: fanger at en tung avhengighet sniker seg inn i importen, ikke små variasjoner.
+IMPORT_BUDGET_SECONDS = float(os.getenv("FIRE_RISK_IMPORT_BUDGET_SECONDS", "2.0"))
+HEAVY_MODULES = ("numpy", "requests", "google.cloud.firestore")
+# Står under "ignore" i firebase.json, så main må klare seg uten dem i deploy-bundelen.
+DEV_ONLY_MODULES = ("app.tools.offline", "app.tools.benchmark", "app.tools.benchmark_serialization", "app.tools.loadtest")
+
+_SCRIPT = """
+import json, sys, time
+
+# Det firebase_admin selv drar inn (f.eks. requests via google-auth) er ikke mains ansvar.
+preloaded = set(sys.modules)
+started = time.perf_counter()
+import main
+import_seconds = time.perf_counter() - started
+loaded_after_import = [name for name in HEAVY_MODULES if name in sys.modules and name not in preloaded]
+dev_only_loaded = [name for name in DEV_ONLY_MODULES if name in sys.modules]
+
+import firebase_admin
+from firebase_functions import https_fn
+from werkzeug.test import EnvironBuilder
+
+from app.security.api_keys import API_KEY_HEADER
+from app.services.fire_risk_cache_service import FireRiskCacheService
+from app.tools.offline import install_offline_backends
+
+install_offline_backends(api_keys_to_seed=["import-key"])
+FireRiskCacheService().save_to_cache(60.3913, 5.3221, 12, {"ttf": [5.0], "result": {"firerisks": []}})
+
+statuses = {}
+for path, query in (("/health", None), ("/fire-risk/compute-by-location", {"lat": "60.3913", "lon": "5.3221"})):
+    environ = EnvironBuilder(path=path, query_string=query, headers={API_KEY_HEADER: "import-key"}).get_environ()
+    response = main.api(https_fn.Request(environ))
+    statuses[path] = [response.status_code, response.headers.get("x-cache-status")]
+
+public = {}
+for path in ("/health", "/health/caches"):
+    response = main.api(https_fn.Request(EnvironBuilder(path=path).get_environ()))
+    public[path] = [response.status_code, sorted(json.loads(b"".join(response.response)))]
+
+print(json.dumps({
+    "import_seconds": import_seconds,
+    "loaded_after_import": loaded_after_import,
+    "dev_only_loaded": dev_only_loaded,
+    "loaded_after_requests": [name for name in HEAVY_MODULES if name in sys.modules and name not in preloaded],
+    "statuses": statuses,
+    "public": public,
+}))
+"""
+
+
+@pytest.fixture(scope="module")
+def report() -> dict:
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [str(FUNCTIONS_DIR), env.get("PYTHONPATH")]))
+    env["FIRE_RISK_TIMING_LOG"] = "false"
+    # main.py kaller initialize_app() ved import; uten credentials erstattes den før main lastes.
+    prelude = f"HEAVY_MODULES = {HEAVY_MODULES!r}\nDEV_ONLY_MODULES = {DEV_ONLY_MODULES!r}\nimport firebase_admin\nfirebase_admin.initialize_app = lambda *a, **k: None\n"
+    completed = subprocess.run(
+        [sys.executable, "-c", prelude + _SCRIPT],
+        cwd=FUNCTIONS_DIR,
+        env=env,
+        capture_output=True,
+        text=True,
+        timeout=60,
+    )
+    assert completed.returncode == 0, completed.stderr
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def test_cold_import_stays_within_budget_and_defers_heavy_modules(report):
+    assert report["import_seconds"] < IMPORT_BUDGET_SECONDS
+    assert report["loaded_after_import"] == []
+
+
+def test_health_and_cache_hit_do_not_load_the_model(report):
+    assert report["statuses"]["/health"][0] == 200
+    assert report["statuses"]["/fire-risk/compute-by-location"] == [200, "hit"]
+    assert "numpy" not in report["loaded_after_requests"]
+
+
+def test_health_is_minimal_and_cache_stats_require_a_key(report):
+    assert report["public"]["/health"] == [200, ["service", "status"]]
+    assert report["public"]["/health/caches"] == [401, ["detail"]]
+
+
+def test_dev_only_tools_are_excluded_from_the_deploy_and_not_imported_by_main(report):
+    firebase_config = json.loads((FUNCTIONS_DIR.parent / "firebase.json").read_text())
+    ignored = set(firebase_config["functions"][0]["ignore"])
+    assert {f"{name.replace('.', '/')}.py" for name in DEV_ONLY_MODULES} <= ignored
+    assert report["dev_only_loaded"] == []
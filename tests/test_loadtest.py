@@ -0,0 +1,61 @@
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("firebase_functions")
+pytest.importorskip("werkzeug")
+
+from app.tools import loadtest
+
+FUNCTIONS_DIR = Path(__file__).resolve().parents[1] / "functions"
+
+
+def test_load_run_reports_percentiles_per_kind(tmp_path):
+    output = tmp_path / "load.json"
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [str(FUNCTIONS_DIR), env.get("PYTHONPATH")]))
+
+    # Egen prosess: install_offline_backends bytter ut globale klienter som ikke skal lekke til andre tester.
+    completed = subprocess.run(
+        [
+            sys.executable, "-m", "app.tools.loadtest",
+            "--requests", "60", "--concurrency", "4", "--met-latency-ms", "1",
+            "--mix", "hit=2,miss=1,csv=1,publish=1,health=1", "--output", str(output),
+        ],
+        cwd=FUNCTIONS_DIR,
+        env=env,
+        capture_output=True,
+        text=True,
+        timeout=120,
+    )
+
+    assert completed.returncode == 0, completed.stdout + completed.stderr
+    report = json.loads(output.read_text(encoding="utf-8"))
+    assert report["schema_version"] == loadtest.SCHEMA_VERSION
+    assert report["total"]["requests"] == 60
+    assert {row["kind"] for row in report["kinds"]} <= set(loadtest.KINDS)
+    for row in report["kinds"]:
+        assert set(row["statuses"]) == {"200"}
+        assert row["p50_ms"] <= row["p95_ms"] <= row["p99_ms"] <= row["max_ms"]
+        assert sum(bucket["count"] for bucket in row["histogram"]) == row["requests"]
+    misses = next(row for row in report["kinds"] if row["kind"] == "miss")
+    assert "met_fetch" in misses["mean_stages_ms"]
+    assert report["met_requests"] == loadtest.WARM_LOCATIONS + misses["requests"]
+
+
+def test_parse_mix_and_histogram():
+    assert loadtest.parse_mix("hit=3, miss") == {"hit": 3.0, "miss": 1.0}
+    with pytest.raises(ValueError, match="Unknown request kind"):
+        loadtest.parse_mix("hit=1,grid=1")
+    with pytest.raises(ValueError, match="positive weight"):
+        loadtest.parse_mix("hit=0")
+
+    buckets = loadtest.histogram([0.5, 1.0, 3.0, 9000.0])
+    assert buckets[0] == {"le_ms": 1, "count": 2}
+    assert buckets[2] == {"le_ms": 5, "count": 1}
+    assert buckets[-1] == {"le_ms": None, "count": 1}
+    assert loadtest.percentile([1.0, 2.0, 3.0, 4.0], 0.5) == 2.0
@@ -0,0 +1,55 @@
+import pytest
+
+from app.services.memory_cache import TtlLruCache
+
+
+class FakeClock:
+    def __init__(self, now=0.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def test_get_returns_value_until_expiry():
+    clock = FakeClock(now=100.0)
+    cache = TtlLruCache(max_entries=4, clock=clock)
+    cache.set("a", {"ttf": [1.0]}, expires_at=200.0)
+
+    assert cache.get("a") == {"ttf": [1.0]}
+
+    clock.now = 200.0
+
+    assert cache.get("a") is None
+    assert len(cache) == 0
+
+
+def test_set_evicts_least_recently_used_entry():
+    cache = TtlLruCache(max_entries=2, clock=FakeClock())
+    cache.set("a", 1, expires_at=10.0)
+    cache.set("b", 2, expires_at=10.0)
+    cache.get("a")
+    cache.set("c", 3, expires_at=10.0)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert cache.stats()["evictions"] == 1
+
+
+def test_stats_reports_hits_misses_and_ratio():
+    cache = TtlLruCache(max_entries=2, clock=FakeClock())
+    cache.set("a", 1, expires_at=10.0)
+    cache.get("a")
+    cache.get("missing")
+
+    stats = cache.stats()
+
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+    assert stats["hit_ratio"] == 0.5
+
+
+def test_max_entries_must_be_positive():
+    with pytest.raises(ValueError, match="max_entries"):
+        TtlLruCache(max_entries=0)
@@ -41,3 +41,26 @@ async def test_publish_fire_risk_returns_message_details(app: FastAPI, monkeypat
 
     assert response.status_code == 200
     assert response.json()["message_id"] == "message-123"
+
+
+@pytest.mark.anyio
+async def test_publish_fire_risk_batch_returns_per_location_outcomes(app: FastAPI, monkeypatch):
+    class FakeMessagingService:
+        def publish_for_locations(self, locations):
+            assert locations == [(60.3913, 5.3221, 12), (59.9123, 10.7543, 3)]
+            return [
+                {"lat": 60.3913, "lon": 5.3221, "points": 12, "status": "published", "message_id": "m-1"},
+                {"lat": 59.9123, "lon": 10.7543, "points": 3, "status": "error", "error": "MET"},
+            ]
+
+    monkeypatch.setattr("app.api.messaging.FireRiskMessagingService", FakeMessagingService)
+
+    payload = {"locations": [{"lat": 60.3913, "lon": 5.3221}, {"lat": 59.9123, "lon": 10.7543, "points": 3}]}
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://testserver") as client:
+        response = await client.post("/messaging/publish-fire-risk-batch", json=payload)
+
+    assert response.status_code == 200
+    assert response.json()["published"] == 1
+    assert response.json()["failed"] == 1
@@ -1,5 +1,10 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
 import pytest
 
+import MET_client
 from MET_client import extract_weather_records
 
 
@@ -15,3 +20,132 @@ def test_extract_weather_records_raises_when_no_valid_points():
 
     with pytest.raises(ValueError, match="No valid weather records found"):
         extract_weather_records(raw_json, max_points=2)
+
+
+class StubMetHandler(BaseHTTPRequestHandler):
+    requests_seen: list = []
+    expires = "Thu, 01 Jan 1970 00:00:00 GMT"
+    last_modified = "Wed, 01 Apr 2026 10:00:00 GMT"
+    body = json.dumps(
+        {
+            "properties": {
+                "timeseries": [
+                    {
+                        "time": "2026-04-01T10:00:00Z",
+                        "data": {
+                            "instant": {
+                                "details": {"air_temperature": 7.5, "wind_speed": 3.1, "relative_humidity": 61.0}
+                            }
+                        },
+                    }
+                ]
+            }
+        }
+    ).encode("utf-8")
+
+    def do_GET(self):
+        type(self).requests_seen.append((self.path, self.headers.get("If-Modified-Since")))
+        if self.headers.get("If-Modified-Since") == self.last_modified:
+            self.send_response(304)
+            self.send_header("Expires", self.expires)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(self.body)))
+        self.send_header("Expires", self.expires)
+        self.send_header("Last-Modified", self.last_modified)
+        self.end_headers()
+        self.wfile.write(self.body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def met_server(monkeypatch):
+    StubMetHandler.requests_seen = []
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubMetHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    monkeypatch.setattr(MET_client, "MET_FORECAST_URL", f"http://127.0.0.1:{server.server_port}/compact")
+    MET_client._forecast_cache.clear()
+    yield StubMetHandler
+    server.shutdown()
+    server.server_close()
+    MET_client._forecast_cache.clear()
+
+
+def test_fetch_weather_revalidates_with_if_modified_since(met_server):
+    first = MET_client.fetch_weather(60.39134, 5.32211)
+    second = MET_client.fetch_weather(60.39134, 5.32211)
+
+    assert first == second
+    assert [since for _, since in met_server.requests_seen] == [None, met_server.last_modified]
+    assert met_server.requests_seen[0][0] == "/compact?lat=60.3913&lon=5.3221"
+
+
+def test_fetch_weather_serves_unexpired_forecast_without_request(met_server, monkeypatch):
+    monkeypatch.setattr(met_server, "expires", "Fri, 01 Jan 2100 00:00:00 GMT")
+
+    MET_client.fetch_weather(60.3913, 5.3221)
+    records = MET_client.fetch_weather_records_for_location(60.3913, 5.3221, max_points=1)
+
+    assert len(met_server.requests_seen) == 1
+    assert records[0]["temperature"] == 7.5
+
+
+def test_fetch_weather_reuses_pooled_session(met_server):
+    assert MET_client.get_session() is MET_client.get_session()
+
+
+class FakeOpenMeteoSession:
+    def __init__(self):
+        self.requests = []
+
+    def get(self, url, params=None, headers=None, timeout=None):
+        from app.tools.offline import StubResponse, open_meteo_hourly
+
+        self.requests.append(params)
+        locations = [
+            open_meteo_hourly(float(lat), float(lon), params["past_days"], 1, timeformat=params["timeformat"])
+            for lat, lon in zip(params["latitude"].split(","), params["longitude"].split(","))
+        ]
+        return StubResponse(locations[0] if len(locations) == 1 else locations, {})
+
+
+def test_fetch_historical_weather_many_chunks_coordinates_and_keeps_order(monkeypatch):
+    session = FakeOpenMeteoSession()
+    monkeypatch.setattr(MET_client, "_session", session)
+    monkeypatch.setattr(MET_client, "OPEN_METEO_MAX_LOCATIONS", 2)
+    locations = [(60.0, 5.0), (61.0, 6.0), (60.0, 5.0), (62.0, 7.0)]
+
+    weather = MET_client.fetch_historical_weather_many(locations, past_days=1)
+
+    assert [(params["latitude"], params["longitude"]) for params in session.requests] == [
+        ("60.0,61.0", "5.0,6.0"),
+        ("62.0", "7.0"),
+    ]
+    assert [(item.lat, item.lon) for item in weather] == locations
+    assert weather[0] is weather[2]
+    assert len(weather[3].time) == len(weather[3].temperature) == 48
+    assert weather[3].time[1] - weather[3].time[0] == 3600
+
+
+def test_open_meteo_chunks_respect_url_length(monkeypatch):
+    monkeypatch.setattr(MET_client, "OPEN_METEO_MAX_URL_LENGTH", len(MET_client.OPEN_METEO_URL) + 260)
+    locations = [(60.123456, 5.123456)] * 5
+
+    chunks = MET_client._open_meteo_chunks(locations)
+
+    assert [len(chunk) for chunk in chunks] == [2, 2, 1]
+
+
+def test_fetch_historical_weather_keeps_record_format(monkeypatch):
+    monkeypatch.setattr(MET_client, "_session", FakeOpenMeteoSession())
+
+    records = MET_client.fetch_historical_weather(60.39, 5.32, past_days=1)
+
+    assert len(records) == 48
+    assert records[0]["timestamp"].endswith("T00:00Z")
+    assert set(records[0]) == {"timestamp", "temperature", "wind_speed", "relative_humidity"}
@@ -1,6 +1,12 @@
 import pytest
 
-from app.services.pubsub_publisher_service import PubSubPublisherService
+from app.services.pubsub_publisher_service import (
+    LocalPublisherClient,
+    PublisherBatchSettings,
+    PubSubPublisherService,
+    set_publisher_client,
+    shutdown_publisher,
+)
 
 
 def test_publish_json_raises_when_pubsub_not_configured():
@@ -10,3 +16,50 @@ def test_publish_json_raises_when_pubsub_not_configured():
 
     with pytest.raises(RuntimeError, match="Pub/Sub is not configured"):
         service.publish_json({"event": "fire_risk_updated"})
+
+
+def test_local_publisher_batches_by_message_count():
+    client = LocalPublisherClient(PublisherBatchSettings(max_messages=2, max_latency=60))
+    service = PubSubPublisherService(project_id="test-project", topic_id="test-topic", client=client)
+
+    futures = [service.publish_json_async({"n": index}) for index in range(3)]
+
+    assert [len(messages) for _, messages in client.batches] == [2]
+    assert [future.done() for future in futures] == [True, True, False]
+
+    client.stop()
+
+    assert [len(messages) for _, messages in client.batches] == [2, 1]
+    assert [future.result() for future in futures] == ["1", "2", "3"]
+    assert client.batches[0][0] == "projects/test-project/topics/test-topic"
+
+
+def test_local_publisher_flushes_before_exceeding_max_bytes():
+    client = LocalPublisherClient(PublisherBatchSettings(max_messages=100, max_bytes=20, max_latency=60))
+    service = PubSubPublisherService(project_id="test-project", topic_id="test-topic", client=client)
+
+    service.publish_json_async({"value": "aaaa"})
+    service.publish_json_async({"value": "bbbb"})
+    client.stop()
+
+    assert [len(messages) for _, messages in client.batches] == [1, 1]
+
+
+def test_local_publisher_flushes_after_max_latency():
+    client = LocalPublisherClient(PublisherBatchSettings(max_messages=100, max_latency=0.01))
+    service = PubSubPublisherService(project_id="test-project", topic_id="test-topic", client=client)
+
+    assert service.publish_json({"event": "fire_risk_updated"}) == "1"
+    assert len(client.batches) == 1
+
+
+def test_shutdown_publisher_stops_shared_client():
+    client = LocalPublisherClient()
+    set_publisher_client(client)
+    service = PubSubPublisherService(project_id="test-project", topic_id="test-topic")
+
+    future = service.publish_json_async({"event": "fire_risk_updated"})
+    shutdown_publisher()
+
+    assert future.result(timeout=1) == "1"
+    assert client.stopped is True
@@ -0,0 +1,73 @@
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+httpx = pytest.importorskip("httpx")
+
+from fastapi import Depends, FastAPI
+
+from app.services.request_timing import RequestTimingMiddleware, RequestTimings, bind_context, stage, timed
+
+
+@timed("cache_read")
+def _read_cache():
+    return None
+
+
+def _check_key():
+    with stage("api_key"):
+        pass
+
+
+@pytest.fixture
+def app() -> FastAPI:
+    app = FastAPI()
+    app.add_middleware(RequestTimingMiddleware)
+
+    @app.get("/work", dependencies=[Depends(_check_key)])
+    async def work():
+        _read_cache()
+        _read_cache()
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            with stage("compute"):
+                executor.submit(bind_context(_read_cache)).result()
+        return {"ok": True}
+
+    return app
+
+
+@pytest.mark.anyio
+async def test_middleware_reports_stages_in_header_and_log(app: FastAPI, capsys):
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://testserver") as client:
+        response = await client.get("/work")
+
+    assert response.status_code == 200
+    entries = [entry.strip().split(";")[0] for entry in response.headers["server-timing"].split(",")]
+    assert entries[0] == "api_key"
+    assert {"cache_read", "compute", "total"} <= set(entries)
+
+    log = json.loads(capsys.readouterr().out.strip().splitlines()[-1])
+    assert log["message"] == "request_timing"
+    assert log["path"] == "/work"
+    assert log["status"] == 200
+    assert log["stage_counts"]["cache_read"] == 3
+    assert log["stage_counts"]["compute"] == 1
+    assert set(log["stages_ms"]) == set(log["stage_counts"])
+
+
+def test_stage_is_a_no_op_outside_a_request():
+    with stage("compute"):
+        pass
+    assert _read_cache() is None
+
+
+def test_server_timing_format():
+    timings = RequestTimings()
+    timings.add("cache_read", 1.2)
+    timings.add("cache_read", 2.0)
+    timings.add("compute", 10.0)
+
+    assert timings.server_timing(20.0) == "cache_read;dur=3.2, compute;dur=10.0, total;dur=20.0"
+    assert timings.counts() == {"cache_read": 2, "compute": 1}
@@ -0,0 +1,154 @@
+import gzip
+import json
+from datetime import datetime, timezone
+
+import pytest
+
+from app.api import responses
+from app.api.responses import (
+    choose_encoding,
+    choose_media_type,
+    fire_risk_batch_response,
+    fire_risk_response,
+    render_json,
+    to_columnar,
+)
+
+
+def _result(points):
+    ttf = [5.0 + index / 7 for index in range(points)]
+    return {
+        "ttf": ttf,
+        "result": {
+            "firerisks": [
+                {"timestamp": f"2026-04-13 {index % 24:02d}:00:00+00:00", "ttf": value}
+                for index, value in enumerate(ttf)
+            ]
+        },
+    }
+
+
+def test_render_json_round_trips_result():
+    result = _result(24)
+
+    assert json.loads(render_json(result)) == result
+
+
+def test_render_json_converts_datetimes_and_arrays():
+    class FakeArray:
+        def tolist(self):
+            return [1.5, 2.5]
+
+    body = render_json({"timestamp": datetime(2026, 4, 13, 12, tzinfo=timezone.utc), "ttf": FakeArray()})
+
+    assert json.loads(body) == {"timestamp": "2026-04-13T12:00:00+00:00", "ttf": [1.5, 2.5]}
+
+
+def test_render_json_rejects_nan():
+    with pytest.raises(ValueError):
+        render_json({"ttf": [float("nan")]})
+
+
+@pytest.mark.parametrize(
+    ("header", "expected"),
+    [
+        (None, None),
+        ("identity", None),
+        ("gzip, deflate", "gzip"),
+        ("gzip;q=0, deflate", None),
+        ("*", "gzip"),
+    ],
+)
+def test_choose_encoding_without_brotli(monkeypatch, header, expected):
+    monkeypatch.setattr(responses, "brotli", None)
+
+    assert choose_encoding(header) == expected
+
+
+def test_choose_encoding_prefers_brotli_when_available(monkeypatch):
+    monkeypatch.setattr(responses, "brotli", object())
+
+    assert choose_encoding("gzip, br") == "br"
+    assert choose_encoding("gzip, br;q=0") == "gzip"
+
+
+def test_fire_risk_response_compresses_large_bodies(monkeypatch):
+    monkeypatch.setattr(responses, "brotli", None)
+    result = _result(200)
+
+    response = fire_risk_response(result, None, "gzip")
+
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["vary"] == "Accept, Accept-Encoding"
+    assert json.loads(gzip.decompress(response.body)) == result
+
+
+def test_fire_risk_response_prefers_brotli():
+    brotli = pytest.importorskip("brotli")
+    result = _result(200)
+
+    response = fire_risk_response(result, None, "gzip, br")
+
+    assert response.headers["content-encoding"] == "br"
+    assert json.loads(brotli.decompress(response.body)) == result
+
+
+def test_fire_risk_response_leaves_small_bodies_uncompressed():
+    response = fire_risk_response({"ttf": [1.0]}, None, "gzip, br")
+
+    assert "content-encoding" not in response.headers
+    assert response.body == b'{"ttf":[1.0]}'
+
+
+@pytest.mark.parametrize(
+    ("header", "expected"),
+    [
+        (None, "application/json"),
+        ("*/*", "application/json"),
+        ("application/vnd.fireguard.columnar+json", "application/vnd.fireguard.columnar+json"),
+        ("application/json;q=0.5, application/vnd.fireguard.columnar+json", "application/vnd.fireguard.columnar+json"),
+        ("text/html", "application/json"),
+    ],
+)
+def test_choose_media_type(header, expected):
+    assert choose_media_type(header) == expected
+
+
+def test_msgpack_is_not_offered_without_the_library(monkeypatch):
+    monkeypatch.setattr(responses, "msgpack", None)
+
+    assert choose_media_type("application/msgpack") == "application/json"
+
+
+def test_columnar_response_has_parallel_arrays():
+    result = _result(3)
+
+    response = fire_risk_response(result, "application/vnd.fireguard.columnar+json", None)
+
+    assert response.media_type == "application/vnd.fireguard.columnar+json"
+    assert json.loads(response.body) == {
+        "timestamps": [item["timestamp"] for item in result["result"]["firerisks"]],
+        "ttf": result["ttf"],
+    }
+
+
+def test_columnar_batch_response_converts_only_successful_items():
+    ok = {"lat": 60.0, "lon": 5.0, "points": 3, "status": "ok", "cached": False, **_result(3)}
+    error = {"lat": 61.0, "lon": 6.0, "points": 3, "status": "error", "status_code": 502, "error": "MET down"}
+
+    response = fire_risk_batch_response([ok, error], "application/vnd.fireguard.columnar+json", None)
+
+    first, second = json.loads(response.body)["results"]
+    assert set(first) == {"lat", "lon", "points", "status", "cached", "timestamps", "ttf"}
+    assert first["ttf"] == ok["ttf"]
+    assert second == error
+
+
+def test_msgpack_response_round_trips_columnar_layout():
+    msgpack = pytest.importorskip("msgpack")
+    result = _result(48)
+
+    response = fire_risk_response(result, "application/msgpack", None)
+
+    assert response.media_type == "application/msgpack"
+    assert msgpack.unpackb(response.body) == to_columnar(result)
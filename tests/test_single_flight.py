@@ -0,0 +1,51 @@
+import threading
+
+import pytest
+
+from app.services.single_flight import SingleFlight
+
+
+def test_concurrent_calls_with_same_key_share_one_execution():
+    flight = SingleFlight()
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+    results = []
+
+    def slow_compute():
+        calls.append(1)
+        started.set()
+        release.wait(timeout=5)
+        return {"ttf": [1.0]}
+
+    def worker():
+        results.append(flight.do("grid_a", slow_compute))
+
+    leader = threading.Thread(target=worker)
+    leader.start()
+    started.wait(timeout=5)
+    followers = [threading.Thread(target=worker) for _ in range(4)]
+    for thread in followers:
+        thread.start()
+    while flight.coalesced < 4:
+        pass
+    release.set()
+    for thread in [leader, *followers]:
+        thread.join(timeout=5)
+
+    assert len(calls) == 1
+    assert results == [{"ttf": [1.0]}] * 5
+    assert flight.in_flight() == 0
+
+
+def test_error_is_shared_with_waiters_and_next_call_runs_again():
+    flight = SingleFlight()
+
+    def failing():
+        raise RuntimeError("MET unavailable")
+
+    with pytest.raises(RuntimeError, match="MET unavailable"):
+        flight.do("grid_a", failing)
+
+    assert flight.do("grid_a", lambda: "ok") == "ok"
+    assert flight.executions == 2
@@ -0,0 +1,137 @@
+import pytest
+
+from app.services.memory_cache import TtlLruCache
+from app.services.weather_cache_service import WEATHER_CACHE_COLLECTION, WeatherCacheService
+
+
+class FakeSnapshot:
+    def __init__(self, data):
+        self._data = data
+
+    @property
+    def exists(self):
+        return self._data is not None
+
+    def to_dict(self):
+        return self._data
+
+
+class FakeDocumentReference:
+    def __init__(self, store, document_id):
+        self._store = store
+        self._document_id = document_id
+
+    def get(self):
+        return FakeSnapshot(self._store.get(self._document_id))
+
+    def set(self, data):
+        self._store[self._document_id] = data
+
+
+class FakeCollectionReference:
+    def __init__(self, store):
+        self._store = store
+
+    def document(self, document_id):
+        return FakeDocumentReference(self._store, document_id)
+
+
+class FakeFirestoreClient:
+    def __init__(self):
+        self.collections = {}
+
+    def collection(self, name):
+        return FakeCollectionReference(self.collections.setdefault(name, {}))
+
+
+class FakeCellCache:
+    def get_cell_id(self, lat, lon):
+        return f"cell_{round(lat, 1)}_{round(lon, 1)}"
+
+    def current_timeslot(self):
+        return 1_775_041_200  # 2026-04-01T11:00:00Z
+
+
+def _raw_forecast(hours):
+    return {
+        "properties": {
+            "meta": {"updated_at": "2026-04-01T10:12:00Z"},
+            "timeseries": [
+                {
+                    "time": f"2026-04-01T{10 + hour:02d}:00:00Z",
+                    "data": {
+                        "instant": {
+                            "details": {"air_temperature": 5.0 + hour, "wind_speed": 2.0, "relative_humidity": 70.0}
+                        }
+                    },
+                }
+                for hour in range(hours)
+            ],
+        }
+    }
+
+
+@pytest.fixture
+def firestore_client(monkeypatch):
+    client = FakeFirestoreClient()
+    monkeypatch.setattr("app.services.weather_cache_service.firestore.client", lambda: client)
+    return client
+
+
+@pytest.fixture
+def fetches(monkeypatch):
+    calls = []
+
+    def fake_fetch_forecast(lat, lon):
+        calls.append((lat, lon))
+        return _raw_forecast(12), 2_000_000_000.0
+
+    monkeypatch.setattr("app.services.weather_cache_service.fetch_forecast", fake_fetch_forecast)
+    return calls
+
+
+def test_points_values_in_same_cell_share_one_fetch(firestore_client, fetches):
+    service = WeatherCacheService(cache=FakeCellCache(), memory_cache=TtlLruCache(max_entries=8))
+
+    short = service.get_records(60.39, 5.32, points=2)
+    long = service.get_records(60.41, 5.33, points=6)
+
+    assert fetches == [(60.39, 5.32)]
+    # Timen før gjeldende timeslot skjæres bort.
+    assert [record["timestamp"] for record in short] == ["2026-04-01T11:00:00Z", "2026-04-01T12:00:00Z"]
+    assert long[:2] == short
+    assert len(long) == 6
+    assert long[0] == {"timestamp": "2026-04-01T11:00:00Z", "temperature": 6.0, "relative_humidity": 70.0, "wind_speed": 2.0}
+
+    document = firestore_client.collections[WEATHER_CACHE_COLLECTION]["cell_60.4_5.3"]
+    assert document["issued_at"] == "2026-04-01T10:12:00Z"
+    assert len(document["timestamps"]) == 12
+
+
+def test_forecast_stored_by_another_instance_is_reused(firestore_client, fetches):
+    WeatherCacheService(cache=FakeCellCache(), memory_cache=TtlLruCache(max_entries=8)).get_records(60.39, 5.32, 3)
+
+    records = WeatherCacheService(cache=FakeCellCache(), memory_cache=TtlLruCache(max_entries=8)).get_records(
+        60.4, 5.3, 3, timeslot=1_775_044_800
+    )
+
+    assert len(fetches) == 1
+    assert records[0]["timestamp"] == "2026-04-01T12:00:00Z"
+
+
+def test_expired_forecast_is_fetched_again(firestore_client, fetches):
+    firestore_client.collections[WEATHER_CACHE_COLLECTION] = {
+        "cell_60.4_5.3": {"expires": 1.0, "timestamps": ["2026-04-01T11:00:00Z"]},
+    }
+
+    WeatherCacheService(cache=FakeCellCache(), memory_cache=TtlLruCache(max_entries=8)).get_records(60.39, 5.32, 3)
+
+    assert fetches == [(60.39, 5.32)]
+
+
+def test_forecast_ending_before_timeslot_is_rejected(firestore_client, fetches):
+    service = WeatherCacheService(cache=FakeCellCache(), memory_cache=TtlLruCache(max_entries=8))
+
+    with pytest.raises(ValueError, match="No forecast records from timeslot"):
+        service.get_records(60.39, 5.32, 3, timeslot=1_775_200_000)
+
@@ -0,0 +1,133 @@
+import asyncio
+import threading
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from app.services import weather_ingest
+from app.services.weather_ingest import (
+    FORMAT_CSV,
+    FORMAT_NDJSON,
+    MAX_LINE_BYTES,
+    detect_format,
+    parse_weather_chunks,
+    parse_weather_stream,
+    parse_weather_text,
+)
+
+
+CSV_PAYLOAD = (
+    "timestamp,temperature,relative_humidity,wind_speed\n"
+    "2026-02-23T12:00:00Z,20.5,55.0,3.2\n"
+    "2026-02-23T13:00:00Z,21.0,53.0,4.0\n"
+)
+
+
+def test_parse_csv_into_columns():
+    series = parse_weather_text(CSV_PAYLOAD, FORMAT_CSV)
+
+    assert len(series) == 2
+    assert series.offsets.tolist() == [0.0, 3600.0]
+    assert series.temperature.tolist() == [20.5, 21.0]
+    assert series.humidity.tolist() == [55.0, 53.0]
+    assert series.wind_speed.tolist() == [3.2, 4.0]
+    assert series.origin.isoformat() == "2026-02-23T12:00:00+00:00"
+
+
+def test_parse_csv_handles_lines_split_across_chunks():
+    data = CSV_PAYLOAD.encode("utf-8")
+    chunks = [data[index:index + 7] for index in range(0, len(data), 7)]
+
+    series = parse_weather_chunks(chunks, FORMAT_CSV)
+
+    assert series.temperature.tolist() == [20.5, 21.0]
+
+
+def test_parse_csv_reports_line_number_of_bad_value():
+    payload = CSV_PAYLOAD + "2026-02-23T14:00:00Z,warm,50.0,3.0\n"
+
+    with pytest.raises(ValueError, match="Line 4: invalid temperature value 'warm'"):
+        parse_weather_text(payload, FORMAT_CSV)
+
+
+def test_parse_csv_rejects_header_without_required_columns():
+    with pytest.raises(ValueError, match="Line 1: CSV header is missing columns: wind_speed"):
+        parse_weather_text("timestamp,temperature,relative_humidity\n", FORMAT_CSV)
+
+
+def test_parse_ndjson_stream():
+    lines = [
+        b'{"timestamp": "2026-02-23T12:00:00Z", "temperature": 20.5, "relative_humidity": 55.0, "wind_speed": 3.2}\n',
+        b'{"timestamp": "2026-02-23T13:00:00Z", "temperature": 21.0, ',
+        b'"relative_humidity": 53.0, "wind_speed": 4.0}',
+    ]
+
+    async def chunks():
+        for line in lines:
+            yield line
+
+    series = asyncio.run(parse_weather_stream(chunks(), FORMAT_NDJSON))
+
+    assert series.humidity.tolist() == [55.0, 53.0]
+
+
+def test_parse_stream_parses_off_the_event_loop_in_batches(monkeypatch):
+    monkeypatch.setattr(weather_ingest, "PARSE_BATCH_BYTES", 64)
+    calls = []
+    feed = weather_ingest.WeatherStreamParser.feed
+
+    def recording_feed(self, chunks):
+        chunks = list(chunks)
+        calls.append((threading.current_thread(), len(chunks)))
+        feed(self, chunks)
+
+    monkeypatch.setattr(weather_ingest.WeatherStreamParser, "feed", recording_feed)
+
+    async def chunks():
+        for line in CSV_PAYLOAD.splitlines(keepends=True):
+            yield line.encode("utf-8")
+
+    series = asyncio.run(parse_weather_stream(chunks(), FORMAT_CSV))
+
+    assert series.temperature.tolist() == [20.5, 21.0]
+    assert all(thread is not threading.main_thread() for thread, _ in calls)
+    assert sum(count for _, count in calls) == 3
+    assert len(calls) > 1
+
+
+def test_parse_ndjson_reports_missing_fields_with_line_number():
+    payload = '{"timestamp": "2026-02-23T12:00:00Z", "temperature": 20.5}\n'
+
+    with pytest.raises(ValueError, match="Line 1 is missing fields: relative_humidity, wind_speed"):
+        parse_weather_text(payload, FORMAT_NDJSON)
+
+
+def test_parse_json_seq_strips_record_separators():
+    payload = (
+        '\x1e{"timestamp": "2026-02-23T12:00:00Z", "temperature": 20.5, "relative_humidity": 55.0, "wind_speed": 3.2}\n'
+        '\x1e{"timestamp": "2026-02-23T13:00:00Z", "temperature": 21.0, "relative_humidity": 53.0, "wind_speed": 4.0}\n'
+    )
+
+    series = parse_weather_text(payload, detect_format("application/json-seq"))
+
+    assert series.temperature.tolist() == [20.5, 21.0]
+
+
+def test_overlong_line_is_rejected_without_waiting_for_a_newline():
+    header = b"timestamp,temperature,relative_humidity,wind_speed\n"
+    chunks = [header] + [b"x" * 4096] * (MAX_LINE_BYTES // 4096 + 1)
+
+    with pytest.raises(ValueError, match=f"Line 2: longer than {MAX_LINE_BYTES} bytes"):
+        parse_weather_chunks(chunks, FORMAT_CSV)
+
+
+def test_empty_input_raises():
+    with pytest.raises(ValueError, match="CSV input is empty"):
+        parse_weather_text("timestamp,temperature,relative_humidity,wind_speed\n", FORMAT_CSV)
+
+
+def test_detect_format():
+    assert detect_format("text/csv; charset=utf-8") == FORMAT_CSV
+    assert detect_format("application/x-ndjson") == FORMAT_NDJSON
+    assert detect_format("application/json") is None